@@ -0,0 +1,74 @@
+"""
+Compare benchmarks between two commits, flagging slowdowns.
+
+This runs the ``asv`` benchmarks (timing and peak memory) for both commits (skipping
+any that have results already), and compares them. Benchmarks that got slower (or
+used more memory) by more than ``--factor`` are listed, and the script exits with
+status 1 if there are any.
+
+Usage::
+
+    python benchmarks/compare.py master HEAD --factor 1.2
+    python benchmarks/compare.py master HEAD --bench "exclusion|hankel"
+"""
+import argparse
+import subprocess
+import sys
+
+
+def run(*args, capture=True):
+    """Run a command, returning its output if ``capture``."""
+    print("$", " ".join(args), flush=True)
+    out = subprocess.run(
+        args, check=True, stdout=subprocess.PIPE if capture else None, text=True
+    )
+    return out.stdout
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("base", help="The commit to compare against.")
+    parser.add_argument("head", nargs="?", default="HEAD", help="The new commit.")
+    parser.add_argument(
+        "--factor",
+        type=float,
+        default=1.1,
+        help="The ratio above which a benchmark is flagged as a slowdown.",
+    )
+    parser.add_argument(
+        "--bench", default=None, help="A regex selecting the benchmarks to run."
+    )
+    args = parser.parse_args(argv)
+
+    base, head = (
+        run("git", "rev-parse", commit).strip() for commit in (args.base, args.head)
+    )
+
+    bench = ["--bench", args.bench] if args.bench else []
+    for commit in (base, head):
+        run(
+            "asv",
+            "run",
+            "--skip-existing-commits",
+            "--show-stderr",
+            *bench,
+            f"{commit}^!",
+            capture=False,
+        )
+
+    report = run("asv", "compare", "--split", "--factor", str(args.factor), base, head)
+    print(report)
+
+    # asv marks benchmarks that got worse (or started failing) with '+' or '!'.
+    worse = [line for line in report.splitlines() if line.strip()[:1] in ("+", "!")]
+    if worse:
+        print(f"{len(worse)} benchmark(s) regressed by more than {args.factor}x:")
+        print("\n".join(worse))
+        return 1
+
+    print(f"No benchmarks regressed by more than {args.factor}x.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
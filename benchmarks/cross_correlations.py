@@ -0,0 +1,37 @@
+"""Benchmarks of cross-correlations between two tracer populations."""
+from halomod.cross_correlations import ConstantCorr, CrossCorrelations
+
+HALO_MODEL_PARAMS = {
+    "exclusion_model": "NoExclusion",
+    "sd_bias_model": None,
+    "transfer_model": "EH",
+    "force_1halo_turnover": False,
+}
+
+
+class Cross:
+    number = 1
+
+    def setup(self):
+        self.cross = CrossCorrelations(
+            cross_hod_model=ConstantCorr,
+            halo_model_1_params=HALO_MODEL_PARAMS,
+            halo_model_2_params={**HALO_MODEL_PARAMS, "hod_params": {"M_min": 12.5}},
+        )
+        self.cross.halo_model_1.power_auto_tracer
+        self.cross.halo_model_2.power_auto_tracer
+        self.r_ss = 0.0
+
+    def _update(self):
+        # Change the cross-correlation parameters every time, so that the cross
+        # statistics are re-computed (but not the halo models).
+        self.r_ss += 0.01
+        self.cross.update(cross_hod_params={"R_ss": self.r_ss})
+
+    def time_corr_cross(self):
+        self._update()
+        self.cross.corr_cross
+
+    def peakmem_corr_cross(self):
+        self._update()
+        self.cross.corr_cross
@@ -0,0 +1,30 @@
+"""Benchmarks of the halo-exclusion integrals of the 2-halo term."""
+from halomod import TracerHaloModel
+
+
+class Exclusion:
+    params = ["NoExclusion", "Sphere", "DblSphere_", "DblEllipsoid_", "NgMatched_"]
+    param_names = ["exclusion_model"]
+    number = 1
+    timeout = 300
+
+    def setup(self, exclusion_model):
+        self.hm = TracerHaloModel(
+            transfer_model="EH",
+            exclusion_model=exclusion_model,
+            sd_bias_model=None,
+            # A coarse grid, since the double-integral models scale steeply with it.
+            Mmin=10,
+            Mmax=15,
+            dlog10m=0.05,
+            dr_table=0.05,
+        )
+        self.hm._power_2h_auto_tracer_primitive  # Everything upstream, and any JIT.
+
+    def time_power_2h_auto_tracer_primitive(self, exclusion_model):
+        del self.hm._power_2h_auto_tracer_primitive
+        self.hm._power_2h_auto_tracer_primitive
+
+    def peakmem_power_2h_auto_tracer_primitive(self, exclusion_model):
+        del self.hm._power_2h_auto_tracer_primitive
+        self.hm._power_2h_auto_tracer_primitive
@@ -0,0 +1,45 @@
+"""Benchmarks of full halo model calculations, and updates of them."""
+import numpy as np
+
+from halomod import TracerHaloModel
+
+# A fixed sequence of HOD parameters, as in a short MCMC chain.
+MMIN = np.linspace(11.8, 12.8, 10)
+
+
+class HODUpdateLoop:
+    """Re-computing tracer statistics for a sequence of HOD parameters."""
+
+    number = 1
+
+    def setup(self):
+        self.hm = TracerHaloModel(transfer_model="EH")
+        self.hm.corr_auto_tracer
+
+    def time_update_loop(self):
+        for mmin in MMIN:
+            self.hm.update(hod_params={"M_min": mmin})
+            self.hm.power_auto_tracer
+            self.hm.corr_auto_tracer
+
+    def time_hod_batch(self):
+        self.hm.compute_hod_batch([{"M_min": mmin} for mmin in MMIN])
+
+    def peakmem_hod_batch(self):
+        self.hm.compute_hod_batch([{"M_min": mmin} for mmin in MMIN])
+
+
+class FullModel:
+    """A tracer halo model computed from scratch."""
+
+    number = 1
+
+    def time_power_and_corr(self):
+        hm = TracerHaloModel(transfer_model="EH")
+        hm.power_auto_tracer
+        hm.corr_auto_tracer
+
+    def peakmem_power_and_corr(self):
+        hm = TracerHaloModel(transfer_model="EH")
+        hm.power_auto_tracer
+        hm.corr_auto_tracer
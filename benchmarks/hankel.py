@@ -0,0 +1,60 @@
+"""Benchmarks for the Hankel transforms between power spectra and correlation functions."""
+from halomod import TracerHaloModel
+
+
+class HankelTransform:
+    params = ["loop", "vectorized", "fftlog"]
+    param_names = ["method"]
+    number = 1
+
+    def setup(self, method):
+        self.hm = TracerHaloModel(transfer_model="EH", hankel_method=method)
+
+        # Compute all the power spectra up front so only the transforms are timed.
+        self.hm.power_1h_auto_tracer_fnc
+        self.hm._power_2h_auto_tracer_primitive
+        self.hm.power_auto_matter_fnc
+
+    def time_corr_auto_tracer(self, method):
+        self.hm.corr_2h_auto_tracer
+
+    def time_corr_auto_matter(self, method):
+        self.hm.corr_auto_matter
+
+
+class RepeatedHODUpdate:
+    """Re-computing correlations after changing only HOD parameters, as in a fit."""
+
+    params = ["loop", "vectorized", "fftlog"]
+    param_names = ["method"]
+    number = 1
+
+    def setup(self, method):
+        self.hm = TracerHaloModel(transfer_model="EH", hankel_method=method)
+        self.hm.corr_auto_tracer
+        self.mmin = 12.0
+
+    def time_update_corr_auto_tracer(self, method):
+        self.mmin += 0.01
+        self.hm.update(hod_params={"M_min": self.mmin})
+        self.hm.corr_auto_tracer
+
+
+class ScaleDependentTransform:
+    """Transforms of the 2-halo term when it depends on scale (via exclusion)."""
+
+    params = ["vectorized", "fftlog"]
+    param_names = ["method"]
+    number = 1
+
+    def setup(self, method):
+        self.hm = TracerHaloModel(
+            transfer_model="EH",
+            sd_bias_model="TinkerSD05",
+            exclusion_model="NgMatched_",
+            hankel_method=method,
+        )
+        self.hm._power_2h_auto_tracer_primitive
+
+    def time_corr_2h_auto_tracer(self, method):
+        self.hm.corr_2h_auto_tracer
@@ -0,0 +1,18 @@
+"""Benchmarks for the time taken to import halomod."""
+
+
+def timeraw_import_halomod():
+    """Import halomod in a fresh interpreter, without timing its dependencies."""
+    return (
+        """
+    import halomod
+    """,
+        "import hmf, scipy.interpolate",
+    )
+
+
+def timeraw_import_halomod_cold():
+    """Import halomod and all its dependencies in a fresh interpreter."""
+    return """
+    import halomod
+    """
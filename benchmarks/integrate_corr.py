@@ -0,0 +1,65 @@
+"""Benchmarks of projected and angular correlation functions."""
+import numpy as np
+
+from halomod import AngularCF, ProjectedCF, projected_corr_gal
+
+HOD_PARAMS = {
+    "M_min": 12.98,
+    "M_0": -10,
+    "M_1": 14.09,
+    "sig_logm": 0.21,
+    "alpha": 1.57,
+}
+
+
+class Projected:
+    number = 1
+
+    def setup(self):
+        self.hm = ProjectedCF(
+            transfer_model="EH",
+            hod_model="Zheng05",
+            hod_params=HOD_PARAMS,
+            rp_min=0.1,
+            rp_max=30,
+            rp_num=20,
+            proj_limit=60.0,
+        )
+        self.hm.corr_auto_tracer_fnc
+        r = np.logspace(-2, 2.5, 200)
+        self.r = r
+        self.xi = (r / 5.0) ** -1.8
+
+    def time_projected_corr_gal(self):
+        del self.hm.projected_corr_gal
+        self.hm.projected_corr_gal
+
+    def time_projected_corr_gal_function(self):
+        projected_corr_gal(self.r, self.xi, 60.0, self.hm.rp)
+
+
+class Angular:
+    number = 1
+    timeout = 300
+
+    def setup(self):
+        self.hm = AngularCF(
+            z=0.475,
+            zmin=0.45,
+            zmax=0.5,
+            transfer_model="EH",
+            hod_model="Zheng05",
+            hod_params=HOD_PARAMS,
+            theta_min=1e-3 * np.pi / 180.0,
+            theta_max=np.pi / 180.0,
+            theta_num=10,
+        )
+        self.hm.corr_auto_tracer_fnc
+
+    def time_angular_corr_gal(self):
+        del self.hm.angular_corr_gal
+        self.hm.angular_corr_gal
+
+    def peakmem_angular_corr_gal(self):
+        del self.hm.angular_corr_gal
+        self.hm.angular_corr_gal
@@ -0,0 +1,120 @@
+"""Benchmarks of the Fourier-space halo profiles."""
+import tempfile
+
+import numpy as np
+
+from halomod import DMHaloModel, profile_tables, profiles
+from halomod.concentration import Duffy08
+
+
+class ProfileFourier:
+    """The normalised Fourier profile, u(k, m), on a fixed grid."""
+
+    params = [
+        "NFW",
+        "Einasto",
+        "GeneralizedNFW",
+        "Moore",
+        "NFWInf",
+        "MooreInf",
+        "GeneralizedNFWInf",
+    ]
+    param_names = ["profile"]
+    number = 1
+
+    def setup(self, profile):
+        hm = DMHaloModel(transfer_model="EH", halo_profile_model=profile)
+        self.profile = hm.halo_profile
+        self.k = np.logspace(-3, 2, 200)
+        self.m = np.logspace(10, 15, 200)
+        self.c = hm.halo_concentration.cm(self.m, z=0)
+
+    def time_u(self, profile):
+        self.profile.u(self.k, self.m, c=self.c)
+
+    def peakmem_u(self, profile):
+        self.profile.u(self.k, self.m, c=self.c)
+
+
+class HaloProfileUkm:
+    """The full ``halo_profile_ukm`` table of a halo model, from scratch."""
+
+    params = ["NFW", "Einasto", "GeneralizedNFW", "Moore"]
+    param_names = ["profile"]
+    number = 1
+
+    def setup(self, profile):
+        self.hm = DMHaloModel(transfer_model="EH", halo_profile_model=profile)
+        self.hm.cmz_relation
+
+    def time_halo_profile_ukm(self, profile):
+        del self.hm.halo_profile_ukm
+        self.hm.halo_profile_ukm
+
+
+class TabulatedHaloProfileUkm:
+    """``halo_profile_ukm`` interpolated from a (pre-built) table of the profile."""
+
+    params = ["Einasto", "GeneralizedNFW", "Moore"]
+    param_names = ["profile"]
+    number = 1
+
+    def setup(self, profile):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.table_directory = profile_tables.get_table_directory()
+        profile_tables.set_table_directory(self.tmp.name)
+
+        params = {"tabulate": True}
+        if profile == "Einasto":
+            params.update(alpha=0.2, use_interp=False)
+
+        self.hm = DMHaloModel(
+            transfer_model="EH", halo_profile_model=profile, halo_profile_params=params
+        )
+        self.hm.halo_profile_ukm  # Builds the table.
+
+    def teardown(self, profile):
+        profile_tables.set_table_directory(self.table_directory)
+        self.tmp.cleanup()
+
+    def time_halo_profile_ukm(self, profile):
+        del self.hm.halo_profile_ukm
+        self.hm.halo_profile_ukm
+
+
+class EinastoAlphaHaloProfileUkm:
+    """``halo_profile_ukm`` of Einasto, interpolated in its 3D table of alpha."""
+
+    params = [0.18, 0.25]
+    param_names = ["alpha"]
+    number = 1
+
+    def setup(self, alpha):
+        profile_tables.get_einasto_table()  # Loads (or builds) the table.
+        self.hm = DMHaloModel(
+            transfer_model="EH",
+            halo_profile_model="Einasto",
+            halo_profile_params={"alpha": alpha},
+        )
+        self.hm.cmz_relation
+
+    def time_halo_profile_ukm(self, alpha):
+        del self.hm.halo_profile_ukm
+        self.hm.halo_profile_ukm
+
+
+class NumericalInfProfile:
+    """The numerical Fourier transform of a user-defined infinite profile."""
+
+    number = 1
+
+    def setup(self):
+        class NFWInfNumerical(profiles.ProfileInf):
+            def _f(self, x):
+                return 1.0 / (x * (1 + x) ** 2)
+
+        self.profile = NFWInfNumerical(Duffy08())
+        self.K = np.outer(np.logspace(-3, 2, 200), np.logspace(-2, 0, 200))
+
+    def time_p(self):
+        self.profile._p(self.K)
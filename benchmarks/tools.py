@@ -0,0 +1,28 @@
+"""Benchmarks of stand-alone tools."""
+import numpy as np
+
+from halomod.concentration import Bullock01Power
+from halomod.hod import Zehavi05
+from halomod.profiles import NFW
+from halomod.tools import populate
+
+
+class Populate:
+    params = [1000, 10000]
+    param_names = ["nhalos"]
+    number = 1
+
+    def setup(self, nhalos):
+        rng = np.random.RandomState(1234)
+        self.centres = 250 * rng.random_sample((nhalos, 3))
+        self.masses = 10 ** (11 + 4 * rng.random_sample(nhalos))
+        self.hod = Zehavi05(central=True)
+        self.profile = NFW(Bullock01Power(ms=1e12))
+
+    def time_populate(self, nhalos):
+        np.random.seed(1234)
+        populate(self.centres, self.masses, profile=self.profile, hodmod=self.hod)
+
+    def peakmem_populate(self, nhalos):
+        np.random.seed(1234)
+        populate(self.centres, self.masses, profile=self.profile, hodmod=self.hod)
@@ -16,6 +16,7 @@ from . import cross_correlations
 from . import functional
 from . import halo_exclusion
 from . import hod
+from . import instrumentation
 from . import integrate_corr
 from . import profiles
 from . import tools
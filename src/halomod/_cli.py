@@ -1,7 +1,9 @@
 """Module that contains the command line app."""
 from hmf._cli import run_cli
+import ast
 import click
 from .halo_model import TracerHaloModel
+from . import profile_tables
 import hmf
 import halomod
 
@@ -29,3 +31,46 @@ main = click.Group()
 @click.pass_context
 def run(ctx, config, outdir, label):
     run_cli(config, "halomod", ctx.args, outdir, label, [halomod, hmf], TracerHaloModel)
+
+
+def _parse_value(val):
+    try:
+        return ast.literal_eval(val)
+    except (ValueError, SyntaxError):
+        return val
+
+
+@main.command()
+@click.argument("profile", type=str)
+@click.option(
+    "-p",
+    "--param",
+    "params",
+    multiple=True,
+    help="A parameter of the profile and its values, as NAME=VALUE[,VALUE...].",
+)
+@click.option(
+    "--atol",
+    type=float,
+    default=profile_tables.DEFAULT_ATOL,
+    help="The target absolute accuracy of the tables.",
+)
+@click.option(
+    "-d",
+    "--directory",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="The directory of the tables (by default, that of halomod.profile_tables).",
+)
+def tables(profile, params, atol, directory):
+    """Build the Fourier-transform tables of PROFILE for a grid of its parameters."""
+    if directory is not None:
+        profile_tables.set_table_directory(directory)
+
+    param_grid = {}
+    for param in params:
+        name, _, values = param.partition("=")
+        param_grid[name] = [_parse_value(v) for v in values.split(",")]
+
+    for prms, path, table in profile_tables.build_tables(profile, param_grid, atol):
+        click.echo(f"{prms}: {path} (accuracy {table.accuracy:.2e})")
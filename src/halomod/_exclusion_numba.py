@@ -0,0 +1,192 @@
+"""
+Numba-compiled kernels of the accelerated halo exclusion models.
+
+These are kept separate from :mod:`halomod.halo_exclusion` so that numba is only
+imported (and the kernels compiled) when an accelerated model is first used.
+"""
+import numpy as np
+from numba import jit
+
+
+@jit(nopython=True, cache=True)
+def dblsimps_(X, dx, dy):  # pragma: no cover
+    """
+    Double-integral of X **FOR SYMMETRIC FUNCTIONS**.
+    """
+    nx = X.shape[-2]
+    ny = X.shape[-1]
+
+    W = makeW_(nx, ny)  # only upper
+
+    tot = np.zeros_like(X[..., 0, 0])
+    for ix in range(nx):
+        tot += W[ix, ix] * X[..., ix, ix]
+        for iy in range(ix + 1, ny):
+            tot += 2 * W[ix, iy] * X[..., ix, iy]
+
+    return dx * dy * tot / 9.0
+
+
+@jit(nopython=True, cache=True)
+def makeW_(nx, ny):  # pragma: no cover
+    r"""
+    Return a window matrix for symmetric double-intergral.
+    """
+    W = np.ones((nx, ny))
+    if nx % 2 == 0:
+        for ix in range(1, nx - 2, 2):
+            W[ix, -1] *= 4
+            W[-1, ix] *= 4
+            for iy in range(ny - 1):
+                W[ix, iy] *= 4
+                W[iy, ix] *= 4
+
+        for ix in range(2, nx - 2, 2):
+            W[ix, -1] *= 2
+            W[-1, ix] *= 2
+            for iy in range(ny - 1):
+                W[ix, iy] *= 2
+                W[iy, ix] *= 2
+
+        for ix in range(nx):
+            W[ix, -2] *= 2.5
+            W[ix, -1] *= 1.5
+            W[-2, ix] *= 2.5
+            W[-1, ix] *= 1.5
+    else:
+        for ix in range(1, nx - 1, 2):
+            for iy in range(ny):
+                W[ix, iy] *= 4
+                W[iy, ix] *= 4
+
+        for ix in range(2, nx - 1, 2):
+            for iy in range(ny):
+                W[ix, iy] *= 2
+                W[iy, ix] *= 2
+
+    return W
+
+
+@jit(nopython=True, cache=True)
+def makeH_(nx, ny):  # pragma: no cover
+    """Return the window matrix for trapezoidal intergral."""
+    H = np.ones((nx, ny))
+    for ix in range(1, nx - 1):
+        for iy in range(ny):
+            H[ix, iy] *= 2
+            H[iy, ix] *= 2
+
+    return H
+
+
+@jit(nopython=True, cache=True)
+def dbltrapz_(X, dx, dy):  # pragma: no cover
+    """Double-integral of X for the trapezoidal method."""
+    nx = X.shape[-2]
+    ny = X.shape[-1]
+
+    H = makeH_(nx, ny)
+    tot = np.zeros_like(X[..., 0, 0])
+    for ix in range(nx):
+        tot += H[ix, ix] * X[ix, ix]
+        for iy in range(ix + 1, ny):
+            tot += 2 * H[ix, iy] * X[ix, iy]
+
+    return dx * dy * tot / 4.0
+
+
+@jit(nopython=True, cache=True)
+def integrate_dblsphere_(integ, mask, dx):  # pragma: no cover
+    r"""
+    The same as :func:`~halomod.halo_exclusion.integrate_dblsphere`, but uses NUMBA to speed up.
+    """
+    nr = integ.shape[0]
+    nk = integ.shape[1]
+    nm = mask.shape[1]
+
+    out = np.zeros((nr, nk))
+    integrand = np.zeros((nm, nm))
+
+    for ir in range(nr):
+        for ik in range(nk):
+            for im in range(nm):
+                for jm in range(im, nm):
+                    if mask[ir, im, jm]:
+                        integrand[im, jm] = 0
+                    else:
+                        integrand[im, jm] = integ[ir, ik, im] * integ[ir, ik, jm]
+            out[ir, ik] = dblsimps_(integrand, dx, dx)
+    return out
+
+
+@jit(nopython=True, cache=True)
+def integrate_dblell(integ, prob, dx):  # pragma: no cover
+    r"""Double Integration via the trapezoidal method if using NUMBA"""
+    nr = integ.shape[0]
+    nk = integ.shape[1]
+    nm = prob.shape[1]
+
+    out = np.zeros((nr, nk))
+    integrand = np.zeros((nm, nm))
+
+    for ir in range(nr):
+        for ik in range(nk):
+            for im in range(nm):
+                for jm in range(im, nm):
+                    integrand[im, jm] = (
+                        integ[ir, ik, im] * integ[ir, ik, jm] * prob[ir, im, jm]
+                    )
+            out[ir, ik] = dbltrapz_(integrand, dx, dx)
+    return out
+
+
+@jit(nopython=True, cache=True)
+def density_mod_(r, rvir, densitymat, dx):  # pragma: no cover
+    """The modified density, under new limits."""
+    d = np.zeros(len(r))
+    for ir, rr in enumerate(r):
+        integrand = prob_inner_r_(rr, rvir) * densitymat
+        d[ir] = dbltrapz_(integrand, dx, dx)
+    return np.sqrt(d)
+
+
+@jit(nopython=True, cache=True)
+def prob_inner_(r, rvir):  # pragma: no cover
+    """
+    Jit-compiled version of calculating prob, taking advantage of symmetry.
+    """
+    nrv = len(rvir)
+    out = np.empty((len(r), nrv, nrv))
+    for ir, rr in enumerate(r):
+        for irv, rv1 in enumerate(rvir):
+            for jrv in range(irv, nrv):
+                rv2 = rvir[jrv]
+                x = (rr / (rv1 + rv2) - 0.8) / 0.29
+                if x <= 0:
+                    out[ir, irv, jrv] = 0
+                elif x >= 1:
+                    out[ir, irv, jrv] = 1
+                else:
+                    out[ir, irv, jrv] = 3 * x ** 2 - 2 * x ** 3
+    return out
+
+
+@jit(nopython=True, cache=True)
+def prob_inner_r_(r, rvir):  # pragma: no cover
+    """
+    Jit-compiled version of calculating prob along one r,
+    taking advantage of symmetry.
+    """
+    nrv = len(rvir)
+    out = np.empty((nrv, nrv))
+    for irv, rv1 in enumerate(rvir):
+        for jrv in range(irv, nrv):
+            rv2 = rvir[jrv]
+            x = (r / (rv1 + rv2) - 0.8) / 0.29
+            if x <= 0:
+                out[irv, jrv] = 0
+            elif x >= 1:
+                out[irv, jrv] = 1
+            else:
+                out[irv, jrv] = 3 * x ** 2 - 2 * x ** 3
+    return out
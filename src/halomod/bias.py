@@ -64,7 +64,6 @@ import numpy as np
 from hmf import Component
 from scipy.interpolate import InterpolatedUnivariateSpline as spline
 from hmf.cosmology.cosmo import astropy_to_colossus
-from colossus.lss.bias import haloBiasFromNu
 from astropy.cosmology import FLRW, Planck15
 from hmf.halos.mass_definitions import SOMean
 from hmf._internals import pluggable
@@ -798,6 +797,8 @@ def make_colossus_bias(model="comparat17", mdef=SOMean(), **defaults):
 
     Notice that it returns a *class* :class:`CustomColossusBias` not an instance.
     """
+    # colossus is imported here, so that it is only loaded when it is used.
+    from colossus.lss.bias import haloBiasFromNu
 
     class CustomColossusBias(Bias):
         _model_name = model
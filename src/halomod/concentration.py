@@ -56,7 +56,6 @@ from scipy.interpolate import interp1d
 from scipy.optimize import minimize
 from astropy.cosmology import Planck15
 
-from colossus.halo import concentration
 from hmf.cosmology.cosmo import astropy_to_colossus
 
 from hmf.density_field.filters import Filter
@@ -184,6 +183,8 @@ def make_colossus_cm(model="diemer15", **defaults):
 
     Notice that it returns a *class* :class:`CustomColossusCM` not an instance.
     """
+    # colossus is imported here, so that it is only loaded when it is used.
+    from colossus.halo import concentration
 
     class CustomColossusCM(CMRelation):
         _model_name = model
@@ -258,9 +258,7 @@ class CrossCorrelations(Framework):
     @cached_quantity
     def corr_1h_cross_fnc(self):
         """The 1-halo term of the cross correlation"""
-        corr = tools.hankel_transform(
-            self.power_1h_cross_fnc, self.halo_model_1._r_table, "r"
-        )
+        corr = self.halo_model_1._power_to_corr(self.power_1h_cross_fnc)
         return tools.ExtendedSpline(
             self.halo_model_1._r_table,
             corr,
@@ -317,7 +315,11 @@ class CrossCorrelations(Framework):
     def corr_2h_cross_fnc(self):
         """The 2-halo term of the cross-correlation."""
         corr = tools.hankel_transform(
-            self.power_2h_cross_fnc, self.halo_model_1._r_table, "r", h=1e-4
+            self.power_2h_cross_fnc,
+            self.halo_model_1._r_table,
+            "r",
+            h=1e-4,
+            method=self.halo_model_1.hankel_method,
         )
         return tools.ExtendedSpline(
             self.halo_model_1._r_table,
@@ -2,30 +2,37 @@ r"""
 Module defining functional approaches to generating halo model quantities.
 """
 from .halo_model import HaloModel
+from . import halo_exclusion
 from hmf import get_hmf, Framework
-from typing import List
+from hmf._internals import get_mdl
+from hmf.helpers.functional import get_best_param_order
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import multiprocessing
+import numpy as np
+import queue
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Parameters for a very quick calculation, used only to determine the optimal order
+# of parameter loops.
+FAST_KWARGS = {
+    "transfer_model": "BBKS",
+    "lnk_min": -4,
+    "lnk_max": 2,
+    "dlnk": 1,
+    "Mmin": 13,
+    "dlog10m": 0.5,
+    "rmin": 10,
+    "rmax": 20,
+    "rnum": 4,
+    "exclusion_model": "NoExclusion",
+    "sd_bias_model": None,
+    "hod_model": "Zehavi05",
+}
 
 
 def get_halomodel(
-    required_attrs,
-    get_label=True,
-    kls=HaloModel,
-    fast_kwargs={
-        "transfer_fit": "BBKS",
-        "lnk_min": -4,
-        "lnk_max": 2,
-        "dlnk": 1,
-        "Mmin": 13,
-        "dlog10m": 0.5,
-        "rmin": 10,
-        "rmax": 20,
-        "rnum": 4,
-        "halo_exclusion": "None",
-        "nonlinear": False,
-        "scale_dependent_bias": False,
-        "hod_model": "Zehavi05",
-    },
-    **kwargs
+    required_attrs, get_label=True, kls=HaloModel, fast_kwargs=FAST_KWARGS, **kwargs
 ) -> List[Framework]:
     r"""
     Yield framework instances for all combinations of parameters supplied.
@@ -34,4 +41,266 @@ def get_halomodel(
     :class:`~halomod.halo_model.HaloModel`. See
     :func:`~hmf.helpers.functional.get_hmf` for input parameters and yields.
     """
-    return get_hmf(required_attrs, get_label, kls, fast_kwargs, **kwargs)
+    return get_hmf(
+        required_attrs, get_label, kls, _fast_kwargs(kls, fast_kwargs), **kwargs
+    )
+
+
+def _fast_kwargs(kls, fast_kwargs):
+    """The fast parameters that are accepted by ``kls``."""
+    names = kls.get_all_parameter_names()
+    return {k: v for k, v in fast_kwargs.items() if k in names}
+
+
+# A framework kept by each worker process between the chunks it is given, so that
+# consecutive chunks re-use its cache.
+_worker_framework = {}
+
+
+def _sweep_points(kls, fixed, names, points, required_attrs, frameworks):
+    """Yield the index and required quantities of each point, in order.
+
+    A framework is re-used from (and saved to) ``frameworks`` if it has the same
+    class and fixed parameters.
+    """
+    key = (kls, repr(fixed))
+    x = frameworks.get(key)
+    for index, values in points:
+        params = dict(zip(names, values))
+        if x is None:
+            x = kls(**fixed, **params)
+            frameworks.clear()
+            frameworks[key] = x
+        else:
+            x.update(**params)
+        yield index, [np.asarray(getattr(x, q)) for q in required_attrs]
+
+
+def _sweep_worker(results, kls, fixed, names, points, required_attrs):
+    """Walk a chunk of the grid in a worker, putting each result onto the queue."""
+    for result in _sweep_points(
+        kls, fixed, names, points, required_attrs, _worker_framework
+    ):
+        results.put(result)
+
+
+def _uses_compiled_exclusion(fixed, lists) -> bool:
+    """Whether any point of a sweep uses a numba-accelerated exclusion model."""
+    if not halo_exclusion.USE_NUMBA:
+        return False
+
+    compiled = (halo_exclusion.DblSphere_, halo_exclusion.DblEllipsoid_)
+    models = lists.get("exclusion_model", [fixed.get("exclusion_model")])
+    return any(
+        model is not None and issubclass(get_mdl(model, "Exclusion"), compiled)
+        for model in models
+    )
+
+
+def _sweep_grid(required_attrs, kls, fast_kwargs, kwargs):
+    """Split parameters into fixed and swept, and get the points of the sweep.
+
+    The swept parameters are ordered with the slowest to change (i.e. those which
+    cause the most re-computation) first, so that walking the points in order
+    maximises the re-use of cached quantities.
+    """
+    fixed, lists = {}, {}
+    for k, v in kwargs.items():
+        if isinstance(v, (list, tuple)) and len(v) > 1:
+            lists[k] = v
+        else:
+            fixed[k] = v[0] if isinstance(v, (list, tuple)) else v
+
+    order = get_best_param_order(kls, required_attrs, **_fast_kwargs(kls, fast_kwargs))
+    # Parameters not found by the ordering (should be none) go outermost.
+    names = [k for k in lists if k not in order] + [k for k in order if k in lists]
+
+    axes = list(lists)
+    points = []
+    for indx in itertools.product(*(range(len(lists[name])) for name in names)):
+        # Index in the order of the user-supplied parameters.
+        index = tuple(indx[names.index(name)] for name in axes)
+        points.append((index, tuple(lists[name][i] for name, i in zip(names, indx))))
+    return fixed, names, {k: list(v) for k, v in lists.items()}, points
+
+
+def iter_sweep(
+    required_attrs: [str, Sequence[str]],
+    kls=HaloModel,
+    processes: Optional[int] = None,
+    fast_kwargs=FAST_KWARGS,
+    **kwargs,
+) -> Iterator[Tuple[Tuple[int, ...], Dict, List[np.ndarray]]]:
+    r"""
+    Yield quantities for all combinations of parameters, computed in parallel.
+
+    The grid of parameters is split into one contiguous chunk per process, each of
+    which is walked in the same optimal order as :func:`get_halomodel` (slowly
+    changing parameters outermost), on a single framework instance per process.
+    Results are yielded as soon as they are computed, so they arrive out of order.
+    If a numba-accelerated exclusion model is used, each worker loads (or compiles)
+    its kernels when it starts, with :func:`~halomod.halo_exclusion.compile_kernels`.
+
+    Parameters
+    ----------
+    required_attrs
+        The quantities to compute at every point of the grid.
+    kls : :class:`hmf._framework.Framework` class, optional
+        The framework to use.
+    processes
+        The number of worker processes. By default, the number of CPUs. With one
+        process, the points are computed serially in this process.
+    fast_kwargs : dict, optional
+        Parameters for a very quick calculation, used to determine the order of the
+        loops (see :func:`~hmf.helpers.functional.get_best_param_order`).
+    kwargs
+        Parameters of ``kls``. Those given as lists or tuples (of more than one
+        element) are swept over. Everything must be picklable.
+
+    Yields
+    ------
+    index : tuple
+        The index of each swept parameter (in the order they were given).
+    params : dict
+        The swept parameters of this point.
+    quantities : list
+        The required quantities at this point.
+
+    Examples
+    --------
+    >>> for index, params, (power,) in iter_sweep(
+    >>>     "power_auto_tracer", z=[0, 1], sigma_8=[0.7, 0.8], processes=2
+    >>> ):
+    >>>     print(index, params)
+    """
+    if isinstance(required_attrs, str):
+        required_attrs = [required_attrs]
+
+    fixed, names, lists, points = _sweep_grid(required_attrs, kls, fast_kwargs, kwargs)
+
+    def labelled(results):
+        for index, quantities in results:
+            params = {name: lists[name][i] for name, i in zip(lists, index)}
+            yield index, params, quantities
+
+    processes = processes or multiprocessing.cpu_count()
+    processes = min(processes, len(points))
+    if processes == 1:
+        yield from labelled(
+            _sweep_points(kls, fixed, names, points, required_attrs, {})
+        )
+        return
+
+    # Load the compiled exclusion kernels once in each worker, before any work.
+    initializer = (
+        halo_exclusion.compile_kernels
+        if _uses_compiled_exclusion(fixed, lists)
+        else None
+    )
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(
+        processes, initializer=initializer
+    ) as ex:
+        results = manager.Queue()
+        bounds = np.linspace(0, len(points), processes + 1).astype(int)
+        futures = [
+            ex.submit(
+                _sweep_worker,
+                results,
+                kls,
+                fixed,
+                names,
+                points[start:stop],
+                required_attrs,
+            )
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+
+        def stream():
+            for _ in range(len(points)):
+                while True:
+                    try:
+                        yield results.get(timeout=0.1)
+                        break
+                    except queue.Empty:
+                        for future in futures:
+                            if future.done() and future.exception() is not None:
+                                raise future.exception()
+
+        yield from labelled(stream())
+
+
+def sweep(
+    required_attrs: [str, Sequence[str]],
+    kls=HaloModel,
+    processes: Optional[int] = None,
+    outfile: Optional[str] = None,
+    fast_kwargs=FAST_KWARGS,
+    **kwargs,
+) -> np.ndarray:
+    r"""
+    Compute quantities for all combinations of parameters in a process pool.
+
+    See :func:`iter_sweep` for details of how the grid is computed.
+
+    Parameters
+    ----------
+    required_attrs
+        The quantities to compute at every point of the grid.
+    kls : :class:`hmf._framework.Framework` class, optional
+        The framework to use.
+    processes
+        The number of worker processes. By default, the number of CPUs.
+    outfile
+        If given, the results are written to this ``.npy`` file (as a memory-mapped
+        array) as they are computed, so that a sweep that is interrupted keeps all
+        the results computed so far.
+    fast_kwargs : dict, optional
+        Parameters for a very quick calculation, used to determine the order of the
+        loops.
+    kwargs
+        Parameters of ``kls``. Those given as lists or tuples (of more than one
+        element) are swept over.
+
+    Returns
+    -------
+    results : np.ndarray
+        A structured array with one field per required quantity, and one axis per
+        swept parameter (in the order they were given).
+
+    Examples
+    --------
+    >>> res = sweep(
+    >>>     ["power_auto_tracer", "corr_auto_tracer"],
+    >>>     z=[0, 0.5, 1],
+    >>>     hod_params=[{"M_min": 12}, {"M_min": 13}],
+    >>> )
+    >>> res["power_auto_tracer"].shape
+    (3, 2, 100)
+    """
+    if isinstance(required_attrs, str):
+        required_attrs = [required_attrs]
+
+    shape = tuple(
+        len(v) for v in kwargs.values() if isinstance(v, (list, tuple)) and len(v) > 1
+    )
+
+    out = None
+    for index, _, quantities in iter_sweep(
+        required_attrs, kls, processes, fast_kwargs, **kwargs
+    ):
+        if out is None:
+            dtype = [
+                (name, q.dtype, q.shape) for name, q in zip(required_attrs, quantities)
+            ]
+            if outfile is None:
+                out = np.zeros(shape, dtype=dtype)
+            else:
+                out = np.lib.format.open_memmap(
+                    outfile, mode="w+", dtype=dtype, shape=shape
+                )
+
+        out[index] = tuple(quantities)
+
+    if outfile is not None:
+        out.flush()
+    return out
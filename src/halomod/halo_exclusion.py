@@ -3,21 +3,46 @@ Module defining halo model components for halo exclusion.
 """
 import numpy as np
 from hmf import Component
-from cached_property import cached_property
 from scipy import integrate as intg
 import warnings
 from hmf._internals import pluggable
+from importlib.util import find_spec
 
 try:
-    from numba import jit
-
-    USE_NUMBA = True
+    from functools import cached_property
 except ImportError:  # pragma: no cover
-    USE_NUMBA = False
+    from cached_property import cached_property
+
+# The numba-accelerated models (ending in '_') are only defined if numba is
+# installed. Numba itself is only imported, and their kernels compiled, when they
+# are first used.
+USE_NUMBA = find_spec("numba") is not None
+if not USE_NUMBA:  # pragma: no cover
     warnings.warn(
         "Warning: Some Halo-Exclusion models have significant speedup when using Numba"
     )
 
+_NUMBA_KERNELS = (
+    "dblsimps_",
+    "makeW_",
+    "makeH_",
+    "dbltrapz_",
+    "integrate_dblsphere_",
+    "integrate_dblell",
+    "density_mod_",
+    "prob_inner_",
+    "prob_inner_r_",
+)
+
+
+def __getattr__(name):
+    # Give access to the numba kernels, importing them on first use.
+    if USE_NUMBA and name in _NUMBA_KERNELS:
+        from . import _exclusion_numba
+
+        return getattr(_exclusion_numba, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # ===============================================================================
 # UTILITIES
@@ -52,92 +77,6 @@ def makeW(nx, ny):
     return W
 
 
-if USE_NUMBA:
-
-    @jit(nopython=True)
-    def dblsimps_(X, dx, dy):  # pragma: no cover
-        """
-        Double-integral of X **FOR SYMMETRIC FUNCTIONS**.
-        """
-        nx = X.shape[-2]
-        ny = X.shape[-1]
-
-        W = makeW_(nx, ny)  # only upper
-
-        tot = np.zeros_like(X[..., 0, 0])
-        for ix in range(nx):
-            tot += W[ix, ix] * X[..., ix, ix]
-            for iy in range(ix + 1, ny):
-                tot += 2 * W[ix, iy] * X[..., ix, iy]
-
-        return dx * dy * tot / 9.0
-
-    @jit(nopython=True)
-    def makeW_(nx, ny):  # pragma: no cover
-        r"""
-        Return a window matrix for symmetric double-intergral.
-        """
-        W = np.ones((nx, ny))
-        if nx % 2 == 0:
-            for ix in range(1, nx - 2, 2):
-                W[ix, -1] *= 4
-                W[-1, ix] *= 4
-                for iy in range(ny - 1):
-                    W[ix, iy] *= 4
-                    W[iy, ix] *= 4
-
-            for ix in range(2, nx - 2, 2):
-                W[ix, -1] *= 2
-                W[-1, ix] *= 2
-                for iy in range(ny - 1):
-                    W[ix, iy] *= 2
-                    W[iy, ix] *= 2
-
-            for ix in range(nx):
-                W[ix, -2] *= 2.5
-                W[ix, -1] *= 1.5
-                W[-2, ix] *= 2.5
-                W[-1, ix] *= 1.5
-        else:
-            for ix in range(1, nx - 1, 2):
-                for iy in range(ny):
-                    W[ix, iy] *= 4
-                    W[iy, ix] *= 4
-
-            for ix in range(2, nx - 1, 2):
-                for iy in range(ny):
-                    W[ix, iy] *= 2
-                    W[iy, ix] *= 2
-
-        return W
-
-    @jit(nopython=True)
-    def makeH_(nx, ny):  # pragma: no cover
-        """Return the window matrix for trapezoidal intergral."""
-        H = np.ones((nx, ny))
-        for ix in range(1, nx - 1):
-            for iy in range(ny):
-                H[ix, iy] *= 2
-                H[iy, ix] *= 2
-
-        return H
-
-    @jit(nopython=True)
-    def dbltrapz_(X, dx, dy):  # pragma: no cover
-        """Double-integral of X for the trapezoidal method."""
-        nx = X.shape[-2]
-        ny = X.shape[-1]
-
-        H = makeH_(nx, ny)
-        tot = np.zeros_like(X[..., 0, 0])
-        for ix in range(nx):
-            tot += H[ix, ix] * X[ix, ix]
-            for iy in range(ix + 1, ny):
-                tot += 2 * H[ix, iy] * X[ix, iy]
-
-        return dx * dy * tot / 4.0
-
-
 # ===============================================================================
 # Halo-Exclusion Models
 # ===============================================================================
@@ -307,29 +246,6 @@ def integrate_dblsphere(integ, mask, dx):
 
 if USE_NUMBA:
 
-    @jit(nopython=True)
-    def integrate_dblsphere_(integ, mask, dx):  # pragma: no cover
-        r"""
-        The same as :func:`integrate_dblsphere`, but uses NUMBA to speed up.
-        """
-        nr = integ.shape[0]
-        nk = integ.shape[1]
-        nm = mask.shape[1]
-
-        out = np.zeros((nr, nk))
-        integrand = np.zeros((nm, nm))
-
-        for ir in range(nr):
-            for ik in range(nk):
-                for im in range(nm):
-                    for jm in range(im, nm):
-                        if mask[ir, im, jm]:
-                            integrand[im, jm] = 0
-                        else:
-                            integrand[im, jm] = integ[ir, ik, im] * integ[ir, ik, jm]
-                out[ir, ik] = dblsimps_(integrand, dx, dx)
-        return out
-
     class DblSphere_(DblSphere):  # pragma: no cover
         r"""
         The same as :class:`DblSphere`. But uses NUMBA to speed up the integration.
@@ -337,7 +253,10 @@ if USE_NUMBA:
 
         def integrate(self):
             """Integrate the :meth:`raw_integrand` over mass."""
-            integ = self.raw_integrand()  # (r,k,m)
+            # Contiguous, so the kernel signature compiled by compile_kernels is used.
+            integ = np.ascontiguousarray(self.raw_integrand())  # (r,k,m)
+            from ._exclusion_numba import integrate_dblsphere_
+
             return integrate_dblsphere_(integ, self.mask, self.dlnx)
 
 
@@ -413,6 +332,8 @@ if USE_NUMBA:
         @cached_property
         def density_mod(self):  # pragma: no cover
             """The modified density, under new limits."""
+            from ._exclusion_numba import density_mod_
+
             return density_mod_(
                 self.r,
                 self.r_halo,
@@ -425,82 +346,18 @@ if USE_NUMBA:
             """
             The probablity distribution used in calculating double integral
             """
+            from ._exclusion_numba import prob_inner_
+
             return prob_inner_(self.r, self.r_halo)
 
         def integrate(self):  # pragma: no cover
             """
             Integrate the :meth:`raw_integrand` over mass.
             """
-            return integrate_dblell(self.raw_integrand(), self.prob, self.dlnx)
-
-    @jit(nopython=True)
-    def integrate_dblell(integ, prob, dx):  # pragma: no cover
-        r"""Double Integration via the trapezoidal method if using NUMBA"""
-        nr = integ.shape[0]
-        nk = integ.shape[1]
-        nm = prob.shape[1]
-
-        out = np.zeros((nr, nk))
-        integrand = np.zeros((nm, nm))
-
-        for ir in range(nr):
-            for ik in range(nk):
-                for im in range(nm):
-                    for jm in range(im, nm):
-                        integrand[im, jm] = (
-                            integ[ir, ik, im] * integ[ir, ik, jm] * prob[ir, im, jm]
-                        )
-                out[ir, ik] = dbltrapz_(integrand, dx, dx)
-        return out
+            from ._exclusion_numba import integrate_dblell
 
-    @jit(nopython=True)
-    def density_mod_(r, rvir, densitymat, dx):  # pragma: no cover
-        """The modified density, under new limits."""
-        d = np.zeros(len(r))
-        for ir, rr in enumerate(r):
-            integrand = prob_inner_r_(rr, rvir) * densitymat
-            d[ir] = dbltrapz_(integrand, dx, dx)
-        return np.sqrt(d)
-
-    @jit(nopython=True)
-    def prob_inner_(r, rvir):  # pragma: no cover
-        """
-        Jit-compiled version of calculating prob, taking advantage of symmetry.
-        """
-        nrv = len(rvir)
-        out = np.empty((len(r), nrv, nrv))
-        for ir, rr in enumerate(r):
-            for irv, rv1 in enumerate(rvir):
-                for jrv in range(irv, nrv):
-                    rv2 = rvir[jrv]
-                    x = (rr / (rv1 + rv2) - 0.8) / 0.29
-                    if x <= 0:
-                        out[ir, irv, jrv] = 0
-                    elif x >= 1:
-                        out[ir, irv, jrv] = 1
-                    else:
-                        out[ir, irv, jrv] = 3 * x ** 2 - 2 * x ** 3
-        return out
-
-    @jit(nopython=True)
-    def prob_inner_r_(r, rvir):  # pragma: no cover
-        """
-        Jit-compiled version of calculating prob along one r,
-        taking advantage of symmetry.
-        """
-        nrv = len(rvir)
-        out = np.empty((nrv, nrv))
-        for irv, rv1 in enumerate(rvir):
-            for jrv in range(irv, nrv):
-                rv2 = rvir[jrv]
-                x = (r / (rv1 + rv2) - 0.8) / 0.29
-                if x <= 0:
-                    out[irv, jrv] = 0
-                elif x >= 1:
-                    out[irv, jrv] = 1
-                else:
-                    out[irv, jrv] = 3 * x ** 2 - 2 * x ** 3
-        return out
+            integ = np.ascontiguousarray(self.raw_integrand())  # (r,k,m)
+            return integrate_dblell(integ, self.prob, self.dlnx)
 
 
 class NgMatched(DblEllipsoid):
@@ -580,3 +437,35 @@ def cumsimps(func, dx):
     cs = np.cumsum(f1)
     cs -= rm
     return cs * dx / 3
+
+
+def compile_kernels() -> bool:
+    """
+    Compile the numba kernels of the accelerated exclusion models.
+
+    The kernels are compiled with numba's on-disk cache, so they are only truly
+    compiled once per installation (in the ``__pycache__`` of halomod, or in
+    ``NUMBA_CACHE_DIR`` if it is set); later processes load the compiled code from
+    the cache. This runs every accelerated model on a tiny problem (with both
+    scale-independent and scale-dependent bias), so that every kernel is loaded or
+    compiled up-front, rather than on first use. It is useful to call once in each
+    worker of a process pool (see :func:`halomod.functional.iter_sweep`).
+
+    Returns
+    -------
+    bool
+        Whether the kernels were compiled (i.e. whether numba is installed).
+    """
+    if not USE_NUMBA:
+        return False
+
+    m = np.logspace(10, 15, 8)
+    r = np.logspace(-1, 1, 3)
+    density = m ** -2.0
+    ifunc = np.ones((2, len(m)))
+    for bias in (np.ones_like(m), np.ones((len(r), len(m)))):
+        for kls in (DblSphere_, DblEllipsoid_, NgMatched_):
+            model = kls(m, density, ifunc, bias, r, 200.0, 1e11)
+            model.integrate()
+            model.density_mod
+    return True
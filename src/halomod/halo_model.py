@@ -12,14 +12,18 @@ The :class:`HaloModel` class is provided as an alias of :class:`TracerHaloModel`
 from scipy.interpolate import InterpolatedUnivariateSpline as spline
 import scipy.integrate as intg
 import numpy as np
-from scipy.optimize import minimize
+from scipy.optimize import brentq
+from typing import Dict, Sequence
 
 from hmf import MassFunction, cached_quantity, parameter, Cosmology
+from hmf.density_field.halofit import halofit as _hfit
+from hmf.mass_function import fitting_functions as ff
 
 # import hmf.tools as ht
 from . import tools
 from .concentration import CMRelation
 from .halo_exclusion import NoExclusion
+from .persistent_cache import persistent
 
 
 from copy import copy
@@ -68,6 +72,7 @@ class DMHaloModel(MassFunction):
         Mmin=0,
         Mmax=18,
         force_1halo_turnover=True,
+        hankel_method="vectorized",
         **hmf_kwargs,
     ):
         """
@@ -110,6 +115,9 @@ class DMHaloModel(MassFunction):
         hc_spectrum : str, {'linear', 'nonlinear', 'filtered-nl', 'filtered-lin'}
             A choice for how the halo-centre power spectrum is defined. The "filtered" options arise from eg.
             Schneider, Smith et al. (2014).
+        hankel_method : str, {'vectorized', 'loop', 'fftlog'}
+            The backend used for Hankel transforms between power spectra and
+            correlation functions. See :func:`~tools.hankel_transform`.
 
         Other Parameters
         ----------------
@@ -151,6 +159,7 @@ class DMHaloModel(MassFunction):
         self.hc_spectrum = hc_spectrum
         self.force_1halo_turnover = force_1halo_turnover
         self.colossus_params = colossus_params or {}
+        self.hankel_method = hankel_method
 
     # ===============================================================================
     # Parameters
@@ -280,9 +289,28 @@ class DMHaloModel(MassFunction):
         """Dictionary of parameters for the Exclusion model."""
         return val
 
+    @parameter("switch")
+    def hankel_method(self, val):
+        """The backend used to perform Hankel transforms."""
+        if val not in tools.HANKEL_METHODS:
+            raise ValueError(f"hankel_method must be one of {tools.HANKEL_METHODS}")
+        return val
+
     # ===========================================================================
     # Basic Quantities
     # ===========================================================================
+    @cached_quantity
+    @persistent
+    def power(self):
+        """Normalised log power spectrum [units :math:`Mpc^3/h^3`]."""
+        return super().power
+
+    @cached_quantity
+    @persistent
+    def dndm(self):
+        r"""The number density of haloes, ``len=len(m)`` [units :math:`h^4 M_\odot^{-1} Mpc^{-3}`]."""
+        return super().dndm
+
     @cached_quantity
     def _r_table(self):
         """A high-resolution, high-range table of r values for internal interpolation."""
@@ -290,6 +318,30 @@ class DMHaloModel(MassFunction):
             self._logr_table_min, self._logr_table_max, self.dr_table
         )
 
+    @cached_quantity
+    def _power_to_corr_operator(self):
+        """A precomputed Hankel transform from power spectra tabulated on ``k`` to
+        correlation functions on ``_r_table``."""
+        return tools.HankelOperator(self.k, self._r_table, "r")
+
+    def _power_to_corr(self, power_fnc):
+        """Transform a callable power spectrum to a correlation function on ``_r_table``.
+
+        Power spectra that are splines tabulated on ``k`` (or stacks of them) are
+        transformed with the cached :class:`~tools.HankelOperator` when using the
+        'vectorized' method, so that repeated transforms only cost a matrix product.
+        """
+        if (
+            self.hankel_method == "vectorized"
+            and isinstance(power_fnc, tools.ExtendedSpline)
+            and np.array_equal(power_fnc.x, self.k)
+        ):
+            return self._power_to_corr_operator(power_fnc)
+
+        return tools.hankel_transform(
+            power_fnc, self._r_table, "r", method=self.hankel_method
+        )
+
     @cached_quantity
     def colossus_cosmo(self):
         """
@@ -384,6 +436,7 @@ class DMHaloModel(MassFunction):
         return self.bias.bias()
 
     @cached_quantity
+    @persistent
     def cmz_relation(self):
         """Concentration-mass-redshift relation."""
         return self.halo_concentration.cm(self.m, self.z)
@@ -447,10 +500,14 @@ class DMHaloModel(MassFunction):
     @cached_quantity
     def linear_power_fnc(self):
         """A callable returning the linear power as a function of k (in h/Mpc)."""
+        return self._power_spline(self.power)
+
+    def _power_spline(self, power):
+        """The spline of a matter power spectrum (or a stack of them) on ``k``."""
         return tools.ExtendedSpline(
             self.k,
-            self.power,
-            lower_func=lambda k: k ** self.n,
+            power,
+            lower_func=tools.PowerLaw(self.n),
             upper_func="power_law",
             domain=(0, np.inf),
         )
@@ -458,23 +515,15 @@ class DMHaloModel(MassFunction):
     @cached_quantity
     def nonlinear_power_fnc(self):
         """A callable returning the nonlinear (halofit) power as a function of k (in h/Mpc)."""
-        return tools.ExtendedSpline(
-            self.k,
-            self.nonlinear_power,
-            lower_func=lambda k: k ** self.n,
-            upper_func="power_law",
-            domain=(0, np.inf),
-        )
+        return self._power_spline(self.nonlinear_power)
 
     @cached_quantity
+    @persistent
     def corr_linear_mm_fnc(self):
         """A callable returning the linear auto-correlation function of dark matter."""
-        corr = tools.hankel_transform(self.linear_power_fnc, self._r_table, "r")
+        corr = self._power_to_corr(self.linear_power_fnc)
         return tools.ExtendedSpline(
-            self._r_table,
-            corr,
-            lower_func="power_law",
-            upper_func=lambda x: np.zeros_like(x),
+            self._r_table, corr, lower_func="power_law", upper_func=tools._zero,
         )
 
     @cached_quantity
@@ -485,12 +534,9 @@ class DMHaloModel(MassFunction):
     @cached_quantity
     def corr_halofit_mm_fnc(self):
         """A callable returning the linear auto-correlation function of dark matter."""
-        corr = tools.hankel_transform(self.nonlinear_power_fnc, self._r_table, "r")
+        corr = self._power_to_corr(self.nonlinear_power_fnc)
         return tools.ExtendedSpline(
-            self._r_table,
-            corr,
-            lower_func="power_law",
-            upper_func=lambda x: np.zeros_like(x),
+            self._r_table, corr, lower_func="power_law", upper_func=tools._zero,
         )
 
     @cached_quantity
@@ -558,6 +604,7 @@ class DMHaloModel(MassFunction):
     # Halo Profile cached quantities
     # ===========================================================================
     @cached_quantity
+    @persistent
     def halo_profile_ukm(self):
         """Mass-normalised fourier halo profile, with shape (len(k), len(m))."""
         return self.halo_profile.u(self.k, self.m, c=self.cmz_relation)
@@ -584,16 +631,26 @@ class DMHaloModel(MassFunction):
     def power_1h_auto_matter_fnc(self):
         """A callable returning the halo model-derived nonlinear
         1-halo dark matter auto-power spectrum."""
-        u = self.halo_profile_ukm
-        integrand = self.dndm * self.m ** 3 * u ** 2
-
-        p = (
-            intg.trapz(integrand, dx=np.log(10) * self.dlog10m)
-            / self.mean_density0 ** 2
+        return self._power_1h_matter_spline(
+            self._matter_1h_integral(self.dndm, self.halo_profile_ukm ** 2)
         )
 
+    def _matter_1h_integral(self, dndm, profile):
+        """The 1-halo mass integral of the matter auto-statistics.
+
+        ``profile`` is either the square of the fourier profile or the
+        self-convolution of the profile, of shape ``(..., n, len(m))``, and ``dndm``
+        has shape ``(..., len(m))``. The result has shape ``(..., n)``. The integral
+        uses the trapezoidal rule in log mass, as a matrix product.
+        """
+        weights = dndm * self.m ** 3 * np.log(10) * self.dlog10m
+        weights[..., [0, -1]] /= 2
+        return (profile @ weights[..., None])[..., 0] / self.mean_density0 ** 2
+
+    def _power_1h_matter_spline(self, power):
+        """The spline of the 1-halo matter power (or a stack of them) on ``k``."""
         return tools.ExtendedSpline(
-            self.k, p, lower_func="power_law", upper_func="power_law"
+            self.k, power, lower_func="power_law", upper_func="power_law"
         )
 
     @property
@@ -605,25 +662,23 @@ class DMHaloModel(MassFunction):
     def corr_1h_auto_matter_fnc(self):
         """A callable returning the halo model-derived nonlinear
         1-halo dark matter auto-correlation function."""
-        if self.halo_profile.has_lam:
-            lam = self.halo_profile_lam
-            integrand = self.dndm * self.m ** 3 * lam
+        lam = self.halo_profile_lam
+        return self._corr_1h_matter_spline(
+            None if lam is None else self._matter_1h_integral(self.dndm, lam),
+            self.power_1h_auto_matter_fnc,
+        )
 
-            table = (
-                intg.trapz(integrand, dx=np.log(10) * self.dlog10m)
-                / self.mean_density0 ** 2
-                - 1
-            )
+    def _corr_1h_matter_spline(self, lam_integral, power_1h_fnc):
+        """The spline of the 1-halo matter correlation (or a stack of them) on
+        ``_r_table``, from the 1-halo integral of the profile self-convolution if the
+        profile has one, otherwise by transforming the 1-halo power."""
+        if lam_integral is not None:
+            table = lam_integral - 1
         else:
-            table = tools.hankel_transform(
-                self.power_1h_auto_matter_fnc, self._r_table, "r"
-            )
+            table = self._power_to_corr(power_1h_fnc)
 
         return tools.ExtendedSpline(
-            self._r_table,
-            table,
-            lower_func="power_law",
-            upper_func=lambda x: np.zeros_like(x),
+            self._r_table, table, lower_func="power_law", upper_func=tools._zero,
         )
 
     @property
@@ -656,7 +711,13 @@ class DMHaloModel(MassFunction):
     def corr_2h_auto_matter_fnc(self):
         """A callable returning the halo-model-derived nonlinear
         2-halo dark matter auto-correlation function."""
-        corr = tools.hankel_transform(self.power_2h_auto_matter_fnc, self._r_table, "r")
+        return self._corr_2h_matter_spline(
+            self._power_to_corr(self.power_2h_auto_matter_fnc)
+        )
+
+    def _corr_2h_matter_spline(self, corr):
+        """The spline of the 2-halo matter correlation (or a stack of them) on
+        ``_r_table``."""
         return tools.ExtendedSpline(
             self._r_table,
             corr,
@@ -666,7 +727,7 @@ class DMHaloModel(MassFunction):
                 and "filtered" not in self.hc_spectrum
             )
             else tools._zero,
-            upper_func=lambda x: np.zeros_like(x),
+            upper_func=tools._zero,
         )
 
     @property
@@ -678,10 +739,8 @@ class DMHaloModel(MassFunction):
     def corr_auto_matter_fnc(self):
         """A callable returning the halo-model-derived
         nonlinear dark matter auto-correlation function."""
-        return (
-            lambda r: self.corr_1h_auto_matter_fnc(r)
-            + self.corr_2h_auto_matter_fnc(r)
-            + 1
+        return tools.SumOfTerms(
+            self.corr_1h_auto_matter_fnc, self.corr_2h_auto_matter_fnc, constant=1
         )
 
     @property
@@ -693,9 +752,9 @@ class DMHaloModel(MassFunction):
     def power_auto_matter_fnc(self):
         """A callable returning the halo-model-derived
         nonlinear dark power auto-power spectrum."""
-        return lambda k: self.power_1h_auto_matter_fnc(
-            k
-        ) + self.power_2h_auto_matter_fnc(k)
+        return tools.SumOfTerms(
+            self.power_1h_auto_matter_fnc, self.power_2h_auto_matter_fnc
+        )
 
     @property
     def power_auto_matter(self):
@@ -716,6 +775,237 @@ class DMHaloModel(MassFunction):
         b = intg.simps(integrand, self.m)
         return b / self.rho_gtm[0]
 
+    def compute_redshift_batch(
+        self, z: Sequence[float], which: Sequence[str] = ("power_auto_matter",),
+    ) -> Dict[str, np.ndarray]:
+        """Compute quantities at each of an array of redshifts.
+
+        Only the redshift-dependent ingredients -- the growth factor, mass function,
+        concentrations and halo profiles -- are computed for each redshift, and they
+        are combined for all redshifts at once: the profiles of several redshifts are
+        found in each call of the profile, and the mass integrals, splines and
+        Hankel transforms act on stacks with a leading redshift axis. The model itself
+        is not updated.
+
+        The batched calculation is implemented for the quantities in
+        :attr:`_redshift_batch_statistics`, with an unfiltered halo-centre power
+        spectrum, no mass-definition conversion of the mass function and (for
+        correlation functions) the 'vectorized' Hankel method. Otherwise, the model
+        is updated with each redshift in turn, and its original redshift restored
+        afterwards.
+
+        Parameters
+        ----------
+        z
+            The redshifts.
+        which
+            The names of the quantities to compute, eg. ``"power_auto_matter"`` or
+            ``"dndm"``.
+
+        Returns
+        -------
+        dict
+            The value of each requested quantity, with a leading redshift axis.
+
+        Examples
+        --------
+        >>> hm = DMHaloModel()
+        >>> power = hm.compute_redshift_batch([0, 0.5, 1])["power_auto_matter"]
+        >>> power.shape
+        (3, 80)
+        """
+        z = np.atleast_1d(np.asarray(z, dtype=float))
+        for name in which:
+            if not hasattr(type(self), name):
+                raise ValueError(f"{name} is not a quantity of {type(self).__name__}")
+
+        corr = any(name.startswith("corr_") for name in which)
+        if set(which) - set(self._redshift_batch_statistics) or not (
+            self._redshift_batch_supported
+            and (self.hankel_method == "vectorized" or not corr)
+        ):
+            original = self.z
+            out = {name: [] for name in which}
+            try:
+                for zz in z:
+                    self.update(z=zz)
+                    for name in which:
+                        out[name].append(getattr(self, name))
+            finally:
+                self.update(z=original)
+            return {name: np.array(val) for name, val in out.items()}
+
+        batch = self._redshift_batch(
+            z, corr=corr, keep_profiles="halo_profile_ukm" in which
+        )
+        return {name: batch[name] for name in which}
+
+    _redshift_batch_statistics = (
+        "growth_factor",
+        "power",
+        "nonlinear_power",
+        "dndm",
+        "cmz_relation",
+        "halo_profile_ukm",
+        "power_1h_auto_matter",
+        "power_2h_auto_matter",
+        "power_auto_matter",
+        "corr_1h_auto_matter",
+        "corr_2h_auto_matter",
+        "corr_auto_matter",
+    )
+
+    # The quantities that the batched calculation re-implements, so that a subclass
+    # overriding any of them is computed by updating the redshift instead.
+    _redshift_batch_quantities = (
+        "growth_factor",
+        "power",
+        "nonlinear_power",
+        "dndm",
+        "hmf",
+        "cmz_relation",
+        "halo_profile_ukm",
+        "halo_profile_lam",
+        "linear_power_fnc",
+        "nonlinear_power_fnc",
+        "_power_halo_centres_fnc",
+        "power_1h_auto_matter_fnc",
+        "power_2h_auto_matter_fnc",
+        "corr_1h_auto_matter_fnc",
+        "corr_2h_auto_matter_fnc",
+    )
+
+    @property
+    def _redshift_batch_supported(self) -> bool:
+        """Whether the batched calculation over redshift reproduces this model."""
+        mdef = self.hmf.measured_mass_definition
+        return (
+            self.hc_spectrum in ("linear", "nonlinear")
+            and not isinstance(self.hmf, ff.Behroozi)
+            and (mdef is None or mdef == self.mdef or self.disable_mass_conversion)
+            and all(
+                getattr(type(self), name) is getattr(DMHaloModel, name)
+                for name in self._redshift_batch_quantities
+            )
+        )
+
+    def _redshift_batch(self, z, corr=True, keep_profiles=False):
+        """The quantities of :attr:`_redshift_batch_statistics` at each redshift.
+
+        The correlation functions are only computed if ``corr`` is set, and the
+        fourier profiles only kept if ``keep_profiles`` is set.
+        """
+        nz, nm = len(z), len(self.m)
+
+        if self.use_splined_growth:
+            growth = self._growth_factor_fn(z)
+        else:
+            growth = np.array([self.growth.growth_factor(zz) for zz in z])
+
+        # As for the mass function of hmf, with the fitting function at each redshift.
+        nu = (self.delta_c / (self._sigma_0 * growth[:, None])) ** 2
+        fsigma = np.array(
+            [
+                self.hmf_model(
+                    m=self.m,
+                    nu2=nn,
+                    z=zz,
+                    mass_definition=self.mdef,
+                    cosmo=self.cosmo,
+                    delta_c=self.delta_c,
+                    n_eff=self.n_eff,
+                    **self.hmf_params,
+                ).fsigma
+                for zz, nn in zip(z, nu)
+            ]
+        )
+        dndm = fsigma * self.mean_density0 * np.abs(self._dlnsdlnm) / self.m ** 2
+
+        # The concentration-mass relation is evaluated at the redshift it is given.
+        c = np.array([self.halo_concentration.cm(self.m, zz) for zz in z])
+
+        # Halo radii depend on redshift only through the overdensity of the mass
+        # definition, so the profiles at every redshift are those of the profile at
+        # the model's redshift, of masses rescaled to the same radii.
+        delta = [
+            self.halo_profile_model(
+                cm_relation=None, mdef=self.mdef, z=zz, **self.halo_profile_params
+            ).delta_halo
+            for zz in z
+        ]
+        m = np.outer(self.halo_profile.delta_halo / np.array(delta), self.m)
+
+        def profiles(fnc, x, sl):
+            """A profile method at x, for the redshifts in sl, as (z, x, m)."""
+            out = fnc(x, m[sl].ravel(), c=c[sl].ravel())
+            return np.reshape(out, (len(x), -1, nm)).transpose(1, 0, 2)
+
+        # The profiles of several redshifts are found in each call, but only as many
+        # as keep the (large) temporary arrays of the profiles fast to compute, and
+        # they are reduced to their mass integrals straight away.
+        lam = corr and self.halo_profile.has_lam
+        power_1h = np.empty((nz, len(self.k)))
+        lam_1h = np.empty((nz, len(self._r_table))) if lam else None
+        ukm = []
+        step = max(1, 1024 // nm)
+        for i in range(0, nz, step):
+            sl = slice(i, i + step)
+            u = profiles(self.halo_profile.u, self.k, sl)
+            power_1h[sl] = self._matter_1h_integral(dndm[sl], u ** 2)
+            if keep_profiles:
+                ukm.append(u)
+            if lam:
+                lam_1h[sl] = self._matter_1h_integral(
+                    dndm[sl], profiles(self.halo_profile.lam, self._r_table, sl)
+                )
+
+        # As for the (nonlinear) power of hmf, at each redshift.
+        power = growth[:, None] ** 2 * self._power0
+        nonlinear_power = np.array(
+            [
+                self.k ** -3
+                * _hfit(
+                    self.k,
+                    self.k ** 3 * p / (2 * np.pi ** 2),
+                    self.sigma_8,
+                    zz,
+                    self.cosmo,
+                    self.takahashi,
+                )
+                * (2 * np.pi ** 2)
+                for zz, p in zip(z, power)
+            ]
+        )
+
+        power_1h = self._power_1h_matter_spline(power_1h)
+        power_2h = self._power_spline(
+            power if self.hc_spectrum == "linear" else nonlinear_power
+        )
+        out = {
+            "growth_factor": growth,
+            "power": power,
+            "nonlinear_power": nonlinear_power,
+            "dndm": dndm,
+            "cmz_relation": c,
+            "halo_profile_ukm": np.concatenate(ukm) if keep_profiles else None,
+            "power_1h_auto_matter": power_1h(self.k_hm),
+            "power_2h_auto_matter": power_2h(self.k_hm),
+        }
+        out["power_auto_matter"] = (
+            out["power_1h_auto_matter"] + out["power_2h_auto_matter"]
+        )
+
+        if corr:
+            corr_1h = self._corr_1h_matter_spline(lam_1h, power_1h)
+            corr_2h = self._corr_2h_matter_spline(self._power_to_corr(power_2h))
+            out["corr_1h_auto_matter"] = corr_1h(self.r)
+            out["corr_2h_auto_matter"] = corr_2h(self.r)
+            out["corr_auto_matter"] = (
+                out["corr_1h_auto_matter"] + out["corr_2h_auto_matter"] + 1
+            )
+
+        return out
+
 
 class TracerHaloModel(DMHaloModel):
     """
@@ -777,7 +1067,7 @@ class TracerHaloModel(DMHaloModel):
         super().__init__(**halomodel_kwargs)
 
         # Initially save parameters to the class.
-        self.hod_params = hod_params
+        self.hod_params = dict(hod_params)  # Copy, since it is updated in-place.
         self.hod_model = hod_model
         self.tracer_profile_model, self.tracer_profile_params = (
             tracer_profile_model,
@@ -970,12 +1260,16 @@ class TracerHaloModel(DMHaloModel):
     @cached_quantity
     def hod(self):
         """A class representing the HOD"""
+        return self._make_hod(self.hod_params)
+
+    def _make_hod(self, hod_params):
+        """An instance of the HOD model of this halo model, with given parameters."""
         return self.hod_model(
             cosmo=self.cosmo,
             cm_relation=self.tracer_concentration,
             profile=self.tracer_profile,
             mdef=self.mdef,
-            **self.hod_params,
+            **hod_params,
         )
 
     # ===========================================================================
@@ -1037,6 +1331,22 @@ class TracerHaloModel(DMHaloModel):
         else:
             return None
 
+    @cached_quantity
+    def _mass_quadrature(self):
+        """Quadrature weights for integrals over the full mass grid."""
+        return tools.get_spline_quadrature(self.m)
+
+    @cached_quantity
+    def _tracer_mass_quadrature(self):
+        """Quadrature weights for integrals over the tracer population.
+
+        These integrate over the mass grid from :attr:`tracer_mmin`, so that each such
+        integral is a dot product (see :class:`~halomod.tools.SplineQuadrature`). They
+        are cached on the mass grid and limit, so are shared between models (or HOD
+        parameters) with the same values.
+        """
+        return tools.get_spline_quadrature(self.m, xmin=self.tracer_mmin)
+
     # ===========================================================================
     # Derived HOD Quantities
     # ===========================================================================
@@ -1049,9 +1359,7 @@ class TracerHaloModel(DMHaloModel):
         constructor, that value can be found as :meth:`.tracer_density`. It should be
         very close to this value.
         """
-        return tools.spline_integral(
-            self.m, self.dndm * self._total_occupation, xmin=self.tracer_mmin
-        )
+        return self._tracer_mass_quadrature(self.dndm * self._total_occupation)
 
     @cached_quantity
     def mean_tracer_den_unit(self):
@@ -1066,10 +1374,8 @@ class TracerHaloModel(DMHaloModel):
         The tracer occupation-weighted halo bias factor (Tinker 2005).
         """
         # Integrand is just the density of galaxies at mass m by bias
-        b = tools.spline_integral(
-            self.m,
-            self.dndm * self._total_occupation * self.halo_bias,
-            xmin=self.tracer_mmin,
+        b = self._tracer_mass_quadrature(
+            self.dndm * self._total_occupation * self.halo_bias
         )
         return b / self.mean_tracer_den
 
@@ -1079,9 +1385,7 @@ class TracerHaloModel(DMHaloModel):
         Average host-halo mass (in log10 units).
         """
         # Integrand is just the density of galaxies at mass m by m
-        m = tools.spline_integral(
-            self.m, self.m * self.dndm * self._total_occupation, xmin=self.tracer_mmin
-        )
+        m = self._tracer_mass_quadrature(self.m * self.dndm * self._total_occupation)
 
         return np.log10((m / self.mean_tracer_den))
 
@@ -1092,9 +1396,7 @@ class TracerHaloModel(DMHaloModel):
         Note: this may not exist for every kind of tracer.
         """
         # Integrand is just the density of satellite galaxies at mass m
-        s = tools.spline_integral(
-            self.m, self.dndm * self.satellite_occupation, xmin=self.tracer_mmin
-        )
+        s = self._tracer_mass_quadrature(self.dndm * self.satellite_occupation)
         return s / self.mean_tracer_den
 
     @cached_quantity
@@ -1114,6 +1416,7 @@ class TracerHaloModel(DMHaloModel):
     # Tracer Profile cached quantities
     # ===========================================================================
     @cached_quantity
+    @persistent
     def tracer_profile_ukm(self):
         """The mass-normalised fourier density profile of the tracer, shape (len(k), len(m))."""
         return self.tracer_profile.u(self.k, self.m, c=self.tracer_cmz_relation)
@@ -1138,28 +1441,347 @@ class TracerHaloModel(DMHaloModel):
     # ===========================================================================
     # 2-point tracer-tracer (HOD) statistics
     # ===========================================================================
+    def compute_spectra(
+        self,
+        which: Sequence[str] = (
+            "power_auto_tracer",
+            "power_cross_tracer_matter",
+            "power_auto_matter",
+        ),
+    ) -> Dict[str, np.ndarray]:
+        """Compute several two-point statistics in one go.
+
+        The mass integrals of the tracer 1-halo auto terms, and those of the tracer
+        cross terms, are each computed together in a single pass (rather than one per
+        term), after which each requested statistic is evaluated, populating the
+        cached quantities it depends on.
+
+        Parameters
+        ----------
+        which
+            The names of the statistics to compute, eg. ``"power_auto_tracer"`` or
+            ``"corr_cross_tracer_matter"``.
+
+        Returns
+        -------
+        dict
+            The value of each requested statistic.
+        """
+        for name in which:
+            if not name.startswith(("power_", "corr_")) or not hasattr(
+                type(self), name
+            ):
+                raise ValueError(
+                    f"{name} is not a two-point statistic of {type(self).__name__}"
+                )
+
+        if any(name.endswith("auto_tracer") for name in which):
+            self._tracer_auto_mass_integrals
+        if any("cross_tracer" in name for name in which):
+            self._tracer_cross_mass_integrals
+
+        return {name: getattr(self, name) for name in which}
+
+    def compute_hod_batch(
+        self,
+        hod_params,
+        names: [Sequence[str], None] = None,
+        which: Sequence[str] = ("power_auto_tracer", "corr_auto_tracer"),
+    ) -> Dict[str, np.ndarray]:
+        """Compute tracer statistics for a batch of HOD parameter sets.
+
+        Everything upstream of the HOD (the mass function, halo bias and tracer
+        profiles) is computed once, and the HOD-dependent mass integrals of all the
+        sets are performed together as array operations. This is useful for eg.
+        evaluating all walkers of an ensemble sampler at once.
+
+        The batched integrals are only implemented for the tracer auto-statistics,
+        without halo exclusion or scale-dependent bias, using the 'vectorized' Hankel
+        method and with no fixed ``tracer_density``. Otherwise, the model is updated
+        with each set in turn, and its original HOD parameters restored afterwards.
+
+        Parameters
+        ----------
+        hod_params
+            Either a sequence of dictionaries of HOD parameters, or a 2D array with one
+            set of parameters per row. Each set updates the current :attr:`hod_params`.
+        names
+            The names of the HOD parameters in each column of ``hod_params``, if it is
+            an array.
+        which
+            The names of the statistics to compute, eg. ``"power_auto_tracer"`` or
+            ``"mean_tracer_den"``.
+
+        Returns
+        -------
+        dict
+            The value of each requested statistic, with a leading axis over the sets.
+
+        Examples
+        --------
+        >>> hm = TracerHaloModel()
+        >>> out = hm.compute_hod_batch(
+        >>>     np.array([[11.5, 12.5], [12.0, 13.0]]), names=["M_min", "M_1"]
+        >>> )
+        >>> out["power_auto_tracer"].shape
+        (2, 80)
+        """
+        if names is not None:
+            hod_params = [dict(zip(names, row)) for row in np.atleast_2d(hod_params)]
+        hod_params = [{**self.hod_params, **p} for p in hod_params]
+
+        for name in which:
+            if not hasattr(type(self), name):
+                raise ValueError(f"{name} is not a quantity of {type(self).__name__}")
+
+        if (
+            set(which) - set(self._hod_batch_statistics)
+            or self.exclusion_model is not NoExclusion
+            or self.sd_bias_model is not None
+            or self.hankel_method != "vectorized"
+            or self.tracer_density is not None
+        ):
+            original, density = dict(self.hod_params), self.tracer_density
+            out = {name: [] for name in which}
+            try:
+                for params in hod_params:
+                    self.update(hod_params=params)
+                    for name in which:
+                        out[name].append(getattr(self, name))
+            finally:
+                # An empty dict clears the parameters, rather than updating them.
+                self.update(hod_params={})
+                self.update(hod_params=original, tracer_density=density)
+            return {name: np.array(val) for name, val in out.items()}
+
+        batch = self._hod_batch(hod_params)
+        return {name: batch[name] for name in which}
+
+    _hod_batch_statistics = (
+        "mean_tracer_den",
+        "power_1h_auto_tracer",
+        "power_2h_auto_tracer",
+        "power_auto_tracer",
+        "corr_1h_auto_tracer",
+        "corr_2h_auto_tracer",
+        "corr_auto_tracer",
+    )
+
     @cached_quantity
-    def power_1h_ss_auto_tracer_fnc(self):
-        """A callable returning the satellite-satellite part of
-        the 1-halo term of the tracer auto-power spectrum.
+    def _power_to_corr_fine_operator(self):
+        """A precomputed Hankel transform from power spectra tabulated on ``k`` to
+        correlation functions on ``_r_table``, with the fine node spacing of the 2-halo
+        tracer correlation."""
+        return tools.HankelOperator(self.k, self._r_table, "r", h=1e-4)
+
+    def _hod_batch(self, hod_params):
+        """The tracer auto-statistics of each of a sequence of HOD parameter sets."""
+        m = self.m
+        dndm = self.dndm
+        ut = self.tracer_profile_ukm
+        quad = self._mass_quadrature
+
+        hods = [self._make_hod(params) for params in hod_params]
+
+        # The occupations and mass limits of each set, as for a single model.
+        sharp = np.array(
+            [
+                hod.sharp_cut and (hod._central or hod.central_condition_inherent)
+                for hod in hods
+            ]
+        )
+        mmin = np.array(
+            [np.log10(m.min()) if hod.mmin is None else hod.mmin for hod in hods]
+        )
 
-        Note: May not exist for every kind of tracer.
+        def occupation(f):
+            # Some occupations are scalars (eg. no centrals), so broadcast to m.
+            return np.array(
+                [
+                    np.broadcast_to(np.asarray(f(hod), dtype=float), m.shape)
+                    for hod in hods
+                ]
+            )
+
+        cen = np.where(
+            sharp[:, None], 1.0, occupation(lambda hod: hod.central_occupation(m))
+        )
+        sat = occupation(lambda hod: hod.satellite_occupation(m))
+        total = occupation(lambda hod: hod.total_occupation(m))
+        ss_pairs = occupation(lambda hod: hod.ss_pairs(m))
+        cs_pairs = occupation(lambda hod: hod.cs_pairs(m))
+        tracer_mmin = np.where(sharp, 10 ** mmin, m.min())
+
+        tracer_weights = quad.cumulative_weights(tracer_mmin)
+        mean_den = np.sum(tracer_weights * dndm * (cen + sat), axis=-1)
+
+        def integrate(f, g, mmin_k, mmin_set):
+            """Integrate f(k, m) * g(set, m) over m from max(mmin_k, mmin_set)."""
+            by_set = f @ (quad.cumulative_weights(mmin_set) * g).T
+            if mmin_k is None:
+                return by_set.T
+            by_k = (f * quad.cumulative_weights(mmin_k)) @ g.T
+            return np.where(mmin_k[:, None] >= mmin_set, by_k, by_set).T
+
+        if self.force_1halo_turnover:
+            r = np.pi / self.k / 10  # The 10 is a complete heuristic hack.
+            dens_min = 4 * np.pi * self.mean_density0 * self.halo_overdensity_mean / 3
+            mmin_ss = dens_min * r ** 3
+            with np.errstate(over="ignore"):
+                mmin_cs = 10 ** (dens_min * r ** 3)
+        else:
+            mmin_ss = mmin_cs = None
+
+        with np.errstate(over="ignore"):
+            ss = integrate(ut ** 2, dndm * ss_pairs, mmin_ss, tracer_mmin)
+            cs = integrate(ut, 2 * dndm * cs_pairs, mmin_cs, 10 ** mmin)
+        ss /= mean_den[:, None] ** 2
+        cs /= mean_den[:, None] ** 2
+
+        lower = tools._zero if self.force_1halo_turnover else "boundary"
+        power_ss = tools.ExtendedSpline(
+            self.k, ss, lower_func=lower, upper_func="power_law"
+        )
+        with warnings.catch_warnings():
+            # Sets whose cen-sat term is not positive at high k are zeroed there.
+            warnings.simplefilter("ignore", UserWarning)
+            power_cs = tools.ExtendedSpline(
+                self.k, cs, lower_func=lower, upper_func="power_law"
+            )
+
+        # The 2-halo term, integrated over the mass range of each set's tracers.
+        integrand = dndm * self.halo_bias * m * total / mean_den[:, None]
+        intg_2h = np.empty((len(hods), len(self.k)))
+        for i, mm in enumerate(mmin):
+            mask = m >= 10 ** mm
+            intg_2h[i] = intg.simps(
+                ut[:, mask] * integrand[i, mask], dx=np.log(m[1] / m[0])
+            )
+        power_2h = tools.ExtendedSpline(
+            self.k,
+            intg_2h ** 2 * self._power_halo_centres_fnc(self.k),
+            lower_func=self.linear_power_fnc,
+            match_lower=True,
+            upper_func="power_law"
+            if "filtered" not in self.hc_spectrum
+            else tools._zero,
+        )
+
+        # The correlation functions, on _r_table.
+        weights = tracer_weights * dndm
+        if self.tracer_profile.has_lam:
+            central = np.array([hod._central for hod in hods])
+            weights = weights * np.where(central[:, None], cen, 1)
+            corr_1h = (weights * ss_pairs) @ self.tracer_profile_lam.T
+        else:
+            corr_1h = 0
+        corr_1h = corr_1h + (weights * 2 * cs_pairs) @ self.tracer_profile_rho.T
+        corr_1h /= mean_den[:, None] ** 2
+        corr_1h = tools.ExtendedSpline(
+            self._r_table, corr_1h, lower_func="power_law", upper_func=tools._zero
+        )(self.r)
+
+        if not self.tracer_profile.has_lam:
+            corr_1h += tools.ExtendedSpline(
+                self._r_table,
+                self._power_to_corr_operator(power_ss),
+                lower_func="power_law",
+                upper_func=tools._zero,
+            )(self.r)
+
+        corr_2h = tools.ExtendedSpline(
+            self._r_table,
+            self._power_to_corr_fine_operator(power_2h),
+            lower_func="power_law",
+            upper_func=tools._zero,
+        )(self.r)
+
+        power_1h = power_cs(self.k_hm) + power_ss(self.k_hm)
+        return {
+            "mean_tracer_den": mean_den,
+            "power_1h_auto_tracer": power_1h,
+            "power_2h_auto_tracer": power_2h(self.k_hm),
+            "power_auto_tracer": power_1h + power_2h(self.k_hm),
+            "corr_1h_auto_tracer": corr_1h,
+            "corr_2h_auto_tracer": corr_2h,
+            "corr_auto_tracer": corr_1h + corr_2h,
+        }
+
+    @cached_quantity
+    def _tracer_auto_mass_integrals(self):
+        """The mass integrals of the 1-halo tracer auto terms ("ss" and "cs"), at each k.
+
+        Both terms are contracted against the mass quadrature weights together. When
+        their lower mass limit depends on k (the 1-halo turnover), they are contracted
+        against the cumulative weights in a single pass.
         """
-        integ = self.tracer_profile_ukm ** 2 * self.dndm * self.hod.ss_pairs(self.m)
+        ut = self.tracer_profile_ukm
+        dndm = self.dndm
+
+        ss = ut ** 2 * dndm * self.hod.ss_pairs(self.m)
+        cs = 2 * dndm * self.hod.cs_pairs(self.m) * ut
 
+        # Integrate the variable-limit terms from each k's own minimum mass.
         if self.force_1halo_turnover:
+            dens_min = 4 * np.pi * self.mean_density0 * self.halo_overdensity_mean / 3
             r = np.pi / self.k / 10  # The 10 is a complete heuristic hack.
-            mmin = (
-                4 * np.pi * r ** 3 * self.mean_density0 * self.halo_overdensity_mean / 3
+            mmin_ss = np.maximum(dens_min * r ** 3, self._tracer_mass_quadrature.xmin)
+            mmin_cs = np.maximum(self.hod.mmin, dens_min * r ** 3)
+            with np.errstate(over="ignore"):
+                ss, cs = self._mass_quadrature.cumulative(
+                    np.array([ss, cs]), np.array([mmin_ss, 10 ** mmin_cs])
+                )
+            return {"ss": ss, "cs": cs}
+
+        return {
+            "ss": self._tracer_mass_quadrature(ss),
+            "cs": self._mass_quadrature.cumulative(
+                cs, np.full_like(self.k, 10 ** self.hod.mmin)
+            ),
+        }
+
+    @cached_quantity
+    def _tracer_cross_mass_integrals(self):
+        """The tracer mass integrals of the 1- and 2-halo tracer-matter cross terms.
+
+        These are the HOD-dependent parts of the cross terms, which share the tracer
+        profile and occupations and are contracted against the tracer quadrature
+        weights together. The matter part of the 2-halo term is
+        :attr:`_matter_bias_mass_integral`.
+        """
+        ut = self.tracer_profile_ukm
+        uh = self.halo_profile_ukm
+        dndm = self.dndm
+
+        cross_1h, cross_2h = self._tracer_mass_quadrature(
+            np.array(
+                [
+                    dndm
+                    * (
+                        uh * ut * self._total_occupation * self.m
+                        + uh * self.satellite_occupation
+                    ),
+                    dndm * self.halo_bias * self._total_occupation * ut,
+                ]
             )
-            mask = np.outer(self.m, np.ones_like(self.k)) < mmin
-            integ[mask.T] = 0
+        )
+        return {"cross_1h": cross_1h, "cross_2h_tracer": cross_2h}
+
+    @cached_quantity
+    def _matter_bias_mass_integral(self):
+        """The (HOD-independent) mass integral of the bias of the matter, at each k."""
+        return self._mass_quadrature(
+            self.dndm * self.halo_bias * self.m * self.halo_profile_ukm
+        )
 
-        p = np.zeros_like(self.k)
-        for i, f in enumerate(integ):
-            p[i] = tools.spline_integral(self.m, f, xmin=self.tracer_mmin)
+    @cached_quantity
+    def power_1h_ss_auto_tracer_fnc(self):
+        """A callable returning the satellite-satellite part of
+        the 1-halo term of the tracer auto-power spectrum.
 
-        p /= self.mean_tracer_den ** 2
+        Note: May not exist for every kind of tracer.
+        """
+        p = self._tracer_auto_mass_integrals["ss"] / self.mean_tracer_den ** 2
 
         return tools.ExtendedSpline(
             self.k,
@@ -1187,17 +1809,13 @@ class TracerHaloModel(DMHaloModel):
 
         ss_pairs = self.hod.ss_pairs(self.m)
         if self.tracer_profile.has_lam:
-            c = np.zeros_like(self._r_table)
-            for i, lam in enumerate(self.tracer_profile_lam):
-                c[i] = tools.spline_integral(
-                    self.m, lam * self.dndm * ss_pairs, xmin=self.tracer_mmin
-                )
+            c = self._tracer_mass_quadrature(
+                self.tracer_profile_lam * self.dndm * ss_pairs
+            )
             c = c / self.mean_tracer_den ** 2 - 1
 
         else:
-            c = tools.hankel_transform(
-                self.power_1h_ss_auto_tracer_fnc, self._r_table, "r"
-            )
+            c = self._power_to_corr(self.power_1h_ss_auto_tracer_fnc)
         return tools.ExtendedSpline(
             self._r_table, c, lower_func="power_law", upper_func=tools._zero
         )
@@ -1219,22 +1837,7 @@ class TracerHaloModel(DMHaloModel):
 
         Note: May not exist for every kind of tracer.
         """
-        c = np.zeros_like(self.k)
-        dens_min = 4 * np.pi * self.mean_density0 * self.halo_overdensity_mean / 3
-
-        cs_pairs = self.hod.cs_pairs(self.m)
-        for i, (k, u) in enumerate(zip(self.k, self.tracer_profile_ukm)):
-            intg = self.dndm * 2 * cs_pairs * u
-
-            if self.force_1halo_turnover:
-                r = np.pi / k / 10  # The 10 is a complete heuristic hack.
-                mmin = max(self.hod.mmin, dens_min * r ** 3)
-            else:
-                mmin = self.hod.mmin
-
-            c[i] = tools.spline_integral(self.m, intg, xmin=10 ** mmin)
-
-        c /= self.mean_tracer_den ** 2
+        c = self._tracer_auto_mass_integrals["cs"] / self.mean_tracer_den ** 2
 
         return tools.ExtendedSpline(
             self.k,
@@ -1258,13 +1861,10 @@ class TracerHaloModel(DMHaloModel):
 
         Note: May not exist for every kind of tracer.
         """
-        c = np.zeros_like(self._r_table)
         cs_pairs = self.hod.cs_pairs(self.m)
-        for i, rho in enumerate(self.tracer_profile_rho):
-            c[i] = tools.spline_integral(
-                self.m, self.dndm * 2 * cs_pairs * rho, xmin=self.tracer_mmin
-            )
-
+        c = self._tracer_mass_quadrature(
+            self.dndm * 2 * cs_pairs * self.tracer_profile_rho
+        )
         c = c / self.mean_tracer_den ** 2 - 1
 
         return tools.ExtendedSpline(
@@ -1284,8 +1884,8 @@ class TracerHaloModel(DMHaloModel):
         """
         A callable returning the total 1-halo term of the tracer auto power spectrum.
         """
-        return lambda k: (
-            self.power_1h_cs_auto_tracer_fnc(k) + self.power_1h_ss_auto_tracer_fnc(k)
+        return tools.SumOfTerms(
+            self.power_1h_cs_auto_tracer_fnc, self.power_1h_ss_auto_tracer_fnc
         )
 
     @property
@@ -1297,32 +1897,32 @@ class TracerHaloModel(DMHaloModel):
     def corr_1h_auto_tracer_fnc(self):
         """A callable returning the 1-halo term of the tracer auto correlations."""
         if self.tracer_profile.has_lam:
-            c = np.zeros_like(self._r_table)
-
             ss_pairs = self.hod.ss_pairs(self.m)
             cs_pairs = self.hod.cs_pairs(self.m)
-            for i, (rho, lam) in enumerate(
-                zip(self.tracer_profile_rho, self.tracer_profile_lam)
-            ):
-                c[i] = tools.spline_integral(
-                    self.m,
-                    self.dndm
-                    * (ss_pairs * lam + 2 * cs_pairs * rho)
-                    * (self._central_occupation if self.hod._central else 1),
-                    xmin=self.tracer_mmin,
+            c = self._tracer_mass_quadrature(
+                self.dndm
+                * (
+                    ss_pairs * self.tracer_profile_lam
+                    + 2 * cs_pairs * self.tracer_profile_rho
                 )
-
+                * (self._central_occupation if self.hod._central else 1)
+            )
             c /= self.mean_tracer_den ** 2
 
         else:
             try:
-                return (
-                    lambda r: self.corr_1h_cs_auto_tracer_fnc(r)
-                    + self.corr_1h_ss_auto_tracer_fnc(r)
-                    + 1
+                return tools.SumOfTerms(
+                    self.corr_1h_cs_auto_tracer_fnc,
+                    self.corr_1h_ss_auto_tracer_fnc,
+                    constant=1,
                 )
             except AttributeError:
-                c = tools.hankel_transform(self.power_1h_auto_tracer_fnc, self.r, "r")
+                c = tools.hankel_transform(
+                    self.power_1h_auto_tracer_fnc,
+                    self.r,
+                    "r",
+                    method=self.hankel_method,
+                )
 
         return tools.ExtendedSpline(
             self._r_table, c, lower_func="power_law", upper_func=tools._zero
@@ -1373,37 +1973,19 @@ class TracerHaloModel(DMHaloModel):
 
         phh = self._power_halo_centres_fnc(self.k)
 
-        if intg.ndim == 2:
-            p = [
-                tools.ExtendedSpline(
-                    self.k,
-                    x * phh,
-                    lower_func=self.linear_power_fnc,
-                    match_lower=True,
-                    upper_func="power_law"
-                    if (
-                        self.exclusion_model == NoExclusion
-                        and "filtered" not in self.hc_spectrum
-                    )
-                    else tools._zero,
-                )
-                for i, x in enumerate(intg)
-            ]
-        else:
-            p = tools.ExtendedSpline(
-                self.k,
-                intg * phh,
-                lower_func=self.linear_power_fnc,
-                match_lower=True,
-                upper_func="power_law"
-                if (
-                    self.exclusion_model == NoExclusion
-                    and "filtered" not in self.hc_spectrum
-                )
-                else tools._zero,
+        # If intg is 2D, this is a stack of power spectra, one per scale in _r_table.
+        return tools.ExtendedSpline(
+            self.k,
+            intg * phh,
+            lower_func=self.linear_power_fnc,
+            match_lower=True,
+            upper_func="power_law"
+            if (
+                self.exclusion_model == NoExclusion
+                and "filtered" not in self.hc_spectrum
             )
-
-        return p
+            else tools._zero,
+        )
 
     @property
     def power_2h_auto_tracer(self):
@@ -1414,7 +1996,11 @@ class TracerHaloModel(DMHaloModel):
 
         # Otherwise, first calculate the correlation function.
         out = tools.hankel_transform(
-            self.corr_2h_auto_tracer_fnc, self.k_hm, "k", h=0.001
+            self.corr_2h_auto_tracer_fnc,
+            self.k_hm,
+            "k",
+            h=0.001,
+            method=self.hankel_method,
         )
 
         # Everything below about k=1e-2 is essentially just the linear power biased,
@@ -1436,7 +2022,11 @@ class TracerHaloModel(DMHaloModel):
         # Need to set h smaller here because this might need to be transformed back
         # to power.
         corr = tools.hankel_transform(
-            self._power_2h_auto_tracer_primitive, self._r_table, "r", h=1e-4
+            self._power_2h_auto_tracer_primitive,
+            self._r_table,
+            "r",
+            h=1e-4,
+            method=self.hankel_method,
         )
 
         # modify by the new density. This step is *extremely* sensitive to the exact
@@ -1467,8 +2057,8 @@ class TracerHaloModel(DMHaloModel):
     @cached_quantity
     def corr_auto_tracer_fnc(self):
         """A callable returning the tracer auto correlation function."""
-        return lambda r: self.corr_1h_auto_tracer_fnc(r) + self.corr_2h_auto_tracer_fnc(
-            r
+        return tools.SumOfTerms(
+            self.corr_1h_auto_tracer_fnc, self.corr_2h_auto_tracer_fnc
         )
 
     @property
@@ -1485,21 +2075,8 @@ class TracerHaloModel(DMHaloModel):
         A callable returning the total 1-halo cross-power spectrum
         between tracer and matter.
         """
-        p = np.zeros_like(self.k)
-        for i, (ut, uh) in enumerate(
-            zip(self.tracer_profile_ukm, self.halo_profile_ukm)
-        ):
-            p[i] = tools.spline_integral(
-                self.m,
-                self.dndm
-                * (
-                    uh * ut * self._total_occupation * self.m
-                    + uh * self.satellite_occupation
-                ),
-                xmin=self.tracer_mmin,
-            )
-
-        p /= self.mean_tracer_den * self.mean_density
+        p = self._tracer_cross_mass_integrals["cross_1h"]
+        p = p / (self.mean_tracer_den * self.mean_density)
         return tools.ExtendedSpline(
             self.k, p, lower_func="power_law", upper_func="power_law"
         )
@@ -1516,9 +2093,7 @@ class TracerHaloModel(DMHaloModel):
     def corr_1h_cross_tracer_matter_fnc(self):
         """A callable returning the 1-halo term of the cross correlation
         between tracer and matter."""
-        corr = tools.hankel_transform(
-            self.power_1h_cross_tracer_matter_fnc, self._r_table, "r"
-        )
+        corr = self._power_to_corr(self.power_1h_cross_tracer_matter_fnc)
         return tools.ExtendedSpline(
             self._r_table, corr, lower_func="power_law", upper_func=tools._zero
         )
@@ -1533,19 +2108,8 @@ class TracerHaloModel(DMHaloModel):
         """A callable returning the 2-halo term of the cross-power spectrum
         between tracer and matter."""
         # Do this the simple way for now
-        bt = np.zeros_like(self.k)
-        bm = np.zeros_like(self.k)
-        for i, (ut, um) in enumerate(
-            zip(self.tracer_profile_ukm, self.halo_profile_ukm)
-        ):
-            bt[i] = tools.spline_integral(
-                self.m,
-                self.dndm * self.halo_bias * self._total_occupation * ut,
-                xmin=self.tracer_mmin,
-            )
-            bm[i] = tools.spline_integral(
-                self.m, self.dndm * self.halo_bias * self.m * um
-            )
+        bt = self._tracer_cross_mass_integrals["cross_2h_tracer"]
+        bm = self._matter_bias_mass_integral
 
         power = (
             bt
@@ -1573,9 +2137,7 @@ class TracerHaloModel(DMHaloModel):
     def corr_2h_cross_tracer_matter_fnc(self):
         """A callable returning the 2-halo term of the cross-correlation
         between tracer and matter."""
-        corr = tools.hankel_transform(
-            self.power_2h_cross_tracer_matter_fnc, self._r_table, "r"
-        )
+        corr = self._power_to_corr(self.power_2h_cross_tracer_matter_fnc)
         return tools.ExtendedSpline(
             self._r_table, corr, lower_func="power_law", upper_func=tools._zero
         )
@@ -1589,9 +2151,9 @@ class TracerHaloModel(DMHaloModel):
     @cached_quantity
     def power_cross_tracer_matter_fnc(self):
         """A callable returning cross-power spectrum of tracer and matter."""
-        return lambda k: self.power_1h_cross_tracer_matter_fnc(
-            k
-        ) + self.power_2h_cross_tracer_matter_fnc(k)
+        return tools.SumOfTerms(
+            self.power_1h_cross_tracer_matter_fnc, self.power_2h_cross_tracer_matter_fnc
+        )
 
     @property
     def power_cross_tracer_matter(self):
@@ -1601,10 +2163,10 @@ class TracerHaloModel(DMHaloModel):
     @cached_quantity
     def corr_cross_tracer_matter_fnc(self):
         """A callable returning the cross-correlation of tracer with matter."""
-        return (
-            lambda r: self.corr_1h_cross_tracer_matter_fnc(r)
-            + self.corr_2h_cross_tracer_matter_fnc(r)
-            + 1
+        return tools.SumOfTerms(
+            self.corr_1h_cross_tracer_matter_fnc,
+            self.corr_2h_cross_tracer_matter_fnc,
+            constant=1,
         )
 
     @property
@@ -1615,53 +2177,72 @@ class TracerHaloModel(DMHaloModel):
     # ===========================================================================
     # Other utilities
     # ===========================================================================
+    @cached_quantity
+    def _fine_mass_function(self):
+        """The mass function on a fine mass grid, used to match the tracer density.
+
+        The grid has a spacing of 0.01 in log10(m). Unless the mass grid is at least
+        as fine already, :attr:`dndm` is interpolated onto it (in log-log space).
+        """
+        if self.dlog10m <= 0.01:
+            return self.m, self.dndm
+
+        m = 10 ** np.arange(self.Mmin, self.Mmax, 0.01)
+        positive = self.dndm > 0
+        dndm = np.exp(
+            spline(np.log(self.m[positive]), np.log(self.dndm[positive]))(np.log(m))
+        )
+        dndm[m > self.m[positive].max()] = 0
+        return m, dndm
+
     def _find_m_min(self, ng):
         """
         Calculate the minimum mass of a halo to contain a (central) galaxy
         based on a known mean galaxy density.
-        """
 
-        self.power  # This just makes sure the power is gotten and copied
-        c = self.clone(hod_params={"M_min": self.Mmin}, dlog10m=0.01)
+        The density of tracers in haloes above M_min is matched to ``ng`` with a
+        bracketing root-finder, using the (cached) fine-grid mass function and the
+        occupation of the HOD model directly. For HODs with a sharp cut, the
+        occupation is evaluated only once.
+        """
+        m, dndm = self._fine_mass_function
+        quad = tools.get_spline_quadrature(m)
 
-        integrand = c.m[c._tm] * c.dndm[c._tm] * c.total_occupation[c._tm]
+        def hod(mmin):
+            return self._make_hod({**self.hod_params, "M_min": mmin})
 
-        density_message = (
-            f"Maximum mean galaxy density exceeded. User input required density of {ng}, "
-            "but maximum density (with HOD M_min == DM Mmin) is {}. "
-            "Consider decreasing Mmin,or checking tracer_density."
-        )
+        lower = np.log10(m[0])
         if self.hod.sharp_cut:
-            integral = intg.cumtrapz(integrand[::-1], dx=np.log(c.m[1] / c.m[0]))
+            # Above M_min, the occupation doesn't depend on M_min.
+            integrand = dndm * hod(lower).total_occupation(m)
 
-            if integral[-1] < ng:
-                raise NGException(density_message.format(integral[-1]))
+            def density(mmin):
+                return quad.cumulative_weights(10 ** mmin) @ integrand
 
-            ind = np.where(integral > ng)[0][0]
+        else:
 
-            m = c.m[c._tm][::-1][1:][max(ind - 4, 0) : min(ind + 4, len(c.m))]
-            integral = integral[max(ind - 4, 0) : min(ind + 4, len(c.m))]
+            def density(mmin):
+                h = hod(mmin)
+                lower_mass = m[0] if h.mmin is None else 10 ** h.mmin
+                return quad.cumulative_weights(lower_mass) @ (
+                    dndm * h.total_occupation(m)
+                )
 
-            spline_int = spline(np.log(integral), np.log(m), k=3)
-            mmin = spline_int(np.log(ng)) / np.log(10)
-        else:
-            # Anything else requires us to do some optimization unfortunately.
-            integral = intg.simps(integrand, dx=np.log(c.m[1] / c.m[0]))
-            if integral < ng:
-                raise NGException(density_message.format(integral))
-
-            def model(mmin):
-                c.update(hod_params={"M_min": mmin})
-                integrand = c.m[c._tm] * c.dndm[c._tm] * c.total_occupation[c._tm]
-                integral = intg.simps(integrand, dx=np.log(c.m[1] / c.m[0]))
-                return abs(integral - ng)
-
-            res = minimize(
-                model, 12.0, tol=1e-3, method="Nelder-Mead", options={"maxiter": 200}
+        max_density = density(lower)
+        if max_density < ng:
+            raise NGException(
+                f"Maximum mean galaxy density exceeded. User input required density of "
+                f"{ng}, but maximum density (with HOD M_min == DM Mmin) is "
+                f"{max_density}. Consider decreasing Mmin,or checking tracer_density."
             )
-            mmin = res.x[0]
 
-        return mmin
+        return brentq(
+            lambda mmin: density(mmin) / ng - 1,
+            lower,
+            np.log10(m[-1]),
+            xtol=1e-5,
+            maxiter=100,
+        )
 
     # =============================
     # For Compatibility
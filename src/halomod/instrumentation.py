@@ -0,0 +1,286 @@
+"""
+Timing and memory instrumentation of halo model calculations.
+
+While :func:`instrument` is active, every cached quantity of the instrumented
+frameworks (and the numerical workhorses in :mod:`halomod.tools`) records its wall
+time, number of calls, cache hits/misses and (optionally) its peak memory
+allocation. Nothing is patched while it is inactive, so there is no overhead.
+
+Instrumentation can also be turned on for a whole run by setting the
+``HALOMOD_INSTRUMENT`` environment variable before importing halomod. If it is set
+to a path ending in ``.json``, the statistics are dumped to that file at exit,
+otherwise a report is printed to stderr. Set ``HALOMOD_INSTRUMENT_MEMORY=1`` to also
+trace memory.
+
+Examples
+--------
+>>> from halomod import TracerHaloModel
+>>> from halomod.instrumentation import instrument
+>>> with instrument() as stats:
+>>>     TracerHaloModel().corr_auto_tracer
+>>> print(stats.report(sort="self_time", n=10))
+"""
+import atexit
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+from hmf._internals._cache import hidden_loc
+
+from . import tools
+from .halo_model import DMHaloModel, TracerHaloModel
+
+# Functions of :mod:`halomod.tools` that are instrumented, as (owner, attribute).
+TOOLS_FUNCTIONS = (
+    (tools, "hankel_transform"),
+    (tools, "spline_integral"),
+    (tools.HankelOperator, "__call__"),
+)
+
+_FIELDS = ("calls", "hits", "misses", "time", "self_time", "peak_memory")
+
+
+class Instrumentation:
+    """
+    Statistics of every instrumented quantity and function.
+
+    Times are in seconds. ``time`` is inclusive of everything computed while
+    getting the quantity (e.g. the quantities it depends on), while ``self_time``
+    excludes other instrumented calls. ``peak_memory`` is the largest increase in
+    traced memory (in bytes) during any call, and is only recorded when tracing
+    memory.
+
+    Parameters
+    ----------
+    memory
+        Whether to trace memory allocation (with :mod:`tracemalloc`). This slows
+        down calculations considerably.
+    """
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self._stack: List[dict] = []
+
+    def _enter(self):
+        frame = {"start": time.perf_counter(), "child_time": 0.0}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            tracemalloc.reset_peak()
+            frame["mem_start"] = frame["peak"] = current
+        self._stack.append(frame)
+
+    def _exit(self, name: str, hit: Optional[bool]):
+        frame = self._stack.pop()
+        elapsed = time.perf_counter() - frame["start"]
+
+        stats = self.stats.setdefault(name, dict.fromkeys(_FIELDS, 0))
+        stats["calls"] += 1
+        if hit is not None:
+            stats["hits" if hit else "misses"] += 1
+        stats["time"] += elapsed
+        stats["self_time"] += elapsed - frame["child_time"]
+
+        if self.memory:
+            peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+            stats["peak_memory"] = max(stats["peak_memory"], peak - frame["mem_start"])
+
+        if self._stack:
+            self._stack[-1]["child_time"] += elapsed
+            if self.memory:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+
+    def _quantity(self, cls, name, fget):
+        """Wrap the getter of a cached quantity."""
+        label = f"{cls.__name__}.{name}"
+
+        def _get_property(obj):
+            hit = not getattr(obj, hidden_loc(obj, "recalc"), {}).get(name, True)
+            self._enter()
+            try:
+                return fget(obj)
+            finally:
+                self._exit(label, hit)
+
+        return _get_property
+
+    def _function(self, owner, name, fnc):
+        """Wrap a function."""
+        label = f"{getattr(owner, '__name__', '')}.{name}".replace("halomod.", "")
+
+        def wrapper(*args, **kwargs):
+            self._enter()
+            try:
+                return fnc(*args, **kwargs)
+            finally:
+                self._exit(label, None)
+
+        return wrapper
+
+    def as_list(self, sort: str = "time") -> List[dict]:
+        """The statistics of each quantity, sorted (descending) by ``sort``."""
+        if sort not in ("name",) + _FIELDS:
+            raise ValueError(f"sort must be 'name' or one of {_FIELDS}")
+
+        out = [{"name": name, **stats} for name, stats in self.stats.items()]
+        return sorted(out, key=lambda s: s[sort], reverse=sort != "name")
+
+    def report(self, sort: str = "time", n: Optional[int] = None) -> str:
+        """A table of the statistics of each quantity, sorted by ``sort``.
+
+        Parameters
+        ----------
+        sort
+            The column to sort by: 'name', 'calls', 'hits', 'misses', 'time',
+            'self_time' or 'peak_memory'.
+        n
+            The number of rows to show (default all).
+        """
+        rows = self.as_list(sort)[:n]
+        width = max([len(r["name"]) for r in rows] + [8])
+        lines = [
+            f"{'Quantity':<{width}} {'Calls':>7} {'Hits':>7} {'Misses':>7} "
+            f"{'Time [s]':>10} {'Self [s]':>10} {'Peak [MB]':>10}"
+        ]
+        lines += [
+            f"{r['name']:<{width}} {r['calls']:>7} {r['hits']:>7} {r['misses']:>7} "
+            f"{r['time']:>10.4f} {r['self_time']:>10.4f} "
+            f"{r['peak_memory'] / 2 ** 20:>10.2f}"
+            for r in rows
+        ]
+        return "\n".join(lines)
+
+    def to_json(self, path: Optional[str] = None, sort: str = "time") -> str:
+        """Dump the statistics as JSON, optionally writing them to ``path``."""
+        out = json.dumps(self.as_list(sort), indent=2)
+        if path is not None:
+            with open(path, "w") as fl:
+                fl.write(out)
+        return out
+
+
+def _cached_quantities(cls):
+    """Yield (class, name, property) for every cached quantity defined in cls's MRO."""
+    for kls in cls.__mro__:
+        for name, attr in list(vars(kls).items()):
+            # Cached quantities are read-only properties wrapping the method.
+            if (
+                isinstance(attr, property)
+                and attr.fset is None
+                and hasattr(attr.fget, "__wrapped__")
+            ):
+                yield kls, name, attr
+
+
+_active = None
+
+
+def start(
+    memory: bool = False, classes: Sequence[type] = (DMHaloModel, TracerHaloModel)
+) -> Instrumentation:
+    """Start instrumenting, returning the :class:`Instrumentation` being recorded.
+
+    Prefer :func:`instrument`, which also stops instrumenting.
+    """
+    global _active
+    if _active is not None:
+        raise RuntimeError("Instrumentation is already active.")
+
+    stats = Instrumentation(memory)
+    patched = {}
+    for cls in classes:
+        for kls, name, prop in _cached_quantities(cls):
+            if (kls, name) not in patched:
+                patched[(kls, name)] = prop
+                setattr(
+                    kls,
+                    name,
+                    property(
+                        stats._quantity(kls, name, prop.fget),
+                        None,
+                        prop.fdel,
+                        prop.__doc__,
+                    ),
+                )
+
+    for owner, name in TOOLS_FUNCTIONS:
+        patched[(owner, name)] = getattr(owner, name)
+        setattr(owner, name, stats._function(owner, name, getattr(owner, name)))
+
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        stats._started_tracing = True
+
+    _active = (stats, patched)
+    return stats
+
+
+def stop() -> Optional[Instrumentation]:
+    """Stop instrumenting, returning what was recorded (if anything)."""
+    global _active
+    if _active is None:
+        return None
+
+    stats, patched = _active
+    for (owner, name), original in patched.items():
+        setattr(owner, name, original)
+
+    if getattr(stats, "_started_tracing", False):
+        tracemalloc.stop()
+
+    _active = None
+    return stats
+
+
+@contextmanager
+def instrument(
+    memory: bool = False, classes: Sequence[type] = (DMHaloModel, TracerHaloModel)
+):
+    """Instrument halo model calculations within a context.
+
+    Parameters
+    ----------
+    memory
+        Whether to trace the peak memory allocation of each quantity. This slows down
+        calculations considerably.
+    classes
+        The frameworks whose cached quantities (including those inherited) are
+        instrumented.
+
+    Yields
+    ------
+    stats : :class:`Instrumentation`
+        The statistics, which are updated while the context is active.
+    """
+    stats = start(memory, classes)
+    try:
+        yield stats
+    finally:
+        stop()
+
+
+def _instrument_from_environment():
+    """Instrument the whole session, if requested by HALOMOD_INSTRUMENT."""
+    dest = os.environ.get("HALOMOD_INSTRUMENT")
+    if not dest or dest == "0":
+        return
+
+    stats = start(memory=os.environ.get("HALOMOD_INSTRUMENT_MEMORY", "0") != "0")
+
+    def finish():
+        stop()
+        if dest.endswith(".json"):
+            stats.to_json(dest)
+        else:
+            print(stats.report(), file=sys.stderr)
+
+    atexit.register(finish)
+
+
+_instrument_from_environment()
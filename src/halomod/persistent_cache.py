@@ -0,0 +1,298 @@
+"""
+An opt-in persistent (on-disk) cache of expensive quantities of halo models.
+
+Quantities decorated with :func:`persistent` are saved to disk when they are
+computed, keyed by a hash of the values of the parameters they depend on, so that
+later sessions (or other worker processes) with the same parameters can load them
+rather than re-computing them. The cache is bounded in size, with the least-recently
+used entries evicted first.
+
+The cache is disabled by default. Enable it with :func:`set_disk_cache`, or by
+setting the ``HALOMOD_CACHE_DIR`` environment variable (and optionally
+``HALOMOD_CACHE_MAX_SIZE``, in bytes) before importing halomod.
+
+Examples
+--------
+>>> from halomod import TracerHaloModel
+>>> from halomod.persistent_cache import set_disk_cache
+>>> set_disk_cache("~/.cache/halomod", max_size=2 ** 30)
+>>> TracerHaloModel(z=1).power_auto_tracer  # computed, and saved
+>>> TracerHaloModel(z=1).power_auto_tracer  # linear power, dndm etc. loaded
+
+Notes
+-----
+The parameters each quantity depends on are found the first time it is computed
+(using the dependency index of the framework), and recorded in the cache directory.
+Keys include the version of halomod and a hash of its source code, so that entries
+saved by a different (or locally modified) version are never loaded.
+Parameter values are identified by their ``repr`` (or their data, for arrays), so
+parameters whose ``repr`` does not identify their value should not be used with the
+cache.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from functools import lru_cache, wraps
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+import numpy as np
+from hmf._internals._cache import hidden_loc
+
+try:
+    from importlib.metadata import version, PackageNotFoundError
+except ImportError:
+    from importlib_metadata import version, PackageNotFoundError
+
+try:
+    _VERSION = version("halomod")
+except PackageNotFoundError:
+    _VERSION = "unknown"
+
+
+@lru_cache()
+def _source_hash() -> str:
+    """A hash of the source code of halomod, which identifies development versions."""
+    sha = hashlib.sha256()
+    root = Path(__file__).parent
+    for path in sorted(root.rglob("*.py")):
+        sha.update(str(path.relative_to(root)).encode())
+        sha.update(path.read_bytes())
+    return sha.hexdigest()
+
+
+# The permissions of new files under the umask (files made by tempfile.mkstemp are
+# only accessible by their owner).
+_umask = os.umask(0)
+os.umask(_umask)
+_FILE_MODE = 0o666 & ~_umask
+
+
+def _replace(tmp: [str, Path], path: [str, Path]):
+    """Move a temporary file to ``path``, giving it the usual permissions."""
+    os.chmod(tmp, _FILE_MODE)
+    os.replace(tmp, path)
+
+
+def _stable_repr(val) -> str:
+    """A representation of a parameter value that is stable between sessions."""
+    if isinstance(val, dict):
+        return (
+            "{"
+            + ", ".join(
+                f"{_stable_repr(k)}: {_stable_repr(v)}"
+                for k, v in sorted(val.items(), key=lambda kv: str(kv[0]))
+            )
+            + "}"
+        )
+    elif isinstance(val, (list, tuple)):
+        return "[" + ", ".join(_stable_repr(v) for v in val) + "]"
+    elif isinstance(val, np.ndarray):
+        return (
+            f"array({val.dtype}, {val.shape}, "
+            f"{hashlib.sha256(np.ascontiguousarray(val).tobytes()).hexdigest()})"
+        )
+    elif isinstance(val, type):
+        return f"{val.__module__}.{val.__qualname__}"
+    else:
+        return repr(val)
+
+
+class DiskCache:
+    """
+    A directory of saved quantities, bounded in size.
+
+    Arrays are saved as compressed NumPy archives, and anything else is pickled.
+    Files are written atomically, so a cache directory may be shared by several
+    processes.
+
+    Parameters
+    ----------
+    directory
+        The directory in which to save quantities. It is created if necessary.
+    max_size
+        The maximum total size of saved quantities, in bytes. When it is exceeded,
+        the least-recently used quantities are deleted.
+    """
+
+    def __init__(self, directory: [str, Path], max_size: int = 2 ** 30):
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+
+    def key(self, kind: str, name: str, params: dict) -> str:
+        """The key of the quantity ``name`` of ``kind``, with given parameters."""
+        return hashlib.sha256(
+            f"{_VERSION}|{_source_hash()}|{kind}|{name}|{_stable_repr(params)}".encode()
+        ).hexdigest()
+
+    def _entries(self):
+        return [p for p in self.directory.iterdir() if p.suffix in (".npz", ".pkl")]
+
+    def get(self, key: str) -> Any:
+        """Load the quantity with the given key, or return None if there is none."""
+        for path in (self.directory / f"{key}.npz", self.directory / f"{key}.pkl"):
+            try:
+                if path.suffix == ".npz":
+                    with np.load(path) as data:
+                        value = data["value"]
+                else:
+                    with open(path, "rb") as fl:
+                        value = pickle.load(fl)
+            except (OSError, EOFError, KeyError, ValueError, pickle.UnpicklingError):
+                # Not there (or evicted/corrupted while we were reading).
+                continue
+
+            try:
+                os.utime(path)  # Mark as recently used.
+            except OSError:
+                pass
+            return value
+        return None
+
+    def put(self, key: str, value: Any):
+        """Save a quantity with the given key, and evict old quantities if needed."""
+        is_array = isinstance(value, np.ndarray) and value.dtype != object
+        path = self.directory / f"{key}{'.npz' if is_array else '.pkl'}"
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fl:
+                if is_array:
+                    np.savez_compressed(fl, value=value)
+                else:
+                    pickle.dump(value, fl, protocol=pickle.HIGHEST_PROTOCOL)
+            _replace(tmp, path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        """Delete least-recently used quantities until the cache fits in max_size."""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(e[1] for e in entries)
+        for _, sz, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            size -= sz
+
+    @property
+    def size(self) -> int:
+        """The total size of saved quantities, in bytes."""
+        return sum(p.stat().st_size for p in self._entries())
+
+    def clear(self):
+        """Delete all saved quantities and dependencies."""
+        for path in self._entries() + list(self.directory.glob("*.deps")):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def dependencies(self, kind: str, name: str) -> Optional[Sequence[str]]:
+        """The known parameters that quantity ``name`` of ``kind`` depends on."""
+        deps = None
+        for path in self.directory.glob(f"{kind}.{name}.*.deps"):
+            try:
+                with open(path) as fl:
+                    deps = (deps or set()) | set(json.load(fl))
+            except (OSError, ValueError):
+                continue
+        return None if deps is None else sorted(deps)
+
+    def add_dependencies(self, kind: str, name: str, params: Sequence[str]):
+        """Record parameters that quantity ``name`` of ``kind`` depends on.
+
+        Each set of parameters is written to its own file (named by its hash), and
+        :meth:`dependencies` takes the union of them, so that processes recording
+        dependencies at the same time never overwrite each other.
+        """
+        params = sorted(set(params))
+        digest = hashlib.sha256("|".join(params).encode()).hexdigest()[:16]
+        path = self.directory / f"{kind}.{name}.{digest}.deps"
+        if path.exists():
+            return
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as fl:
+            json.dump(params, fl)
+        _replace(tmp, path)
+
+
+_disk_cache = None
+
+
+def set_disk_cache(directory: Optional[str] = None, max_size: int = 2 ** 30):
+    """Enable the persistent cache in the given directory, or disable it if None.
+
+    Parameters
+    ----------
+    directory
+        The directory in which to save quantities.
+    max_size
+        The maximum total size of saved quantities, in bytes.
+    """
+    global _disk_cache
+    _disk_cache = None if directory is None else DiskCache(directory, max_size)
+
+
+def get_disk_cache() -> Optional[DiskCache]:
+    """The current persistent cache, or None if it is disabled."""
+    return _disk_cache
+
+
+if os.environ.get("HALOMOD_CACHE_DIR"):
+    set_disk_cache(
+        os.environ["HALOMOD_CACHE_DIR"],
+        int(float(os.environ.get("HALOMOD_CACHE_MAX_SIZE", 2 ** 30))),
+    )
+
+
+def persistent(f):
+    """Save (and load) a quantity with the persistent cache, if it is enabled.
+
+    This should be applied *inside* :func:`hmf.cached_quantity`, so that the
+    parameters read to build the key are registered as dependencies of the quantity
+    (and it is invalidated when they change), even when it is loaded from disk.
+    """
+    name = f.__name__
+
+    @wraps(f)
+    def wrapper(self):
+        cache = _disk_cache
+        if cache is None:
+            return f(self)
+
+        kind = self.__class__.__name__
+        deps = cache.dependencies(kind, name)
+        if deps is not None:
+            key = cache.key(kind, name, {p: getattr(self, p) for p in deps})
+            value = cache.get(key)
+            if value is not None:
+                return value
+
+        value = f(self)
+
+        # Every parameter read while computing the value has been indexed.
+        params = getattr(self, hidden_loc(self, "recalc_prop_par"))[name]
+        deps = sorted(set(deps or []) | params)
+        cache.add_dependencies(kind, name, deps)
+        cache.put(cache.key(kind, name, {p: getattr(self, p) for p in deps}), value)
+        return value
+
+    return wrapper
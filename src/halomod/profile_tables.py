@@ -0,0 +1,501 @@
+"""
+On-disk lookup tables of the Fourier transforms of halo profiles.
+
+Profiles without an analytic Fourier transform (e.g. :class:`~halomod.profiles.Einasto`
+with arbitrary ``alpha``, :class:`~halomod.profiles.GeneralizedNFW`, or user-defined
+profiles) compute it numerically. With ``tabulate=True``, they instead interpolate the
+normalised transform, :math:`u(K, c) = p(K, c) / h(c)`, from a table on a
+logarithmic grid of :math:`K` and :math:`c`. The table is computed once, to a given
+absolute accuracy, and saved in a cache directory keyed by the profile class and its
+parameters, so that later sessions just load it.
+
+The tables are saved in ``~/.cache/halomod/profile_tables`` by default. Set the
+``HALOMOD_TABLE_DIR`` environment variable (or use :func:`set_table_directory`) to
+use another directory. Tables for a grid of parameters can be built ahead of time
+with the ``halomod tables`` command.
+
+Examples
+--------
+>>> from halomod import TracerHaloModel
+>>> hm = TracerHaloModel(
+>>>     halo_profile_model="GeneralizedNFW",
+>>>     halo_profile_params={"alpha": 1.3, "tabulate": True},
+>>> )
+>>> hm.power_auto_tracer  # builds (or loads) the table for alpha=1.3
+"""
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+import warnings
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from hmf._internals import get_mdl
+from scipy import ndimage
+
+from . import tools
+from .persistent_cache import _VERSION, _replace, _stable_repr
+
+#: The default absolute accuracy of tables of :math:`u(K, c)`.
+DEFAULT_ATOL = 1e-4
+
+_table_directory = Path(
+    os.environ.get("HALOMOD_TABLE_DIR", "~/.cache/halomod/profile_tables")
+).expanduser()
+
+# Tables already loaded in this session, by key.
+_loaded = {}
+
+
+def set_table_directory(directory: [str, Path]):
+    """Set the directory in which tables are saved (and looked for)."""
+    global _table_directory
+    _table_directory = Path(directory).expanduser()
+    _loaded.clear()
+    get_einasto_table.cache_clear()
+
+
+def get_table_directory() -> Path:
+    """The directory in which tables are saved."""
+    return _table_directory
+
+
+def _padded_grid(rng: Tuple[float, float], n_per_decade: int, pad: int) -> np.ndarray:
+    """A log-spaced grid over ``rng``, extended by ``pad`` points at each end."""
+    n_points = int(np.ceil(np.log10(rng[1] / rng[0]) * n_per_decade))
+    return np.logspace(
+        np.log10(rng[0]) - pad / n_per_decade,
+        np.log10(rng[1]) + pad / n_per_decade,
+        n_points + 2 * pad + 1,
+    )
+
+
+def _grid_index(x: np.ndarray, first: float, last: float, n: int, log: bool = True):
+    """The (fractional) index of x in a regular grid of n points, clipped to it."""
+    if log:
+        x, first, last = np.log(x), np.log(first), np.log(last)
+    return np.clip((x - first) * ((n - 1) / (last - first)), 0, n - 1)
+
+
+def _normalised_transform(f: callable, K: np.ndarray, c: np.ndarray):
+    """The normalised transform u(K, c) (shape (K, c)), and its estimated error.
+
+    The normalisation, h(c), is the integral at K -> 0. This is used rather than the
+    profile's _h, which may be approximate, so that u is one at small K.
+    """
+    p, err = tools.cumulative_sine_integral(f, np.concatenate(([K[0] * 1e-3], K)), c)
+    h = p[:, :1]
+    return (p[:, 1:] / h).T, np.max(err / h)
+
+
+class ProfileTable:
+    r"""
+    A table of the normalised Fourier transform of a profile, :math:`u(K, c)`.
+
+    The table is interpolated with a bicubic spline in :math:`\ln K` and
+    :math:`\ln c` (using :func:`scipy.ndimage.map_coordinates`, which is much faster
+    than a general bivariate spline on a grid of this size). The grids extend
+    :attr:`pad` points beyond the range covered by the table, so that the boundary
+    conditions of the spline do not affect the interpolation within it. Below the
+    smallest ``K``, :math:`u` is that at the smallest ``K`` (i.e. one), and above the
+    largest it is zero.
+
+    Parameters
+    ----------
+    K
+        The (1D, log-spaced) grid of the unit-less wavenumber, ``k * r_s``.
+    c
+        The (1D, log-spaced) grid of concentration.
+    u
+        The normalised transform, with shape ``(len(K), len(c))``.
+    accuracy
+        The estimated absolute accuracy of interpolating the table.
+    """
+
+    #: The number of grid points beyond each end of the range covered by the table.
+    pad = 10
+
+    def __init__(self, K: np.ndarray, c: np.ndarray, u: np.ndarray, accuracy: float):
+        self.K = K
+        self.c = c
+        self.u = u
+        self.accuracy = accuracy
+        self._coeffs = ndimage.spline_filter(u, order=3, mode="mirror")
+
+    @classmethod
+    def compute(
+        cls,
+        profile,
+        atol: float = DEFAULT_ATOL,
+        K_range: Tuple[float, float] = (1e-6, 1e4),
+        c_range: Tuple[float, float] = (0.5, 500),
+        n_per_decade: int = 20,
+        max_per_decade: int = 320,
+    ) -> "ProfileTable":
+        """
+        Compute the table for a profile, to a given accuracy.
+
+        The table is computed with :func:`~halomod.tools.cumulative_sine_integral`,
+        and the density of the grid doubled until the values on the new points are
+        interpolated from the previous grid to within ``atol``.
+
+        Parameters
+        ----------
+        profile : :class:`~halomod.profiles.Profile` instance
+            The profile to tabulate.
+        atol
+            The target absolute accuracy of :math:`u(K, c)`.
+        K_range, c_range
+            The range of ``K`` and ``c`` covered by the table.
+        n_per_decade
+            The initial number of grid points per decade.
+        max_per_decade
+            The maximum number of grid points per decade. If the accuracy is not
+            reached by then, the table is kept, with its (worse) accuracy.
+        """
+
+        def table(n):
+            K = _padded_grid(K_range, n, cls.pad)
+            c = _padded_grid(c_range, n, cls.pad)
+            return (K, c) + _normalised_transform(profile._f, K, c)
+
+        K, c, u, err = table(n_per_decade)
+        while True:
+            n_per_decade *= 2
+            new_K, new_c, new_u, err = table(n_per_decade)
+
+            # Interpolate the previous table to the new points within its range.
+            # (Every second point of the new grid is in the previous grid.)
+            inner = (slice(cls.pad, -cls.pad), slice(cls.pad, -cls.pad))
+            old = cls(K, c, u, err)(new_K[inner[0], None], new_c[None, inner[1]])
+            accuracy = max(np.max(np.abs(old - new_u[inner])), err)
+
+            K, c, u = new_K, new_c, new_u
+            if accuracy <= atol or 2 * n_per_decade > max_per_decade:
+                return cls(K, c, u, accuracy)
+
+    def __call__(self, K: np.ndarray, c: np.ndarray) -> np.ndarray:
+        """Interpolate :math:`u` at the given ``K`` and ``c`` (broadcast together)."""
+        K, c = np.broadcast_arrays(K, c)
+        out = ndimage.map_coordinates(
+            self._coeffs,
+            [
+                _grid_index(K, self.K[0], self.K[-1], len(self.K)),
+                _grid_index(c, self.c[0], self.c[-1], len(self.c)),
+            ],
+            order=3,
+            mode="mirror",
+            prefilter=False,
+        )
+        out[K > self.K[-self.pad - 1]] = 0
+        return out
+
+    def covers(self, c: np.ndarray) -> bool:
+        """Whether the range of the table covers all the given concentrations."""
+        return np.all((c >= self.c[self.pad]) & (c <= self.c[-self.pad - 1]))
+
+    def save(self, path: [str, Path]):
+        """Save the table (atomically) to a ``.npz`` file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fl:
+                np.savez(fl, K=self.K, c=self.c, u=self.u, accuracy=self.accuracy)
+            _replace(tmp, path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: [str, Path]) -> "ProfileTable":
+        """Load a table saved with :meth:`save`."""
+        with np.load(path) as data:
+            return cls(data["K"], data["c"], data["u"], float(data["accuracy"]))
+
+
+class EinastoTable:
+    r"""
+    A table of the normalised Fourier transform of the Einasto profile,
+    :math:`u(K, c, \alpha)`, for a continuous range of :math:`\alpha`.
+
+    The table is interpolated with a tricubic spline, in :math:`\ln K`,
+    :math:`\ln c` and :math:`\alpha`. Its spline coefficients are saved, so that
+    it can be loaded (memory-mapped) without any computation. As for
+    :class:`ProfileTable`, the grids extend a few points beyond the range covered
+    by the table.
+
+    Parameters
+    ----------
+    coeffs
+        The spline coefficients, with shape ``(len(alpha), len(K), len(c))``.
+    grids
+        The first and last point, the number of points, and the number of points
+        beyond each end of the range of the table, of the grids of ``alpha``
+        (linear), ``K`` and ``c`` (logarithmic), keyed by name.
+    accuracy
+        The estimated absolute accuracy of interpolating the table.
+    """
+
+    #: The number of grid points of alpha beyond each end of its range. The
+    #: transform is smooth in alpha, so fewer are needed than for K and c.
+    pad_alpha = 3
+    name = "einasto_uKca"
+
+    def __init__(self, coeffs: np.ndarray, grids: dict, accuracy: float):
+        self.coeffs = coeffs
+        self.grids = grids
+        self.accuracy = accuracy
+        self._slice = (None, None)
+
+    @classmethod
+    def compute(
+        cls,
+        K_range: Tuple[float, float] = (1e-6, 1e4),
+        c_range: Tuple[float, float] = (0.5, 500),
+        alpha_range: Tuple[float, float] = (0.1, 0.4),
+        n_per_decade: int = 80,
+        d_alpha: float = 0.02,
+    ) -> "EinastoTable":
+        """
+        Compute the table.
+
+        Parameters
+        ----------
+        K_range, c_range, alpha_range
+            The range of ``K``, ``c`` and ``alpha`` covered by the table.
+        n_per_decade
+            The number of grid points per decade of ``K`` and ``c``.
+        d_alpha
+            The spacing of the grid of ``alpha``. The grid extends
+            :attr:`pad_alpha` points below ``alpha_range[0]``, which must remain
+            positive.
+        """
+        from .concentration import Duffy08
+        from .profiles import Einasto
+
+        pad = ProfileTable.pad
+        K = _padded_grid(K_range, n_per_decade, pad)
+        c = _padded_grid(c_range, n_per_decade, pad)
+        n_alpha = int(round((alpha_range[1] - alpha_range[0]) / d_alpha))
+        alpha = alpha_range[0] + d_alpha * np.arange(
+            -cls.pad_alpha, n_alpha + cls.pad_alpha + 1
+        )
+        if alpha[0] <= 0:
+            raise ValueError(
+                f"alpha_range must start at least {cls.pad_alpha} grid points above 0"
+            )
+        grids = {
+            name: (float(x[0]), float(x[-1]), len(x), p)
+            for name, x, p in zip(
+                ("alpha", "K", "c"), (alpha, K, c), (cls.pad_alpha, pad, pad)
+            )
+        }
+
+        def transform(a, K, c):
+            profile = Einasto(Duffy08(), alpha=a, use_interp=False)
+            return _normalised_transform(profile._f, K, c)
+
+        u = np.empty((len(alpha), len(K), len(c)))
+        err = 0
+        for i, a in enumerate(alpha):
+            u[i], e = transform(a, K, c)
+            err = max(err, e)
+        table = cls(ndimage.spline_filter(u, order=3, mode="mirror"), grids, err)
+
+        # Estimate the accuracy half-way between grid points, in the middle of the
+        # range of alpha.
+        a = alpha[len(alpha) // 2] + d_alpha / 2
+        K_mid = np.sqrt(K[pad : -pad - 1] * K[pad + 1 : -pad])
+        c_mid = np.sqrt(c[pad : -pad - 1] * c[pad + 1 : -pad])
+        exact, e = transform(a, K_mid, c_mid)
+        table.accuracy = max(
+            err, e, np.max(np.abs(table(K_mid[:, None], c_mid[None, :], a) - exact))
+        )
+        return table
+
+    def __call__(self, K: np.ndarray, c: np.ndarray, alpha: float) -> np.ndarray:
+        """Interpolate :math:`u` at the given ``K`` and ``c`` (broadcast together)."""
+        K, c = np.broadcast_arrays(K, c)
+        out = ndimage.map_coordinates(
+            self._alpha_slice(alpha),
+            [
+                _grid_index(K, *self.grids["K"][:3]),
+                _grid_index(c, *self.grids["c"][:3]),
+            ],
+            order=3,
+            mode="mirror",
+            prefilter=False,
+        )
+        out[K > self._edge("K", -1)] = 0
+        return out
+
+    def _alpha_slice(self, alpha: float) -> np.ndarray:
+        """The 2D spline coefficients of the table at a given alpha.
+
+        The cubic B-spline in alpha is evaluated first, so that only four slices of
+        the (memory-mapped) coefficients are read, and the last slice is kept.
+        """
+        if self._slice[0] != alpha:
+            x = _grid_index(alpha, *self.grids["alpha"][:3], log=False)
+            i = int(np.floor(x))
+            t = x - i
+            weights = (
+                (1 - t) ** 3 / 6,
+                (3 * t ** 3 - 6 * t ** 2 + 4) / 6,
+                (-3 * t ** 3 + 3 * t ** 2 + 3 * t + 1) / 6,
+                t ** 3 / 6,
+            )
+            n = self.grids["alpha"][2]
+            coeffs = sum(
+                w * self.coeffs[min(max(j, 0), n - 1)]
+                for j, w in zip(range(i - 1, i + 3), weights)
+            )
+            self._slice = (alpha, coeffs)
+        return self._slice[1]
+
+    def _edge(self, name: str, end: int) -> float:
+        """The first (end=0) or last (end=-1) point of a grid within its range."""
+        first, last, n, pad = self.grids[name]
+        i = pad if end == 0 else n - pad - 1
+        if name == "alpha":
+            return first + (last - first) * i / (n - 1)
+        return first * (last / first) ** (i / (n - 1))
+
+    def covers(self, c: np.ndarray, alpha: float) -> bool:
+        """Whether the range of the table covers the given concentrations and alpha."""
+        eps = 1e-8 * (self.grids["alpha"][1] - self.grids["alpha"][0])
+        return (
+            self._edge("alpha", 0) - eps <= alpha <= self._edge("alpha", -1) + eps
+            and np.all(c >= self._edge("c", 0))
+            and np.all(c <= self._edge("c", -1))
+        )
+
+    def save(self, directory: [str, Path]):
+        """Save the table (atomically) to ``directory``."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fl:
+                np.save(fl, self.coeffs)
+            _replace(tmp, directory / f"{self.name}.npy")
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+        # The metadata is written last, so the table is only found when complete.
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as fl:
+            json.dump({"grids": self.grids, "accuracy": self.accuracy}, fl)
+        _replace(tmp, directory / f"{self.name}.json")
+
+    @classmethod
+    def load(cls, directory: [str, Path]) -> "EinastoTable":
+        """Load (memory-map) a table saved with :meth:`save` in ``directory``."""
+        directory = Path(directory)
+        with open(directory / f"{cls.name}.json") as fl:
+            meta = json.load(fl)
+        coeffs = np.load(directory / f"{cls.name}.npy", mmap_mode="r")
+        return cls(
+            coeffs, {k: tuple(v) for k, v in meta["grids"].items()}, meta["accuracy"]
+        )
+
+
+#: The directory of the table shipped with halomod (if any).
+DATA_DIRECTORY = Path(__file__).parent / "data"
+
+
+@lru_cache()
+def get_einasto_table() -> EinastoTable:
+    """
+    Get the table of the Einasto transform.
+
+    The table shipped with halomod is used if there is one, otherwise the table in
+    the table directory. If there is neither, it is computed (which takes some time)
+    and saved to the table directory. The table is loaded once per session.
+    """
+    for directory in (DATA_DIRECTORY, _table_directory):
+        try:
+            return EinastoTable.load(directory)
+        except (OSError, KeyError, ValueError):
+            pass
+
+    warnings.warn(
+        "Computing the table of the Einasto transform, which takes a while. It is "
+        f"saved in {_table_directory}, so this is only done once."
+    )
+    table = EinastoTable.compute()
+    table.save(_table_directory)
+    return table
+
+
+def table_path(profile, atol: float = DEFAULT_ATOL) -> Path:
+    """The path of the table of a profile (with its parameters), in the directory."""
+    kls = profile.__class__
+    key = hashlib.sha256(
+        f"{_VERSION}|{atol!r}|{_stable_repr(profile.params)}".encode()
+    ).hexdigest()[:16]
+    return _table_directory / f"{kls.__module__}.{kls.__qualname__}-{key}.npz"
+
+
+def get_table(profile, atol: float = DEFAULT_ATOL) -> ProfileTable:
+    """
+    Get the table of a profile, loading it or computing (and saving) it as needed.
+
+    Parameters
+    ----------
+    profile : :class:`~halomod.profiles.Profile` instance
+        The profile. Its table is identified by its class and parameters.
+    atol
+        The target absolute accuracy of the table.
+    """
+    path = table_path(profile, atol)
+    if path not in _loaded:
+        try:
+            _loaded[path] = ProfileTable.load(path)
+        except (OSError, KeyError, ValueError):
+            table = ProfileTable.compute(profile, atol)
+            table.save(path)
+            _loaded[path] = table
+    return _loaded[path]
+
+
+def build_tables(
+    profile_model, param_grid: Optional[dict] = None, atol: float = DEFAULT_ATOL
+):
+    """
+    Build (and save) the tables of a profile for every combination of parameters.
+
+    Parameters
+    ----------
+    profile_model : str or :class:`~halomod.profiles.Profile` subclass
+        The profile model.
+    param_grid
+        Lists of values of the parameters of the model, keyed by name.
+    atol
+        The target absolute accuracy of the tables.
+
+    Yields
+    ------
+    params : dict
+        The parameters of each table.
+    path : Path
+        The path of the table.
+    table : :class:`ProfileTable`
+        The table.
+    """
+    from .concentration import Duffy08
+
+    kls = get_mdl(profile_model, "Profile")
+    param_grid = param_grid or {}
+    for values in itertools.product(*param_grid.values()):
+        params = dict(zip(param_grid, values))
+        # The concentration-mass relation does not affect the table.
+        profile = kls(cm_relation=Duffy08(), **params)
+        yield params, table_path(profile, atol), get_table(profile, atol)
@@ -40,19 +40,17 @@ import numpy as np
 import scipy.special as sp
 import scipy.integrate as intg
 from scipy.interpolate import InterpolatedUnivariateSpline as spline
-from scipy.interpolate import RectBivariateSpline
-import mpmath
 from hmf import Component
 from scipy.special import gammainc, gamma
-import os
 import warnings
+from functools import lru_cache
 from scipy.special import sici
 from hmf.halos.mass_definitions import SOMean
 from astropy.cosmology import Planck15
-import hankel
-from scipy.integrate import quad
 from hmf._internals import pluggable
 
+from . import tools
+
 
 def ginc(a, x):
     r"""
@@ -85,12 +83,30 @@ class Profile(Component):
         A mass definition to interpret input masses with.
     z : float, default 0.0
         The redshift of the halo
+    tabulate : bool or float, default False
+        Whether to interpolate the numerical Fourier transform (for profiles without
+        an analytic one) from a table saved on disk, computing the table the first
+        time (see :mod:`halomod.profile_tables`). If a float, it is the absolute
+        accuracy of the table (by default, 1e-4).
     """
 
     _defaults = {}
 
+    #: The estimated relative error above which the numerical Fourier transform (if
+    #: used) warns.
+    p_rtol = 1e-4
+
+    #: The estimated relative error of the last numerical Fourier transform.
+    p_error = 0.0
+
     def __init__(
-        self, cm_relation, mdef=SOMean(), z=0.0, cosmo=Planck15, **model_parameters
+        self,
+        cm_relation,
+        mdef=SOMean(),
+        z=0.0,
+        cosmo=Planck15,
+        tabulate=False,
+        **model_parameters,
     ):
 
         self.mdef = mdef
@@ -100,6 +116,7 @@ class Profile(Component):
         self.mean_dens = mdef.mean_density(z=z, cosmo=cosmo)
         self.mean_density0 = mdef.mean_density(0, cosmo=cosmo)
         self.has_lam = hasattr(self, "_l")
+        self.tabulate = tabulate
 
         super(Profile, self).__init__(**model_parameters)
 
@@ -231,6 +248,10 @@ class Profile(Component):
         -----
         .. note :: This should be replaced by an analytic function if possible
 
+        The integral is computed with a vectorized Filon-type rule, and its estimated
+        relative error saved as :attr:`p_error`. If :attr:`tabulate` is set, it is
+        instead interpolated from a table (see :mod:`halomod.profile_tables`).
+
         The formula is
 
         .. math:: \int_0^c x \sin(\kappa x) / \kappa f(x) dx
@@ -250,48 +271,39 @@ class Profile(Component):
         assert K.ndim == 2
         assert K.shape[1] == len(c)
 
-        sort_indx = np.argsort(c)
+        if self.tabulate:
+            from . import profile_tables
+
+            atol = (
+                profile_tables.DEFAULT_ATOL if self.tabulate is True else self.tabulate
+            )
+            table = profile_tables.get_table(self, atol)
+            if table.covers(c):
+                self.p_error = table.accuracy
+                return table(K, c) * self._h(c)
 
         # We get a shorter vector of different K's to find the integral for, otherwise
         # we need to do a full integral for every K (which is 2D, since K is different
         # for every c).
         kk = np.logspace(np.log10(K.min()), np.log10(K.max()), 100)
 
-        intermediate_res = np.zeros((len(c), len(kk)))
-
-        # To make it more efficient, we do the integral in parts cumulatively, so we
-        # can get the value at each c in turn.
-        for j, k in enumerate(kk):
-            # Get all zeros up to the maximum c
-            zeros = np.pi / k * np.arange(c.max() // (np.pi / k))
-            for i, indx in enumerate(sort_indx):
-                # Get the limits on c for this iteration.
-                c_0 = 0 if not i else c[sort_indx[i - 1]]
-                c_1 = c[indx]
-                points = zeros[(c_0 < zeros) & (zeros < c_1)]
-                integral = quad(
-                    lambda x: x * self._f(x) * np.sin(k * x) / k,
-                    c_0,
-                    c_1,
-                    points=points,
-                    limit=max(50, len(points) + 1),
-                )[0]
-
-                # If its not the minimum c, add it to the previous integrand.
-                if i:
-                    intermediate_res[indx, j] = (
-                        intermediate_res[sort_indx[i - 1], j] + integral
-                    )
-                else:
-                    intermediate_res[indx, j] = integral
+        # All the integrals are done together, cumulatively in c (see
+        # :func:`~halomod.tools.cumulative_sine_integral`).
+        intermediate_res, err = tools.cumulative_sine_integral(self._f, kk, c)
 
-        # Now we need to interpolate onto the actual K values we have at each c.
-        out = np.zeros_like(K)
-        for ic, integral in enumerate(intermediate_res):
-            spl = spline(kk, integral)
-            out[:, ic] = spl(K[:, ic])
+        # Error relative to the largest value at each c (the integral goes to zero
+        # at high K, so a relative error at each K is meaningless).
+        self.p_error = np.max(
+            err / np.abs(intermediate_res).max(axis=1, keepdims=True), initial=0
+        )
+        if self.p_error > self.p_rtol:
+            warnings.warn(
+                f"The numerical Fourier transform of {self.__class__.__name__} has an "
+                f"estimated relative error of {self.p_error:.2e}."
+            )
 
-        return out
+        # Now we need to interpolate onto the actual K values we have at each c.
+        return tools.SplineFamily(kk, intermediate_res)(K.T).T
 
     def _rho_s(self, c, r_s=None, norm=None):
         """
@@ -522,6 +534,37 @@ class Profile(Component):
         return pos.T + centre
 
 
+@lru_cache()
+def _symmetric_fourier_transform(N: int, h: float):
+    """A (cached) 3D symmetric Fourier transform, with the given N and h."""
+    from hankel import SymmetricFourierTransform
+
+    return SymmetricFourierTransform(ndim=3, N=N, h=h)
+
+
+@lru_cache(maxsize=32)
+def _rotated_transform_table(
+    profile_model, params: tuple, k_range: tuple, n_per_decade: int
+):
+    """
+    A (cached) table of the rotated transform of a profile model with given params.
+
+    Only :meth:`~ProfileInf._f` of the profile is used, which depends only on its
+    parameters, so it is called on a bare instance of the model.
+    """
+    from .tools import rotated_sine_transform
+
+    prof = profile_model.__new__(profile_model)
+    prof.params = dict(params)
+
+    lo, hi = np.log10(k_range)
+    lnk = np.log(np.logspace(lo, hi, int(round((hi - lo) * n_per_decade))))
+    lnp = np.log(rotated_sine_transform(prof._f, np.exp(lnk)))
+    fit = spline(lnk, lnp)
+    slopes = fit.derivative()(lnk[[0, -1]])
+    return lnk[[0, -1]], lnp[[0, -1]], slopes, fit
+
+
 class ProfileInf(Profile, abstract=True):
     """
     An extended halo_profile (not truncated at x=c)
@@ -571,7 +614,7 @@ class ProfileInf(Profile, abstract=True):
             co-ordinates [units Mpc/h]. ``x`` is in units of the scale radius
             (r_vir = c), and ``s`` is in units of the virial radius (r_vir = 1).
         """
-        c, K = self._get_k_variables(k, m)
+        c, K = self._get_k_variables(k, m, c, coord)
 
         u = self._p(K) / self._h(c)
 
@@ -582,24 +625,96 @@ class ProfileInf(Profile, abstract=True):
 
         return self._reduce(u)
 
-    def _p(self, K: np.ndarray, c: np.ndarray):
+    #: Parameters of the :class:`hankel.SymmetricFourierTransform` used by the
+    #: numerical :meth:`_p` (at ``K >= 1``).
+    hankel_params = {"N": 640, "h": 0.005}
+
+    def _p(self, K: np.ndarray, c: np.ndarray = None):
         """
         The dimensionless fourier-transform of the halo_profile
 
-        This should be replaced by an analytic function if possible.
+        This should be replaced by an analytic function if possible. It is computed
+        numerically for the unique values of ``K``, so it has the same shape as ``K``
+        and does not depend on ``c``. For ``K >= 1``, this is a single (cached) Hankel
+        transform. At lower ``K``, where the Hankel transform would need many more
+        nodes to resolve the profile, it is interpolated from :meth:`_p_filon`.
         """
-        assert K.ndim == 2
-        assert K.shape[0] == len(c)
-
-        ft = hankel.SymmetricFourierTransform(ndim=3, N=640, h=0.005)
-
-        out = np.zeros_like(K)
-
-        # Go through each value of c
-        for i, kk in enumerate(K):
-            out[i] = ft.transform(self._f, k=K, ret_err=False, ret_cumsum=False)
+        ft = _symmetric_fourier_transform(**self.hankel_params)
+        K = np.asarray(K)
+        Ku, inverse = np.unique(K, return_inverse=True)
+        out = np.empty(len(Ku))
+
+        low = Ku < 1
+        if np.any(low):
+            out[low] = self._p_filon(Ku[low])
+
+        # In chunks, as f is evaluated on N points for every K.
+        high = np.flatnonzero(~low)
+        for i in range(0, len(high), 1024):
+            indx = high[i : i + 1024]
+            out[indx] = ft.transform(
+                self._f, k=Ku[indx], ret_err=False, ret_cumsum=False
+            ) / (4 * np.pi)
+        return out[inverse].reshape(K.shape)
+
+    def _p_filon(self, K: np.ndarray) -> np.ndarray:
+        r"""
+        The fourier-transform of the halo_profile at ``K < 1``, by Filon-type rules.
+
+        The transform is computed with
+        :func:`~halomod.tools.cumulative_sine_integral` (whose panels are spaced
+        logarithmically in ``x``, so resolve the profile however small ``K`` is) on a
+        logarithmic grid of ``K`` from below ``K.min()`` to one, and interpolated with
+        a cubic spline in :math:`\ln K`. The integral is taken from far inside the
+        scale radius to far beyond the scale of the oscillations, :math:`1/K`.
+        """
+        from .tools import cumulative_sine_integral
 
-        return out
+        lo = np.floor(np.log10(np.min(K)))
+        lnk = np.log(
+            np.logspace(lo, 0, int(round(-lo * self._p_table_n_per_decade)) + 1)
+        )
+        x_min, x_max = 1e-8, 1e8 / np.exp(lnk[0])
+        p = cumulative_sine_integral(
+            self._f,
+            np.exp(lnk),
+            [x_max],
+            n_log=int(round(10 * np.log10(x_max / x_min))),
+            x_min=x_min / x_max,
+        )[0][0]
+        return spline(lnk, p)(np.log(K))
+
+    #: The range of the table of :meth:`_p_rotated`, and the density (per decade) of
+    #: the grids of ``K`` of :meth:`_p_rotated` and :meth:`_p_filon`.
+    _p_table_range = (1e-6, 1e4)
+    _p_table_n_per_decade = 20
+
+    def _p_rotated(self, K: np.ndarray) -> np.ndarray:
+        r"""
+        The fourier-transform of the halo_profile, interpolated from a table.
+
+        This may be used as :meth:`_p` by profiles whose :meth:`_f` is analytic in
+        the first quadrant of the complex plane. The transform is computed (once for
+        each class and set of parameters) on a logarithmic grid of ``K`` with
+        :func:`~halomod.tools.rotated_sine_transform`, and interpolated with a
+        cubic spline in log-log space. Beyond the grid, it is extrapolated with the
+        slope (at small ``K``, of ``p`` against :math:`\ln K`) at each end.
+        """
+        table = _rotated_transform_table(
+            self.__class__,
+            tuple(sorted(self.params.items())),
+            self._p_table_range,
+            self._p_table_n_per_decade,
+        )
+        (lnk0, lnk1), (lnp0, lnp1), (s0, s1), fit = table
+        lnK = np.log(K)
+        out = np.exp(fit(np.clip(lnK, lnk0, lnk1)))
+        p0 = np.exp(lnp0)
+        return np.where(
+            lnK < lnk0,
+            p0 * (1 + s0 * (lnK - lnk0)),
+            np.where(lnK > lnk1, np.exp(lnp1 + s1 * (lnK - lnk1)), out),
+        )
 
     def lam(self, r, m, norm=None, c=None, coord="r"):
         """
@@ -834,39 +949,7 @@ class MooreInf(Moore, ProfileInf):
     """
 
     def _p(self, K):
-        def G(k):
-            return mpmath.meijerg(
-                [[1.0 / 2.0, 3.0 / 4.0, 1.0], []],
-                [
-                    [
-                        1.0 / 12.0,
-                        1.0 / 4.0,
-                        5.0 / 12.0,
-                        0.5,
-                        3.0 / 4.0,
-                        3.0 / 4.0,
-                        1.0,
-                    ],
-                    [-1.0 / 12.0, 7.0 / 12.0],
-                ],
-                k ** 6 / 46656.0,
-            ) / (4 * np.sqrt(3) * np.pi ** (5 / 2) * k)
-
-        if K.ndim == 2:
-            K1 = np.reshape(K, -1)
-            K1.sort()
-        else:
-            K1 = K
-        res = np.zeros(len(K[K < 10 ** 3.2]))
-        for i, k in enumerate(K1[K1 < 10 ** 3.2]):
-            res[i] = G(k)
-
-        fit = spline(np.log(K1[K1 < 10 ** 3.2]), np.log(res), k=1)
-        res = np.reshape(
-            np.exp(fit(np.log(np.reshape(K, -1)))), (len(K[:, 0]), len(K[0, :]))
-        )
-
-        return res
+        return self._p_rotated(K)
 
 
 class Constant(Profile):
@@ -932,34 +1015,7 @@ class GeneralizedNFWInf(GeneralizedNFW, ProfileInf):
     """
 
     def _p(self, K):
-        def G(k):
-            return mpmath.meijerg(
-                [
-                    [
-                        (self.params["alpha"] - 2) / 2.0,
-                        (self.params["alpha"] - 1) / 2.0,
-                    ],
-                    [],
-                ],
-                [[0, 0, 0.5], [-0.5]],
-                k ** 2 / 4,
-            ) / (np.sqrt(np.pi) * sp.gamma(3 - self.params["alpha"]))
-
-        if len(K.shape) == 2:
-            K1 = np.reshape(K, -1)
-            K1.sort()
-        else:
-            K1 = K
-        res = np.zeros(len(K[K < 10 ** 3.2]))
-        for i, k in enumerate(K1[K1 < 10 ** 3.2]):
-            res[i] = G(k)
-
-        fit = spline(np.log(K1[K1 < 10 ** 3.2]), np.log(res), k=1)
-        res = np.reshape(
-            np.exp(fit(np.log(np.reshape(K, -1)))), (len(K[:, 0]), len(K[0, :]))
-        )
-
-        return res
+        return self._p_rotated(K)
 
 
 class Einasto(Profile):
@@ -968,10 +1024,12 @@ class Einasto(Profile):
 
     It has two extra free parameters, ``alpha`` and ``use_interp``.
 
-    This halo profile has no analytic Fourier Transform. The numerical FT has been
-    pre-computed and is by default used to interpolate to the correct solution. If the
-    full numerical calculation is preferred, set the model parameter ``use_interp`` to
-    ``False``. The interpolation speeds up the calculation by at least 10 times.
+    This halo profile has no analytic Fourier Transform. By default, the numerical FT
+    is interpolated from a table over ``K``, ``c`` and ``alpha`` (see
+    :func:`~halomod.profile_tables.get_einasto_table`), which is computed and saved
+    the first time it is needed, and then memory-mapped once per session. This
+    covers ``0.1 <= alpha <= 0.4``. If the full numerical calculation is preferred,
+    set the model parameter ``use_interp`` to ``False``.
 
     Notes
     -----
@@ -994,15 +1052,6 @@ class Einasto(Profile):
 
     _defaults = {"alpha": 0.18, "use_interp": True}
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-        if self.params["alpha"] != 0.18 and self.params["use_interp"]:
-            warnings.warn(
-                "Einasto interpolation for p(K,c) is only defined for alpha=0.18, switching off."
-            )
-            self.params["use_interp"] = False
-
     def _f(self, x):
         a = self.params["alpha"]
         return np.exp((-2.0 / a) * (x ** a - 1))
@@ -1018,30 +1067,19 @@ class Einasto(Profile):
 
     def _p(self, K, c):
         if self.params["use_interp"]:
-            data_path = os.path.join(os.path.dirname(__file__), "data")
-            data = np.load(os.path.join(data_path, "uKc_einasto.npz"))
-
-            pk = data["pk"]
-            _k = data["K"]
-            _c = data["c"]
+            from . import profile_tables
 
+            table = profile_tables.get_einasto_table()
             c = np.atleast_1d(c)
-            if np.isscalar(K):
-                K = np.atleast_2d(K)
-            if K.ndim < 2:
-                if len(K) != len(c):
-                    K = np.atleast_2d(K).T  # should be len(rs) x len(k)
-                else:
-                    K = np.atleast_2d(K)
-            pk[pk <= 0] = 1e-8
-
-            spl = RectBivariateSpline(np.log(_k), np.log(_c), np.log(pk))
-            cc = np.repeat(c, K.shape[0])
-            return np.exp(
-                self._reduce(spl.ev(np.log(K.flatten()), np.log(cc)).reshape(K.shape))
+            if table.covers(c, self.params["alpha"]):
+                return self._reduce(table(K, c, self.params["alpha"]) * self._h(c))
+
+            warnings.warn(
+                "Einasto interpolation table does not cover the given alpha or "
+                "concentrations, using the numerical transform."
             )
-        else:  # Numerical version.
-            return super(Einasto, self)._p(K, c)
+
+        return super(Einasto, self)._p(K, c)
 
 
 class CoredNFW(Profile):
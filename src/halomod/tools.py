@@ -6,25 +6,23 @@ from typing import List
 
 import numpy as np
 import scipy.integrate as intg
-from scipy.stats import poisson
 import time
 from scipy.interpolate import (
     InterpolatedUnivariateSpline as spline,
-    UnivariateSpline as uspline,
+    make_interp_spline,
+    splev,
 )
+from scipy.linalg import solve_banded
+from scipy.special import loggamma
 from .profiles import Profile
 from .hod import HOD
 import warnings
 from functools import lru_cache
 
-from hankel import SymmetricFourierTransform
+from importlib.util import find_spec
 
-try:
-    from pathos import multiprocessing as mp
-
-    HAVE_POOL = True
-except ImportError:
-    HAVE_POOL = False
+# pathos is only imported when populating haloes.
+HAVE_POOL = find_spec("pathos") is not None
 
 
 @lru_cache(maxsize=25)
@@ -42,19 +40,8 @@ def _get_sumspace(h: float, nmin: int, nmax: int):
     return x, sumparts
 
 
-def hankel_transform(
-    f: [callable, List[callable]],
-    trns_var: np.ndarray,
-    trns_var_name: str,
-    h=0.005,
-    chunksize=100,
-    atol=1e-8,
-    rtol=1e-8,
-):
-    r"""Function to do the hankel tranformation"""
-    if trns_var_name not in "kr":
-        raise ValueError("trns_var_name must be either 'k' or 'r'.")
-
+def _hankel_sum_loop(f, trns_var, h, chunksize, atol, rtol):
+    """Perform the Ogata sum for each transformed variable in turn."""
     # Optimal value of nmax, given h.
     nmax = int(3.2 / h)
 
@@ -64,7 +51,7 @@ def hankel_transform(
         nn = 1
         prev_res = 100
         res = 0
-        p = f[ir] if hasattr(f, "__len__") else f
+        p = _row_function(f, ir)
         while not np.isclose(prev_res, res, atol=atol, rtol=rtol) and nn < nmax:
             prev_res = res
 
@@ -80,12 +67,451 @@ def hankel_transform(
 
         out[ir] = res
 
+    return out
+
+
+def _converged_chunk_sums(summand, chunksize, atol, rtol):
+    """Cumulatively sum ``summand`` in chunks, stopping each row at convergence.
+
+    This reproduces the convergence criterion of :func:`_hankel_sum_loop`, but
+    decides it for every row at once with masks.
+    """
+    nrows, nnodes = summand.shape
+    cumsum = np.cumsum(
+        np.sum(summand.reshape((nrows, nnodes // chunksize, chunksize)), axis=-1),
+        axis=-1,
+    )
+    prev = np.zeros_like(cumsum)
+    prev[:, 1:] = cumsum[:, :-1]
+
+    converged = np.isclose(prev, cumsum, atol=atol, rtol=rtol)
+
+    # The first converged chunk, or the last chunk if none converged.
+    indx = np.where(
+        np.any(converged, axis=-1), np.argmax(converged, axis=-1), cumsum.shape[-1] - 1
+    )
+    return cumsum[np.arange(nrows), indx]
+
+
+def _hankel_sum_vectorized(
+    f, trns_var, h, chunksize, atol, rtol, max_block_size=2 ** 21
+):
+    """Perform the Ogata sum for all transformed variables simultaneously.
+
+    The full (trns_var, node) matrix of abscissae is built at once (in blocks of at
+    most ``max_block_size`` elements, to keep memory bounded), and the function is
+    evaluated in a single call per block.
+    """
+    # Optimal value of nmax, given h.
+    nmax = int(3.2 / h)
+
+    # Use the same number of nodes that the looped version would use if no scale
+    # converged before nmax.
+    nchunks = int(np.ceil((nmax - 1) / chunksize))
+    x, sumparts = _get_sumspace(h, 1, 1 + nchunks * chunksize)
+
+    out = np.zeros(len(trns_var))
+
+    if hasattr(f, "__len__"):
+        # A different function for every scale -- we can still vectorize over nodes.
+        for ir, rr in enumerate(trns_var):
+            pk = _evaluate_on_grid(f[ir], x / rr)
+            out[ir] = _converged_chunk_sums(
+                np.atleast_2d(sumparts * pk), chunksize, atol, rtol
+            )[0]
+        return out
+
+    block = max(1, max_block_size // len(x))
+    for start in range(0, len(trns_var), block):
+        rr = trns_var[start : start + block]
+        if _is_stack(f):
+            # Evaluate each row of the stack at its own scale, in one call.
+            pk = f(np.outer(1 / rr, x), rows=np.arange(start, start + len(rr)))
+            pk[np.isnan(pk)] = 0
+        else:
+            pk = _evaluate_on_grid(f, np.outer(1 / rr, x))
+        out[start : start + block] = _converged_chunk_sums(
+            sumparts * pk, chunksize, atol, rtol
+        )
+
+    return out
+
+
+def _is_stack(f) -> bool:
+    """Whether f is an :class:`ExtendedSpline` of a stack of functions."""
+    return isinstance(f, ExtendedSpline) and f.y.ndim == 2
+
+
+def _row_function(f, i: int) -> callable:
+    """Get the function for the ith transformed variable from f."""
+    if _is_stack(f):
+        return lambda x: f(np.atleast_1d(x)[None, :], rows=[i])[0]
+    elif hasattr(f, "__len__"):
+        return f[i]
+    else:
+        return f
+
+
+def _evaluate_on_grid(f: callable, x: np.ndarray) -> np.ndarray:
+    """Evaluate ``f`` on the flattened ``x``, returning an array of the same shape.
+
+    NaN values are set to zero.
+    """
+    out = np.array(
+        np.broadcast_to(f(x.flatten()), (x.size,)), dtype=float, copy=True
+    ).reshape(x.shape)
+    out[np.isnan(out)] = 0
+    return out
+
+
+def _mellin_j0(s: np.ndarray) -> np.ndarray:
+    r"""The Mellin transform of the spherical Bessel function, :math:`j_0`.
+
+    That is, :math:`U(s) = \int_0^\infty t^{s-1} j_0(t) dt`, valid for
+    :math:`0 < {\rm Re}(s) < 2`.
+    """
+    return np.exp(
+        (s - 2) * np.log(2)
+        + 0.5 * np.log(np.pi)
+        + loggamma(s / 2)
+        - loggamma((3 - s) / 2)
+    )
+
+
+def _fftlog_grid(trns_var, n_per_decade, pad):
+    """Get the log-spaced input grid for an FFTLog transform onto ``trns_var``.
+
+    The grid is reciprocal to the range of ``trns_var``, padded by ``pad`` decades on
+    either side, and has an even number of points.
+    """
+    lxmin = -np.log10(trns_var.max()) - pad
+    lxmax = -np.log10(trns_var.min()) + pad
+    n = int(np.ceil((lxmax - lxmin) * n_per_decade))
+    n += n % 2
+    return np.logspace(lxmin, lxmax, n)
+
+
+def _fftlog(fx, x, tilt):
+    r"""Perform the FFTLog convolution of each row of ``fx``, tabulated on ``x``.
+
+    Returns the reciprocal output grid, ``y``, and
+    :math:`y^3 \int_0^\infty x^2 f(x) j_0(xy) dx` at ``y`` for each row.
+    """
+    n = len(x)
+    dlnx = np.log(x[1] / x[0])
+
+    # Output grid, reciprocal to the input grid.
+    y = 1 / x[::-1]
+
+    eta = 2 * np.pi * np.arange(n // 2 + 1) / (n * dlnx)
+    u = _mellin_j0(tilt + 1j * eta) * np.exp(-1j * eta * np.log(x[0] * y[0]))
+
+    # Keep the Nyquist mode real, so the output is real.
+    u[-1] = u[-1].real
+
+    c = np.fft.rfft(x ** (3 - tilt) * fx, axis=-1)
+    return y, np.fft.irfft(np.conj(c * u), n=n, axis=-1) * y ** (3 - tilt)
+
+
+def _hankel_fftlog(f, trns_var, tilt, n_per_decade=100, pad=4):
+    r"""Perform the spherical Hankel transform using the FFTLog algorithm.
+
+    This computes :math:`y^3 \int_0^\infty x^2 f(x) j_0(xy) dx` (i.e. the same
+    un-normalized quantity as the Ogata sums) by evaluating ``f`` on a single
+    log-spaced grid, and performing the convolution in :math:`\ln x` with FFTs
+    (Hamilton, 2000). The input is tilted by :math:`x^{3-{\rm tilt}}` to make it as
+    close to periodic as possible -- ``tilt`` must be between 0 and 2.
+    """
+    x = _fftlog_grid(trns_var, n_per_decade, pad)
+
+    if _is_stack(f):
+        fx = f(x)
+        fx[np.isnan(fx)] = 0
+    elif hasattr(f, "__len__"):
+        fx = np.array([_evaluate_on_grid(ff, x) for ff in f])
+    else:
+        fx = np.atleast_2d(_evaluate_on_grid(f, x))
+
+    y, g = _fftlog(fx, x, tilt)
+
+    lny = np.log(y)
+    lnr = np.log(trns_var)
+    if len(g) == 1:
+        return spline(lny, g[0], k=3)(lnr)
+    else:
+        return SplineFamily(lny, g)(lnr[:, None])[:, 0]
+
+
+HANKEL_METHODS = ("loop", "vectorized", "fftlog")
+
+# The FFTLog tilt to use when transforming to each variable. Power spectra fall as
+# k^-3 (or faster) at high k, while correlation functions may rise steeply at small r.
+FFTLOG_TILT = {"r": 1.5, "k": 1.0}
+
+
+def hankel_transform(
+    f: [callable, List[callable], "ExtendedSpline"],
+    trns_var: np.ndarray,
+    trns_var_name: str,
+    h=0.005,
+    chunksize=100,
+    atol=1e-8,
+    rtol=1e-8,
+    method="vectorized",
+):
+    r"""
+    Perform a 3D isotropic Hankel transform of a function.
+
+    Parameters
+    ----------
+    f
+        The function to transform. It should accept an array of the (inverse)
+        co-ordinate and return an array of the same shape. Alternatively, a list of
+        such functions, one for each value of ``trns_var``, or (more efficiently) an
+        :class:`ExtendedSpline` of a 2D table with one row for each value of
+        ``trns_var``, in which case all rows are interpolated together.
+    trns_var
+        The co-ordinates to which to transform.
+    trns_var_name
+        Either 'r' (transforming power to correlation) or 'k' (transforming
+        correlation to power).
+    h
+        The spacing of the Ogata nodes. Smaller values give more accurate results
+        but require more nodes (up to ``3.2/h``). Not used by 'fftlog'.
+    chunksize
+        The number of nodes summed between checks of convergence. Not used by
+        'fftlog'.
+    atol, rtol
+        Tolerances used to determine when the sum for each scale has converged. Not
+        used by 'fftlog'.
+    method : str, {'vectorized', 'loop', 'fftlog'}
+        The backend for performing the transform. 'loop' performs Ogata's sum for
+        each value of ``trns_var`` in Python and evaluates ``f`` once per chunk of
+        nodes. 'vectorized' performs the same sum, but evaluates ``f`` for all scales
+        and nodes in a single call and determines convergence of every scale at once.
+        'fftlog' instead evaluates ``f`` on a single log-spaced grid (padded by four
+        decades beyond the reciprocal of ``trns_var``) and uses the FFTLog
+        algorithm, at a cost of :math:`O(N \log N)`. Since ``f`` is evaluated
+        well beyond the range of ``trns_var``, any extrapolation it defines is
+        respected.
+
+    Returns
+    -------
+    out
+        The transformed function at ``trns_var``.
+
+    Notes
+    -----
+    The FFTLog algorithm is that of Hamilton (2000), MNRAS 312, 257.
+    """
+    if trns_var_name not in "kr":
+        raise ValueError("trns_var_name must be either 'k' or 'r'.")
+
+    if method == "loop":
+        out = _hankel_sum_loop(f, trns_var, h, chunksize, atol, rtol)
+    elif method == "vectorized":
+        out = _hankel_sum_vectorized(f, trns_var, h, chunksize, atol, rtol)
+    elif method == "fftlog":
+        out = _hankel_fftlog(f, trns_var, tilt=FFTLOG_TILT[trns_var_name])
+    else:
+        raise ValueError(f"method must be one of {HANKEL_METHODS}, got '{method}'.")
+
     if trns_var_name == "r":
         return out / (2 * np.pi ** 2 * trns_var ** 3)
     else:
         return out * 4 * np.pi / trns_var ** 3
 
 
+class HankelOperator:
+    r"""
+    A precomputed Ogata Hankel transform between fixed grids.
+
+    Interpolating splines are linear in the data they interpolate. So for fixed input
+    co-ordinates ``x``, output co-ordinates ``trns_var`` and node spacing ``h``, the
+    transform of an :class:`ExtendedSpline` tabulated on ``x`` is a single
+    matrix-vector product with its data. The only exception is the contribution of its
+    extrapolated ends, which is evaluated on each call (and skipped if they are zero).
+
+    Unlike :func:`hankel_transform`, the sum is always performed over all nodes up to
+    ``3.2/h``, rather than being truncated once it has converged for each scale.
+
+    Parameters
+    ----------
+    x
+        The co-ordinates at which the functions to be transformed are tabulated.
+    trns_var
+        The co-ordinates to which to transform.
+    trns_var_name
+        Either 'r' (transforming power to correlation) or 'k' (transforming
+        correlation to power).
+    h
+        The spacing of the Ogata nodes.
+    k
+        The degree of the splines to be transformed.
+
+    Examples
+    --------
+    >>> op = HankelOperator(k, r, "r")
+    >>> corr = op(ExtendedSpline(k, power, upper_func="power_law"))
+    """
+
+    def __init__(
+        self,
+        x: np.ndarray,
+        trns_var: np.ndarray,
+        trns_var_name: str,
+        h: float = 0.005,
+        k: int = 3,
+        max_block_size: int = 2 ** 21,
+    ):
+        if trns_var_name not in "kr":
+            raise ValueError("trns_var_name must be either 'k' or 'r'.")
+
+        self.x = x
+        self.trns_var = trns_var
+        self.trns_var_name = trns_var_name
+        self.h = h
+        self.k = k
+        self._max_block_size = max_block_size
+
+        if trns_var_name == "r":
+            self._norm = 1 / (2 * np.pi ** 2 * trns_var ** 3)
+        else:
+            self._norm = 4 * np.pi / trns_var ** 3
+
+        self._setup()
+
+    def _setup(self):
+        nodes, weights = _get_sumspace(self.h, 1, int(3.2 / self.h))
+        self._nodes = nodes
+        self._weights = weights
+
+        # Nodes are increasing, so for every output the nodes that fall within the
+        # range of x form a contiguous range.
+        self._start = np.searchsorted(nodes, self.x.min() * self.trns_var, side="left")
+        self._stop = np.searchsorted(nodes, self.x.max() * self.trns_var, side="right")
+
+        t = _interpolating_spline_knots(self.x, self.k)
+        ncoeff = len(t) - self.k - 1
+        n_out = len(self.trns_var)
+
+        matrix = np.zeros(n_out * ncoeff)
+        for rows, indx in self._node_ranges(self._start, self._stop):
+            kk = nodes[indx] / self.trns_var[rows]
+            first, basis = _bspline_basis(t, self.k, kk)
+            for j in range(self.k + 1):
+                matrix += np.bincount(
+                    rows * ncoeff + first + j,
+                    weights=weights[indx] * basis[j],
+                    minlength=len(matrix),
+                )
+
+        self._matrix = (
+            self._norm[:, None]
+            * np.linalg.solve(
+                _collocation_matrix(self.x, self.k).T, matrix.reshape((n_out, ncoeff)).T
+            ).T
+        )
+
+    def _node_ranges(self, start, stop):
+        """Iterate over blocks of (output index, node index) pairs.
+
+        Each output, ``i``, has nodes from ``start[i]`` to ``stop[i]``. Blocks contain
+        whole outputs, and at most ``max_block_size`` pairs (unless a single output
+        has more than that).
+        """
+        counts = np.clip(stop - start, 0, None)
+        cumcounts = np.cumsum(counts)
+        first = 0
+        while first < len(counts):
+            offset = cumcounts[first] - counts[first]
+            last = max(
+                first + 1,
+                np.searchsorted(cumcounts, offset + self._max_block_size, side="right"),
+            )
+            rows = np.repeat(np.arange(first, last), counts[first:last])
+            block_start = cumcounts[first:last] - counts[first:last] - offset
+            indx = (
+                np.arange(len(rows))
+                - np.repeat(block_start, counts[first:last])
+                + np.repeat(start[first:last], counts[first:last])
+            )
+            yield rows, indx
+            first = last
+
+    def _ogata_tail(self, func, start, stop):
+        """The contribution of ``func`` evaluated at nodes from start to stop."""
+        out = np.zeros(len(self.trns_var))
+        for rows, indx in self._node_ranges(start, stop):
+            vals = _evaluate_on_grid(func, self._nodes[indx] / self.trns_var[rows])
+            out += np.bincount(
+                rows, weights=self._weights[indx] * vals, minlength=len(out)
+            )
+        return out * self._norm
+
+    def _power_law_tail(self, norm, slope, start, stop):
+        """The contribution of ``norm * x**slope`` (per row) at nodes from start to stop.
+
+        For a power-law, the sum over nodes factors into a power of the transformed
+        variable times a partial sum of ``weights * nodes**slope``, so the tails of
+        every row take a single cumulative sum over the nodes.
+        """
+        terms = self._weights * self._nodes ** slope[:, None]
+        if np.all(start == 0):
+            cumsum = np.cumsum(terms, axis=-1)
+            cumsum = np.concatenate((np.zeros((len(slope), 1)), cumsum), axis=-1)
+            partial = cumsum[:, stop] - cumsum[:, start]
+        else:
+            # Accumulate from the (small) far end of the nodes.
+            cumsum = np.cumsum(terms[:, ::-1], axis=-1)[:, ::-1]
+            cumsum = np.concatenate((cumsum, np.zeros((len(slope), 1))), axis=-1)
+            partial = cumsum[:, start] - cumsum[:, stop]
+
+        return norm[:, None] * self.trns_var ** -slope[:, None] * partial * self._norm
+
+    def _tails(self, f: "ExtendedSpline") -> np.ndarray:
+        """The contribution of the extensions of each function in ``f``."""
+        nrows = len(np.atleast_2d(f.y))
+        out = np.zeros((nrows, len(self.trns_var)))
+
+        for ext, start, stop in (
+            (f._lower, np.zeros_like(self._start), self._start),
+            (f._upper, self._stop, np.full_like(self._stop, len(self._nodes))),
+        ):
+            kind, fnc, params = ext
+            if kind == "zero":
+                continue
+            elif kind == "func":
+                # Same function for every row, up to normalization.
+                out += params[:, None] * self._ogata_tail(fnc, start, stop)
+            elif kind == "power_law":
+                out += self._power_law_tail(np.exp(params[0]), params[1], start, stop)
+            elif kind == "boundary":
+                out += self._power_law_tail(params, np.zeros(nrows), start, stop)
+            else:
+                for row in range(nrows):
+                    out[row] += self._ogata_tail(
+                        lambda x: f._evaluate_extension(
+                            ext, x, np.full(x.shape, row, dtype=int)
+                        ),
+                        start,
+                        stop,
+                    )
+        return out
+
+    def __call__(self, f: "ExtendedSpline") -> np.ndarray:
+        """Compute the Hankel transform of a spline tabulated on ``x``.
+
+        If ``f`` is a stack of functions, each is transformed to every ``trns_var``,
+        and the output has shape ``(len(f.y), len(trns_var))``.
+        """
+        if not isinstance(f, ExtendedSpline) or not np.array_equal(f.x, self.x):
+            raise ValueError("f must be an ExtendedSpline tabulated on the same x.")
+
+        out = np.atleast_2d(f.y) @ self._matrix.T + self._tails(f)
+        return out[0] if f.y.ndim == 1 else out
+
+
 def power_to_corr_ogata(
     power: np.ndarray,
     k: np.ndarray,
@@ -412,7 +838,7 @@ def populate(
     # Using ns gives the correct answer for both central condition and not.
     # Note that other parts of the algorithm also need to be changed if central condition
     # is not true.
-    sgal = poisson.rvs(hodmod.ns(masses))
+    sgal = np.random.poisson(hodmod.ns(masses))
 
     # Get an array ready, hopefully speeds things up a bit
     ncen = np.sum(cgal)
@@ -452,6 +878,8 @@ def populate(
         pos[indx[i] : indx[i + 1], :] = profile.populate(n, m, centre=ctr)
 
     if HAVE_POOL:
+        from pathos import multiprocessing as mp
+
         mp.ProcessingPool(mp.cpu_count()).map(fill_array, list(range(len(masses))))
     else:
         for i in range(len(masses)):
@@ -484,7 +912,182 @@ def populate(
     return pos, halo.astype("int"), ncen
 
 
-class ExtendedSpline:
+def _interpolating_spline_knots(x: np.ndarray, k: int) -> np.ndarray:
+    """The full knot vector of the interpolating spline of degree ``k`` through ``x``.
+
+    This is the knot vector used by :class:`scipy.interpolate.InterpolatedUnivariateSpline`.
+    """
+    knots = spline(x, x, k=k).get_knots()
+    return np.concatenate(([knots[0]] * k, knots, [knots[-1]] * k))
+
+
+def _bspline_basis(t: np.ndarray, k: int, x: np.ndarray):
+    """Evaluate the non-zero B-spline basis functions of degree ``k`` at ``x``.
+
+    Points outside the knots are evaluated with the polynomial piece of the nearest
+    interval, i.e. they are extrapolated.
+
+    Returns
+    -------
+    first : array of int
+        The index of the first non-zero basis function for each ``x``.
+    basis : list of arrays
+        The values of the basis functions ``first`` to ``first + k`` at each ``x``.
+    """
+    x = np.asarray(x, dtype=float)
+    n = len(t) - k - 1
+    interval = np.clip(np.searchsorted(t, x, side="right") - 1, k, n - 1)
+
+    # Cox-de Boor recursion (see e.g. Piegl & Tiller, The NURBS Book, A2.2).
+    basis = [np.ones_like(x)]
+    left = [None]
+    right = [None]
+    for j in range(1, k + 1):
+        left.append(x - t[interval + 1 - j])
+        right.append(t[interval + j] - x)
+        saved = 0
+        for r in range(j):
+            temp = basis[r] / (right[r + 1] + left[j - r])
+            basis[r] = saved + right[r + 1] * temp
+            saved = left[j - r] * temp
+        basis.append(saved)
+
+    return interval - k, basis
+
+
+def _collocation_matrix(x: np.ndarray, k: int) -> np.ndarray:
+    """The values of each B-spline basis function of the interpolating spline at x."""
+    first, basis = _bspline_basis(_interpolating_spline_knots(x, k), k, x)
+    out = np.zeros((len(x), len(x)))
+    for j in range(k + 1):
+        out[np.arange(len(x)), first + j] = basis[j]
+    return out
+
+
+def _interpolating_spline_matrix(x: np.ndarray, k: int, xnew: np.ndarray) -> np.ndarray:
+    """The matrix mapping data at ``x`` to its interpolating spline at ``xnew``."""
+    first, basis = _bspline_basis(_interpolating_spline_knots(x, k), k, xnew)
+    design = np.zeros((len(xnew), len(x)))
+    for j in range(k + 1):
+        design[np.arange(len(xnew)), first + j] = basis[j]
+    return np.linalg.solve(_collocation_matrix(x, k).T, design.T).T
+
+
+class SplineFamily:
+    """
+    A family of interpolating splines of several curves on a shared grid.
+
+    The curves share their knots, so the interpolation problem is solved for all of
+    them at once, and they can be evaluated together (at the same points, or at a
+    different set of points for each curve) in one call. Everything is stored as
+    plain arrays, so instances are light-weight and can be pickled.
+
+    Parameters
+    ----------
+    x
+        The shared co-ordinates of the data (increasing).
+    y
+        The data, with one row per curve (and ``len(x)`` columns).
+    k
+        The degree of the splines.
+
+    Examples
+    --------
+    >>> x = np.linspace(0, 1, 20)
+    >>> family = SplineFamily(x, np.array([x ** 2, x ** 3]))
+    >>> family([0.5, 0.6]).shape
+    (2, 2)
+    >>> np.allclose(family(np.array([[0.5], [0.6]])), [[0.25], [0.216]])
+    True
+    """
+
+    __slots__ = ("x", "y", "_t", "_k", "_coeffs")
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, k: int = 3):
+        self.x = x
+        self.y = y
+        self._k = k
+        self._t = _interpolating_spline_knots(x, k)
+        self._coeffs = make_interp_spline(x, np.atleast_2d(y).T, k=k, t=self._t).c.T
+
+    def _spline_at(self, x: float) -> np.ndarray:
+        """The value of every curve at the scalar x."""
+        return np.array([splev(x, (self._t, c, self._k)) for c in self._coeffs])
+
+    def _splev(self, x, rows, mask=None):
+        """Evaluate the spline of ``rows[i]`` at ``x[i]`` (where ``mask[i]``).
+
+        Points outside the data are extrapolated with the polynomial of the nearest
+        interval. Unmasked points are zero.
+        """
+        out = np.zeros(x.shape)
+        for i, (row, xx) in enumerate(zip(rows, x)):
+            if mask is None or np.all(mask[i]):
+                out[i] = splev(xx, (self._t, self._coeffs[row], self._k))
+            elif np.any(mask[i]):
+                out[i, mask[i]] = splev(
+                    xx[mask[i]], (self._t, self._coeffs[row], self._k)
+                )
+        return out
+
+    def _broadcast_rows(self, x, rows):
+        """Get the rows to evaluate, and x with one row for each."""
+        if rows is None:
+            rows = np.arange(len(self._coeffs))
+
+        if x.ndim == 1:
+            x = np.broadcast_to(x, (len(rows), len(x)))
+        elif x.shape[0] != len(rows):
+            raise ValueError("x must have one row for every spline evaluated.")
+
+        return x, rows
+
+    def __call__(self, x, rows=None):
+        """Evaluate the curves at ``x``.
+
+        If ``x`` is 1D, each curve given by ``rows`` (default all) is evaluated at
+        ``x``. Otherwise, ``x`` should have one row per curve in ``rows``. The output
+        has shape ``(len(rows), x.shape[-1])``.
+        """
+        x, rows = self._broadcast_rows(np.asarray(x, dtype=float), rows)
+        if not x.size:
+            return np.zeros(x.shape)
+        return self._splev(x, rows)
+
+
+class ExtendedSpline(SplineFamily):
+    """
+    An interpolating spline with arbitrary behaviour below and above its data.
+
+    Everything is stored as plain arrays (the B-spline knots and coefficients, and
+    the parameters of each extension), so that instances are light-weight and can be
+    pickled (as long as any callable extension can be).
+
+    Parameters
+    ----------
+    x
+        The co-ordinates of the data (increasing).
+    y
+        The data. If 2D, it is treated as a :class:`SplineFamily` of functions of
+        ``x``, one per row, which all share the same extension behaviour (though any
+        matching or power-law fits are performed per row). Calling such a stack
+        evaluates every row at once.
+    lower_func, upper_func
+        The behaviour below/above the range of ``x``. A callable is used directly
+        (optionally matched to the spline at the boundary), 'power_law' fits a
+        power-law to the ``lower_power_law_n``/``upper_power_law_n`` data points at
+        the edge, 'boundary' holds the boundary value constant, and None
+        extrapolates the spline itself.
+    match_lower, match_upper
+        Whether to normalize callable extensions to match the spline at the boundary.
+    domain
+        The domain within which ``x`` must lie.
+    k
+        The degree of the interpolating spline.
+    """
+
+    __slots__ = ("xmin", "xmax", "_lower", "_upper")
+
     def __init__(
         self,
         x: np.ndarray,
@@ -498,88 +1101,133 @@ class ExtendedSpline:
         lower_power_law_n=10,
         upper_power_law_n=10,
     ):
-        """Generate a function from data x,y with arbitrary behaviour below and above limit."""
-
         if x.min() < domain[0] or x.max() > domain[1]:
             raise ValueError("x is outside domain")
 
+        super().__init__(x, y, k=k)
         self.xmin = x.min()
         self.xmax = x.max()
 
-        self._spl = spline(x, y, k=k, ext="extrapolate")
-
-        self.lfunc = self._get_extension_func(
+        yy = np.atleast_2d(y)
+        self._lower = self._get_extension(
             lower_func,
             x[:lower_power_law_n],
-            y[:lower_power_law_n],
+            yy[:, :lower_power_law_n],
             match_lower,
             self.xmin,
         )
-        self.ufunc = self._get_extension_func(
+        self._upper = self._get_extension(
             upper_func,
             x[-upper_power_law_n:],
-            y[-upper_power_law_n:],
+            yy[:, -upper_power_law_n:],
             match_upper,
             self.xmax,
         )
 
-    def _get_extension_func(self, fnc, x, y, match, match_x):
-        """Function to generate the extended spline"""
-        if callable(fnc):
-            if match:
-                ff = fnc(match_x)
-                if ff == 0:
-                    return fnc
-                else:
-                    norm = self._spl(match_x) / ff
-                    return lambda xx: fnc(xx) * norm
-            else:
-                return fnc
+    def _get_extension(self, fnc, x, y, match, match_x):
+        """Get the (kind, function, parameters) of an extension of each row."""
+        if fnc is _zero:
+            return "zero", None, None
+        elif callable(fnc):
+            if not match:
+                return "func", fnc, np.ones(len(y))
+            ff = fnc(match_x)
+            if ff == 0:
+                return "func", fnc, np.ones(len(y))
+            return "func", fnc, self._spline_at(match_x) / ff
         elif fnc == "power_law":
             assert np.all(x > 0), "to use a power-law, x must be >= 0"
-            if not np.all(y > 0) or np.all(y < 0):
+            positive = np.all(y > 0, axis=-1)
+            if not np.all(positive):
                 warnings.warn(
-                    "to use a power-law, y must be all positive or negative. Switching to zero extrapolation."
+                    "to use a power-law, y must be all positive or negative. Switching "
+                    "to zero extrapolation."
                 )
-                return _zero
-            neg = y[0] < 0
-
-            spl = uspline(np.log(x), np.log(y * (-1 if neg else 1)), k=1)
-
-            return lambda xx: np.exp(spl(np.log(xx))) * (-1 if neg else 1)
+            # Least-squares straight line in log-log space.
+            lnx = np.log(x)
+            lny = np.log(np.where(positive[:, None], y, 1))
+            slope = np.sum(
+                (lnx - lnx.mean()) * (lny - lny.mean(axis=-1)[:, None]), axis=-1
+            ) / np.sum((lnx - lnx.mean()) ** 2)
+            intercept = lny.mean(axis=-1) - slope * lnx.mean()
+            return "power_law", None, (np.where(positive, intercept, -np.inf), slope)
         elif fnc == "boundary":
-            return lambda xx: np.ones_like(xx) * self._spl(match_x)
+            return "boundary", None, self._spline_at(match_x)
         elif fnc is None:
-            return self._spl
+            return "spline", None, None
         else:
             raise ValueError("Invalid choice for lower or upper func")
 
-    def __call__(self, x):
-        """Function to call the output"""
-        if np.isscalar(x):
-            if x < self.xmin:
-                return self.lfunc(x)
-            elif x > self.xmax:
-                return self.ufunc(x)
-            else:
-                return self._spl(x)
-        else:
-            x = np.array(x)
+    def _spl(self, x):
+        """The (extrapolated) interpolating spline, for a 1D spline."""
+        return splev(x, (self._t, self._coeffs[0], self._k))
+
+    def _evaluate_extension(self, ext, x, rows):
+        """Evaluate an extension at x, for the given row of each x."""
+        kind, fnc, params = ext
+        if kind == "func":
+            return fnc(x) * params[rows]
+        elif kind == "power_law":
+            return np.exp(params[0][rows] + params[1][rows] * np.log(x))
+        elif kind == "boundary":
+            return params[rows] * np.ones_like(x)
+        elif kind == "spline":
             out = np.zeros_like(x)
-            lmask = x < self.xmin
-            umask = x > self.xmax
-            mmask = ~(lmask | umask)
+            for row in np.unique(rows):
+                mask = rows == row
+                out[mask] = splev(x[mask], (self._t, self._coeffs[row], self._k))
+            return out
+        else:
+            return np.zeros_like(x)
 
-            xlo = x[lmask]
-            xhi = x[umask]
-            xmid = x[mmask]
+    def lfunc(self, x):
+        """The lower extension of a 1D spline, evaluated at x."""
+        x = np.asarray(x, dtype=float)
+        return self._evaluate_extension(self._lower, x, np.zeros(x.shape, dtype=int))
 
-            # print(out.shape, x.shape, lmask, xlo, self.lfunc, self.ufunc)
-            out[lmask] = self.lfunc(xlo)
-            out[umask] = self.ufunc(xhi)
-            out[mmask] = self._spl(xmid)
+    def ufunc(self, x):
+        """The upper extension of a 1D spline, evaluated at x."""
+        x = np.asarray(x, dtype=float)
+        return self._evaluate_extension(self._upper, x, np.zeros(x.shape, dtype=int))
 
-            return out
+    def _evaluate(self, x, rows):
+        """Evaluate the function of ``rows[i]`` at each of ``x[i]``."""
+        lmask = x < self.xmin
+        umask = x > self.xmax
+
+        # Points at which to evaluate the spline itself (possibly extrapolated).
+        spline_mask = ~(lmask | umask)
+        if self._lower[0] == "spline":
+            spline_mask |= lmask
+        if self._upper[0] == "spline":
+            spline_mask |= umask
+
+        if not x.size:
+            return np.zeros(x.shape)
+
+        out = self._splev(x, rows, spline_mask)
+
+        for ext, mask in ((self._lower, lmask), (self._upper, umask)):
+            if ext[0] not in ("spline", "zero") and np.any(mask):
+                rr = np.broadcast_to(np.asarray(rows)[:, None], x.shape)
+                out[mask] = self._evaluate_extension(ext, x[mask], rr[mask])
+
+        return out
+
+    def __call__(self, x, rows=None):
+        """Evaluate the function at ``x``.
+
+        For a stack of functions, ``x`` may be 1D, in which case each function given
+        by ``rows`` (default all) is evaluated at ``x``. Otherwise, ``x`` should have
+        one row per function in ``rows``. The output then has shape
+        ``(len(rows), x.shape[-1])``.
+        """
+        x = np.asarray(x, dtype=float)
+
+        if self.y.ndim == 1:
+            return self._evaluate(x.reshape((1, x.size)), [0]).reshape(x.shape)[()]
+
+        return self._evaluate(*self._broadcast_rows(x, rows))
 
 
 def _zero(x):
@@ -590,13 +1238,230 @@ def _zero(x):
         return np.zeros_like(x)
 
 
+class PowerLaw:
+    """
+    A (picklable) power-law function, :math:`x^n`.
+
+    Parameters
+    ----------
+    index
+        The power-law index, :math:`n`.
+    """
+
+    __slots__ = ("index",)
+
+    def __init__(self, index: float):
+        self.index = index
+
+    def __call__(self, x):
+        return np.asarray(x, dtype=float) ** self.index
+
+    def __repr__(self):
+        return f"PowerLaw({self.index})"
+
+
+class SumOfTerms:
+    """
+    A (picklable) callable returning the sum of several callables, plus a constant.
+
+    Each term is evaluated at the same arguments, so this is a drop-in replacement
+    for a function like ``lambda x: f(x) + g(x) + 1``, but one that can be pickled
+    and sent to other processes (as long as its terms can).
+
+    Parameters
+    ----------
+    terms
+        The callables to sum.
+    constant
+        A constant to add to the sum.
+
+    Examples
+    --------
+    >>> f = SumOfTerms(np.sin, np.cos, constant=1)
+    >>> np.isclose(f(0.0), 2.0)
+    True
+    """
+
+    __slots__ = ("terms", "constant")
+
+    def __init__(self, *terms: callable, constant: float = 0):
+        self.terms = terms
+        self.constant = constant
+
+    def __call__(self, *args, **kwargs):
+        out = self.terms[0](*args, **kwargs)
+        for term in self.terms[1:]:
+            out = out + term(*args, **kwargs)
+        return out + self.constant if self.constant else out
+
+
+class SplineQuadrature:
+    """
+    Quadrature weights for :func:`spline_integral` on a fixed grid.
+
+    The integral of the interpolating spline through data on a fixed grid is a fixed
+    linear functional of the data. This class computes the weights of that functional
+    once, so that each integral over the grid is just a dot product (or a matrix
+    product, for many integrands at once).
+
+    Parameters
+    ----------
+    x
+        The co-ordinates of the integral.
+    xmin
+        The lower bound of the integral. By default, the start of ``x``.
+    xmax
+        The upper bound of the integral. By default, the end of ``x``.
+    log
+        Whether to interpolate the integrand in log space.
+    k
+        The degree of the interpolating spline.
+
+    Examples
+    --------
+    >>> m = np.logspace(10, 15, 100)
+    >>> quad = SplineQuadrature(m, xmin=1e12)
+    >>> np.isclose(quad(m ** -2), spline_integral(m, m ** -2, xmin=1e12))
+    True
+    """
+
+    __slots__ = (
+        "x",
+        "xmin",
+        "xmax",
+        "log",
+        "k",
+        "weights",
+        "_grid",
+        "_knots",
+        "_scale",
+        "_bands",
+        "_banded",
+    )
+
+    def __init__(
+        self,
+        x: np.ndarray,
+        xmin: [None, float] = None,
+        xmax: [None, float] = None,
+        log: bool = True,
+        k: int = 3,
+    ):
+        self.x = x
+        self.xmin = x.min() if xmin is None else xmin
+        self.xmax = x.max() if xmax is None else xmax
+        self.log = log
+        self.k = k
+
+        self._grid = np.log(x) if log else x
+        n = len(x)
+        t = _interpolating_spline_knots(self._grid, k)
+
+        # The integral of the basis functions up to u can be written in terms of the
+        # basis of degree k+1 on the extended knots (de Boor, A Practical Guide to
+        # Splines, X.(32)): int B_{i,k} = (t_{i+k+1} - t_i)/(k+1) sum_{j>i} B_{j,k+1}.
+        self._knots = np.concatenate(([t[0]], t, [t[-1]]))
+        self._scale = (t[k + 1 : k + 1 + n] - t[:n]) / (k + 1)
+
+        # The weights solve A^T w = b, with A the (banded) collocation matrix, which
+        # we store in the banded form of the transpose.
+        first, basis = _bspline_basis(t, k, self._grid)
+        offsets = first[:, None] + np.arange(k + 1) - np.arange(n)[:, None]
+        self._bands = (max(offsets.max(), 0), max(-offsets.min(), 0))
+        self._banded = np.zeros((sum(self._bands) + 1, n))
+        self._banded[self._bands[1] + offsets, np.arange(n)[:, None]] = np.array(
+            basis
+        ).T
+
+        self.weights = self.cumulative_weights(self.xmin)
+
+    def _to_grid(self, x):
+        x = np.clip(np.asarray(x, dtype=float), self.x.min(), self.x.max())
+        return np.log(x) if self.log else x
+
+    def _basis_integral(self, u):
+        """The integral of each basis function from the start of the grid to u."""
+        first, basis = _bspline_basis(self._knots, self.k + 1, u)
+
+        # sum_{j>=i} B_{j,k+1}(u) is one for every i before the non-zero basis
+        # functions at u. Setting this exactly (rather than summing) means that
+        # integrals between two limits get no contribution from far below them.
+        n = len(self.x)
+        tail = (np.arange(n + 2) < first[:, None]).astype(float)
+        local = np.cumsum(np.array(basis[::-1]), axis=0)[::-1]
+        for j, b in enumerate(local):
+            tail[np.arange(len(u)), first + j] = b
+
+        return tail[:, 1 : n + 1] * self._scale
+
+    def cumulative_weights(self, xmin) -> np.ndarray:
+        """The weights of the integrals from each of ``xmin`` to ``xmax``.
+
+        As in FITPACK, the limits are clipped to the range of ``x``.
+
+        Returns
+        -------
+        weights
+            Array with the shape of ``xmin`` plus a final axis of length ``len(x)``.
+        """
+        lower = np.ravel(self._to_grid(xmin))
+        upper = np.atleast_1d(self._to_grid(self.xmax))
+
+        b = self._basis_integral(upper) - self._basis_integral(lower)
+        weights = solve_banded(self._bands, self._banded, b.T).T
+        if self.log:
+            weights *= self.x
+
+        return weights.reshape(np.shape(xmin) + self.x.shape)
+
+    def __call__(self, f: np.ndarray, axis: int = -1) -> [float, np.ndarray]:
+        """Integrate ``f``, defined on ``x`` along ``axis``, from ``xmin`` to ``xmax``."""
+        return np.moveaxis(f, axis, -1) @ self.weights
+
+    def cumulative(self, f: np.ndarray, xmin, axis: int = -1) -> np.ndarray:
+        """Integrate ``f`` along ``axis`` from each of ``xmin`` to ``xmax``.
+
+        ``xmin`` is broadcast against the shape of ``f`` without ``axis``, so that
+        each integrand can have its own lower limit.
+        """
+        return np.sum(self.cumulative_weights(xmin) * np.moveaxis(f, axis, -1), axis=-1)
+
+
+@lru_cache(maxsize=25)
+def _cached_spline_quadrature(x: bytes, xmin, xmax, log: bool) -> SplineQuadrature:
+    quad = SplineQuadrature(np.frombuffer(x), xmin=xmin, xmax=xmax, log=log)
+    quad.weights.flags.writeable = False
+    return quad
+
+
+def get_spline_quadrature(
+    x: np.ndarray,
+    xmin: [None, float] = None,
+    xmax: [None, float] = None,
+    log: bool = True,
+) -> SplineQuadrature:
+    """Get a (cached) :class:`SplineQuadrature`.
+
+    Quadratures are cached on the values of the grid, limits and method, so that
+    repeated integrals over the same grid (e.g. for many HOD parameters) re-use the
+    same weights.
+    """
+    return _cached_spline_quadrature(
+        np.asarray(x, dtype=float).tobytes(),
+        None if xmin is None else float(xmin),
+        None if xmax is None else float(xmax),
+        log,
+    )
+
+
 def spline_integral(
     x: np.ndarray,
     f: np.ndarray,
-    xmin: [None, float] = None,
+    xmin: [None, float, np.ndarray] = None,
     xmax: [None, float] = None,
     log: bool = True,
-) -> float:
+    axis: int = -1,
+) -> [float, np.ndarray]:
     """
     Perform an integral using a spline function over a vector of data.
 
@@ -604,25 +1469,37 @@ def spline_integral(
     don't necessarily fall on a particular x co-ordinate. It falls back to integrating
     over all ``x`` if no explicit ``xmin`` is given.
 
+    The integral of an interpolating spline is a weighted sum of the data, so many
+    integrands on the same ``x`` (i.e. a multi-dimensional ``f``) are integrated
+    together with a single set of weights (see :class:`SplineQuadrature`, which can
+    be kept to re-use the weights for many calls, and :func:`get_spline_quadrature`,
+    which caches them).
+
     Parameters
     ----------
     x
         The co-ordinates of the integral
     f
-        The integrand at ``x`` (same shape as ``x``).
+        The integrand at ``x``. May be multi-dimensional, in which case ``axis`` is
+        the axis over which to integrate, and must have the length of ``x``.
     xmin
-        The lower bound of the integral.
+        The lower bound of the integral. For multi-dimensional ``f``, this may be an
+        array with the shape of ``f`` without ``axis``, giving a different lower bound
+        for each integrand.
     xmax
         The upper bound of the integral.
     log
         Whether to interpolate the integrand in log space.
+    axis
+        The axis of ``f`` over which to integrate.
 
     Returns
     -------
     integral
-        The integral from ``xmin`` to ``xmax``.
+        The integral from ``xmin`` to ``xmax``. Has the shape of ``f`` without
+        ``axis``.
     """
-    if xmin and xmin < x.min():
+    if xmin is not None and np.any(xmin < x.min()):
         warnings.warn(
             f"Extrapolation occurs in integral! xmin={xmin} while x.min() ={x.min()}"
         )
@@ -631,12 +1508,189 @@ def spline_integral(
             f"Extrapolation occurs in integral! xmax={xmax} while x.max() ={x.max()}"
         )
 
-    if log:
-        spl = spline(np.log(x), x * f)
-        return spl.integral(
-            np.log(xmin) if xmin is not None else np.log(x.min()),
-            np.log(xmax) if xmax is not None else np.log(x.max()),
-        )
-    else:
-        spl = spline(x, f)
-        return spl.integral(xmin or x.min(), xmax or x.max())
+    if np.ndim(f) == 1:
+        if log:
+            spl = spline(np.log(x), x * f)
+            return spl.integral(
+                np.log(xmin) if xmin is not None else np.log(x.min()),
+                np.log(xmax) if xmax is not None else np.log(x.max()),
+            )
+        else:
+            spl = spline(x, f)
+            return spl.integral(xmin or x.min(), xmax or x.max())
+
+    if xmin is None or np.ndim(xmin) == 0:
+        return get_spline_quadrature(x, xmin=xmin, xmax=xmax, log=log)(f, axis=axis)
+    return get_spline_quadrature(x, xmax=xmax, log=log).cumulative(f, xmin, axis=axis)
+
+
+@lru_cache(maxsize=8)
+def _filon_setup(order: int):
+    """Nodes of the panels of :func:`cumulative_sine_integral`, and the quantities
+    needed to get their weights (see :func:`_filon_weights`)."""
+    t = np.polynomial.legendre.leggauss(order)[0]
+    # Coefficients of the interpolating polynomial (in powers of t) from its values.
+    vinv = np.linalg.inv(np.vander(t, increasing=True))
+    # A quadrature of the Lagrange polynomials times exp(i w t), exact for small w.
+    tq, wq = np.polynomial.legendre.leggauss(4 * order)
+    lagrange = wq[:, None] * (np.vander(tq, order, increasing=True) @ vinv)
+    return t, vinv, tq, lagrange
+
+
+def _filon_weights(omega: np.ndarray, order: int) -> np.ndarray:
+    r"""
+    The weights of a Filon-type rule on :math:`[-1, 1]`.
+
+    These are :math:`W_i(\omega) = \int_{-1}^1 L_i(t) e^{i \omega t} dt`, where
+    :math:`L_i` are the Lagrange polynomials through the Gauss-Legendre nodes of given
+    order, so that :math:`\sum_i W_i g(t_i)` integrates the interpolating polynomial
+    of :math:`g` times :math:`e^{i\omega t}` exactly. The weights have shape
+    ``omega.shape + (order,)``.
+    """
+    _, vinv, tq, lagrange = _filon_setup(order)
+    omega = np.asarray(omega, dtype=float)
+    out = np.empty(omega.shape + (order,), dtype=complex)
+
+    # For small omega, the (non-oscillatory) integrand is integrated directly.
+    small = omega < order
+    out[small] = np.exp(1j * np.outer(omega[small], tq)) @ lagrange
+
+    # Otherwise, the moments of t^j are found by (forward-stable) recursion.
+    iw = 1j * omega[~small]
+    ep, em = np.exp(iw), np.exp(-iw)
+    moments = np.empty((len(iw), order), dtype=complex)
+    moments[:, 0] = (ep - em) / iw
+    for j in range(1, order):
+        moments[:, j] = (ep - (-1) ** j * em - j * moments[:, j - 1]) / iw
+    out[~small] = moments @ vinv
+    return out
+
+
+def cumulative_sine_integral(
+    f: callable,
+    k: np.ndarray,
+    c: np.ndarray,
+    order: int = 8,
+    n_log: int = 100,
+    x_min: float = 1e-6,
+):
+    r"""
+    Integrate :math:`x f(x) \sin(kx)/k` from zero to each of many upper limits.
+
+    The integral from zero to the largest limit is split into panels, which break at
+    every upper limit (so that the integrals to each limit are cumulative sums of the
+    panels) and on a logarithmic grid (to resolve the function near zero). In each
+    panel, :math:`x f(x)` is interpolated by a polynomial through the Gauss-Legendre
+    nodes of given order, and its product with :math:`\sin(kx)` integrated exactly
+    (a Filon-type rule). The number of panels (and evaluations of ``f``) is thus
+    independent of ``k``, however oscillatory the integrand, and all of the panels
+    for all ``k`` are integrated with array operations.
+
+    Parameters
+    ----------
+    f
+        The function to transform, taking an array of ``x`` of any shape.
+    k
+        The (1D) wavenumbers.
+    c
+        The (1D) upper limits of the integral.
+    order
+        The order of the Gauss-Legendre nodes in each panel.
+    n_log
+        The number of logarithmically spaced breaks between ``x_min * max(c)`` and
+        ``max(c)``.
+    x_min
+        The smallest logarithmic break, relative to ``max(c)``.
+
+    Returns
+    -------
+    integral : np.ndarray
+        The integral, with shape ``(len(c), len(k))``.
+    error : np.ndarray
+        An estimate of the absolute error of ``integral``, from the difference with
+        a rule of half the order. This is conservative, as it is the error of the
+        lower-order rule.
+    """
+    k = np.atleast_1d(np.asarray(k, dtype=float))
+    cs, inverse = np.unique(np.asarray(c, dtype=float), return_inverse=True)
+    cmax = cs[-1]
+
+    breaks = np.union1d(np.geomspace(x_min * cmax, cmax, n_log), cs)
+    breaks = np.concatenate(([0.0], breaks[breaks <= cmax]))
+    mid = (breaks[1:] + breaks[:-1]) / 2
+    half = (breaks[1:] - breaks[:-1]) / 2
+
+    panels = []
+    for n in (order, max(order // 2, 1)):
+        t = _filon_setup(n)[0]
+        x = mid[:, None] + half[:, None] * t
+        g = x * f(x)
+
+        # Integral over each panel, for each k (one k at a time to bound memory).
+        panel = np.empty((len(mid), len(k)))
+        for i, kk in enumerate(k):
+            weights = _filon_weights(kk * half, n)
+            panel[:, i] = (
+                half * (np.exp(1j * kk * mid) * np.sum(weights * g, axis=-1)).imag / kk
+            )
+        panels.append(panel)
+
+    # The number of panels below each limit.
+    indx = np.searchsorted(breaks, cs)
+    integral, low = (
+        np.concatenate((np.zeros((1, len(k))), np.cumsum(p, axis=0)))[indx]
+        for p in panels
+    )
+    error = np.concatenate(
+        (np.zeros((1, len(k))), np.cumsum(np.abs(panels[0] - panels[1]), axis=0))
+    )[indx]
+    return integral[inverse], error[inverse]
+
+
+def rotated_sine_transform(
+    f: callable, k: np.ndarray, h: float = 0.1, t_range=(1e-20, 1e20),
+) -> np.ndarray:
+    r"""
+    Transform :math:`x^2 f(x) \sin(kx)/(kx)`, integrated from zero to infinity.
+
+    The function must be analytic (and decay) in the first quadrant of the complex
+    plane, so that the contour of the integral may be rotated onto the positive
+    imaginary axis, where
+
+    .. math:: \int_0^\infty x^2 f(x) \frac{\sin(kx)}{kx} dx = \int_0^\infty t\,
+              {\rm Im}[f(it)] \frac{1 - e^{-kt}}{k} dt.
+
+    The integrand on the right does not oscillate and is exponentially damped, so
+    it is integrated with the trapezoidal rule in :math:`\ln t`, which converges
+    exponentially fast. Since ``f`` is evaluated once (on the nodes of the rule),
+    all ``k`` are integrated together.
+
+    Parameters
+    ----------
+    f
+        The function to transform, taking a complex array.
+    k
+        The wavenumbers.
+    h
+        The step of the trapezoidal rule in :math:`\ln t`. It must be small
+        compared to the angle between the imaginary axis and the nearest singularity
+        of ``f``.
+    t_range
+        The range of :math:`t` integrated over.
+
+    Returns
+    -------
+    transform : np.ndarray
+        The transform, with the same shape as ``k``.
+    """
+    k = np.asarray(k, dtype=float)
+    t = np.exp(np.arange(np.log(t_range[0]), np.log(t_range[1]) + h, h))
+    g = h * t ** 2 * f(1j * t).imag
+
+    out = np.empty(k.size)
+    flat = k.ravel()
+    # In chunks of k, to bound memory.
+    for i in range(0, flat.size, 256):
+        kk = flat[i : i + 256, None]
+        out[i : i + 256] = np.sum(g * -np.expm1(-kk * t), axis=-1) / kk[:, 0]
+    return out.reshape(k.shape)
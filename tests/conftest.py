@@ -6,3 +6,14 @@ from pathlib import Path
 def datadir() -> Path:
     """The directory in which the test data resides."""
     return Path(__file__).parent / "data"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def profile_table_dir(tmp_path_factory):
+    """Save profile tables computed during the tests in a temporary directory."""
+    from halomod import profile_tables
+
+    old = profile_tables.get_table_directory()
+    profile_tables.set_table_directory(tmp_path_factory.mktemp("profile_tables"))
+    yield profile_tables.get_table_directory()
+    profile_tables.set_table_directory(old)
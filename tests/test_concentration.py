@@ -1,3 +1,6 @@
+import subprocess
+import sys
+
 import pytest
 from halomod import concentration as cm
 import numpy as np
@@ -68,3 +71,9 @@ def test_decreasing_cm(cmr):
     hm = TracerHaloModel(halo_concentration_model=cmr)
     m = np.logspace(10, 15, 100)
     assert np.all(np.diff(hm.halo_concentration.cm(m, z=0)) <= 0)
+
+
+def test_colossus_not_imported():
+    """colossus is only loaded when a colossus-based model is made."""
+    code = "import sys, halomod.bias; assert 'colossus' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -16,6 +16,11 @@ from halomod.halo_exclusion import (
     NgMatched,
     NgMatched_,
     cumsimps,
+    compile_kernels,
+    integrate_dblsphere_,
+    integrate_dblell,
+    density_mod_,
+    prob_inner_,
 )
 import numpy as np
 import pytest
@@ -237,3 +242,25 @@ def test_ng_matched_large_r(ng_matched):
     )
 
     assert np.allclose(no_excl.integrate().flatten(), excl.integrate().flatten())
+
+
+def test_compile_kernels():
+    assert compile_kernels()
+    kernels = (integrate_dblsphere_, integrate_dblell, density_mod_, prob_inner_)
+    # Every kernel the models call is compiled, and cached on disk.
+    for kernel in kernels:
+        assert kernel.signatures
+        assert kernel._cache.__class__.__name__ == "FunctionCache"
+
+    # Models with non-contiguous inputs (as from the halo model with scale-dependent
+    # bias) use the warmed-up signatures rather than compiling new ones.
+    signatures = [list(kernel.signatures) for kernel in kernels]
+    m = np.logspace(10, 15, 12)
+    r = np.logspace(-1, 1, 3)
+    ifunc = np.ones((14, 3)).T[:, 1:-1]
+    bias = np.ones((14, 3)).T[:, 1:-1]
+    for kls in (DblSphere_, DblEllipsoid_, NgMatched_):
+        model = kls(m, m ** -2.0, ifunc, bias, r, 200.0, 1e11)
+        model.integrate()
+        model.density_mod
+    assert [list(kernel.signatures) for kernel in kernels] == signatures
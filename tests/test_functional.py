@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from halomod import DMHaloModel, halo_exclusion
+from halomod.functional import (
+    _uses_compiled_exclusion,
+    get_halomodel,
+    iter_sweep,
+    sweep,
+)
+
+KWARGS = {
+    "z": [0, 1],
+    "sigma_8": [0.7, 0.8, 0.9],
+    "transfer_model": "EH",
+    "dlog10m": 0.1,
+}
+
+
+def test_get_halomodel():
+    labels = [
+        label
+        for _, _, label in get_halomodel("power_auto_matter", kls=DMHaloModel, **KWARGS)
+    ]
+    assert len(labels) == 6
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_sweep(processes, tmp_path):
+    res = sweep(
+        ["power_auto_matter", "dndm"],
+        kls=DMHaloModel,
+        processes=processes,
+        outfile=tmp_path / "sweep.npy",
+        **KWARGS,
+    )
+    assert res.shape == (2, 3)
+    assert np.all(np.load(tmp_path / "sweep.npy") == res)
+
+    hm = DMHaloModel(z=1, sigma_8=0.8, transfer_model="EH", dlog10m=0.1)
+    assert np.allclose(res["power_auto_matter"][1, 1], hm.power_auto_matter)
+    assert np.allclose(res["dndm"][1, 1], hm.dndm)
+
+
+def test_iter_sweep_params():
+    for index, params, (z,) in iter_sweep("z", kls=DMHaloModel, processes=1, **KWARGS):
+        assert params == {
+            "z": KWARGS["z"][index[0]],
+            "sigma_8": KWARGS["sigma_8"][index[1]],
+        }
+        assert z == params["z"]
+
+
+@pytest.mark.skipif(not halo_exclusion.USE_NUMBA, reason="numba is not installed")
+def test_uses_compiled_exclusion():
+    assert not _uses_compiled_exclusion({}, {})
+    assert _uses_compiled_exclusion({"exclusion_model": "NgMatched_"}, {})
+    assert _uses_compiled_exclusion({}, {"exclusion_model": ["Sphere", "DblSphere_"]})
+
+
+@pytest.mark.skipif(not halo_exclusion.USE_NUMBA, reason="numba is not installed")
+def test_uses_compiled_exclusion_subclass():
+    class MyExclusion(halo_exclusion.DblSphere_):
+        pass
+
+    assert _uses_compiled_exclusion({"exclusion_model": MyExclusion}, {})
+    assert not _uses_compiled_exclusion({"exclusion_model": halo_exclusion.Sphere}, {})
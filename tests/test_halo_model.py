@@ -1,7 +1,9 @@
 """
 Integration-style tests of the full HaloModel class.
 """
-from halomod import TracerHaloModel, DMHaloModel
+from halomod import TracerHaloModel, DMHaloModel, hod
+from halomod.halo_model import NGException
+import pickle
 import pytest
 import numpy as np
 
@@ -11,6 +13,7 @@ from halomod.profiles import Profile
 from halomod.bias import Bias
 from halomod.concentration import CMRelation
 from halomod.hod import HOD
+from halomod.tools import spline_integral
 
 
 @pytest.mark.parametrize("model", (TracerHaloModel, DMHaloModel))
@@ -170,3 +173,220 @@ def test_raiseerror(thm: TracerHaloModel, attr):
     fakemodel = 1
     with pytest.raises(ValueError):
         setattr(thm, attr, fakemodel)
+
+
+@pytest.mark.parametrize("method", ["loop", "fftlog"])
+def test_hankel_methods(thm: TracerHaloModel, method):
+    hm = thm.clone(hankel_method=method)
+    assert np.allclose(hm.corr_auto_tracer, thm.corr_auto_tracer, rtol=1e-2)
+    assert np.allclose(hm.corr_auto_matter, thm.corr_auto_matter, rtol=2e-2)
+
+
+def test_bad_hankel_method(thm: TracerHaloModel):
+    with pytest.raises(ValueError):
+        thm.clone(hankel_method="bad")
+
+
+def test_hankel_operator_cached():
+    hm = TracerHaloModel(transfer_model="EH", hod_params={})
+    hm.corr_auto_tracer
+    op = hm._power_to_corr_operator
+
+    hm.update(hod_params={"M_min": 12.5})
+    hm.corr_auto_tracer
+    assert hm._power_to_corr_operator is op
+
+    hm.update(dr_table=0.02)
+    assert hm._power_to_corr_operator is not op
+
+
+def test_mass_quadrature_cached():
+    hm = TracerHaloModel(transfer_model="EH", hod_params={})
+    quad = hm._tracer_mass_quadrature
+    assert np.isclose(
+        hm.mean_tracer_den,
+        spline_integral(hm.m, hm.dndm * hm._total_occupation, xmin=hm.tracer_mmin),
+    )
+
+    hm.update(hod_params={"M_1": 13.5})
+    assert hm._tracer_mass_quadrature is quad
+
+    hm.update(dlog10m=0.02)
+    assert hm._tracer_mass_quadrature is not quad
+    assert len(hm._tracer_mass_quadrature.weights) == len(hm.m)
+
+
+def test_1h_turnover_limits():
+    hm = TracerHaloModel(transfer_model="EH", hod_params={})
+
+    r = np.pi / hm.k / 10
+    mmin = 4 * np.pi * r ** 3 * hm.mean_density0 * hm.halo_overdensity_mean / 3
+    integ = hm.tracer_profile_ukm ** 2 * hm.dndm * hm.hod.ss_pairs(hm.m)
+    ss = np.array(
+        [
+            spline_integral(hm.m, f, xmin=max(mm, hm.m.min()))
+            for f, mm in zip(integ, mmin)
+        ]
+    )
+    assert np.allclose(
+        hm.power_1h_ss_auto_tracer_fnc(hm.k), ss / hm.mean_tracer_den ** 2
+    )
+
+    hm.update(force_1halo_turnover=False)
+    integ = 2 * hm.dndm * hm.hod.cs_pairs(hm.m) * hm.tracer_profile_ukm
+    cs = np.array([spline_integral(hm.m, f, xmin=10 ** hm.hod.mmin) for f in integ])
+    assert np.allclose(
+        hm.power_1h_cs_auto_tracer_fnc(hm.k), cs / hm.mean_tracer_den ** 2
+    )
+
+
+def test_compute_spectra():
+    hm = TracerHaloModel(transfer_model="EH", hod_params={})
+    spectra = hm.compute_spectra(
+        which=["power_auto_tracer", "power_cross_tracer_matter", "corr_auto_tracer"]
+    )
+
+    hm2 = TracerHaloModel(transfer_model="EH", hod_params={})
+    for name, value in spectra.items():
+        assert np.allclose(value, getattr(hm2, name))
+
+    with pytest.raises(ValueError):
+        hm.compute_spectra(which=["mean_tracer_den"])
+
+
+def test_hod_update_keeps_matter_integrals():
+    """Updating the HOD does not recompute the HOD-independent mass integrals."""
+    hm = TracerHaloModel(transfer_model="EH", hod_params={})
+    hm.compute_spectra(which=["power_cross_tracer_matter"])
+    matter = hm._matter_bias_mass_integral
+    profile = hm.halo_profile_ukm
+
+    hm.update(hod_params={"M_min": 12.5})
+    power = hm.power_cross_tracer_matter
+    assert hm._matter_bias_mass_integral is matter
+    assert hm.halo_profile_ukm is profile
+
+    hm2 = TracerHaloModel(transfer_model="EH", hod_params={"M_min": 12.5})
+    assert np.allclose(power, hm2.power_cross_tracer_matter)
+
+
+def test_hod_batch():
+    hm = TracerHaloModel(transfer_model="EH", hod_params={})
+    params = np.array([[11.5, 12.5], [12.2, 13.4]])
+    which = ["mean_tracer_den", "power_auto_tracer", "corr_auto_tracer"]
+    batch = hm.compute_hod_batch(params, names=["M_min", "M_1"], which=which)
+
+    for i, (mmin, m1) in enumerate(params):
+        hm2 = TracerHaloModel(
+            transfer_model="EH", hod_params={"M_min": mmin, "M_1": m1}
+        )
+        for name in which:
+            assert batch[name].shape[0] == 2
+            assert np.allclose(batch[name][i], getattr(hm2, name), rtol=1e-5)
+
+    # The model itself is unchanged.
+    assert hm.hod_params == {}
+
+
+@pytest.mark.parametrize("hod_model", sorted(hod.HOD._plugins))
+def test_hod_batch_all_models(hod_model):
+    """The batched statistics of every HOD (including no-central ones) match."""
+    hm = TracerHaloModel(transfer_model="EH", hod_model=hod_model, hod_params={})
+    name = next(
+        k for k, v in hm.hod._defaults.items() if isinstance(v, float) and v != 0
+    )
+    sets = [{}, {name: 1.02 * hm.hod._defaults[name]}]
+    which = ["mean_tracer_den", "power_auto_tracer", "corr_auto_tracer"]
+    batch = hm.compute_hod_batch(sets, which=which)
+
+    for i, params in enumerate(sets):
+        hm.update(hod_params=params)
+        for q in which:
+            assert np.allclose(batch[q][i], getattr(hm, q), rtol=1e-4)
+
+
+def test_hod_batch_fallback():
+    hm = TracerHaloModel(transfer_model="EH", hod_params={})
+    bias = hm.bias_effective_tracer
+    batch = hm.compute_hod_batch(
+        [{"M_min": 11.5}, {"M_min": 12.5}], which=["bias_effective_tracer"]
+    )
+
+    hm2 = TracerHaloModel(transfer_model="EH", hod_params={"M_min": 12.5})
+    assert np.isclose(batch["bias_effective_tracer"][1], hm2.bias_effective_tracer)
+    assert hm.hod_params == {}
+    assert hm.bias_effective_tracer == bias
+
+
+@pytest.mark.parametrize("hc_spectrum", ["linear", "nonlinear"])
+@pytest.mark.parametrize("cm", ["Duffy08", "Bullock01"])
+def test_redshift_batch(hc_spectrum, cm):
+    hm = DMHaloModel(
+        transfer_model="EH", hc_spectrum=hc_spectrum, halo_concentration_model=cm
+    )
+    z = [0.0, 0.5, 2.0]
+    which = [
+        "growth_factor",
+        "dndm",
+        "cmz_relation",
+        "halo_profile_ukm",
+        "power_auto_matter",
+        "corr_auto_matter",
+    ]
+    assert hm._redshift_batch_supported
+    batch = hm.compute_redshift_batch(z, which=which)
+    assert hm.z == 0
+
+    for i, zz in enumerate(z):
+        hm.update(z=zz)
+        for name in which:
+            assert batch[name].shape[0] == 3
+            assert np.allclose(batch[name][i], getattr(hm, name), rtol=1e-8, atol=0)
+
+
+def test_redshift_batch_fallback():
+    hm = DMHaloModel(transfer_model="EH", hc_spectrum="filtered-lin")
+    assert not hm._redshift_batch_supported
+    batch = hm.compute_redshift_batch(
+        [0.0, 1.0], which=["power_auto_matter", "bias_effective_matter"]
+    )
+    assert hm.z == 0
+
+    hm2 = DMHaloModel(transfer_model="EH", hc_spectrum="filtered-lin", z=1.0)
+    assert np.allclose(batch["power_auto_matter"][1], hm2.power_auto_matter)
+    assert np.isclose(batch["bias_effective_matter"][1], hm2.bias_effective_matter)
+
+
+@pytest.mark.parametrize("hod_model", ["Zehavi05", "Zheng05"])
+def test_tracer_density(hod_model):
+    hm = TracerHaloModel(
+        transfer_model="EH", hod_model=hod_model, tracer_density=1e-3, dlog10m=0.05
+    )
+    m, dndm = hm._fine_mass_function
+    assert np.allclose(np.diff(np.log10(m)), 0.01)
+
+    # The occupation of all haloes above the HOD's minimum mass matches the density.
+    hod = hm.hod
+    if hod.sharp_cut:
+        hod = hm.hod_model(**{**hm.hod_params, "M_min": hm.Mmin})
+    density = spline_integral(m, dndm * hod.total_occupation(m), xmin=10 ** hm.hod.mmin)
+    assert np.isclose(density, 1e-3, rtol=1e-4)
+
+    with pytest.raises(NGException):
+        hm.update(tracer_density=1e20)
+
+
+def test_pickle_with_cache():
+    hm = TracerHaloModel(transfer_model="EH")
+    power = hm.power_auto_tracer
+    corr = hm.corr_auto_matter
+
+    hm2 = pickle.loads(pickle.dumps(hm))
+    assert hm2._TracerHaloModel__corr_auto_matter_fnc is not None
+    assert np.all(hm2.power_auto_tracer == power)
+    assert np.all(hm2.corr_auto_matter == corr)
+
+    # The unpickled model still tracks its dependencies.
+    hm.update(hod_params={"M_min": 12.5})
+    hm2.update(hod_params={"M_min": 12.5})
+    assert np.allclose(hm2.power_auto_tracer, hm.power_auto_tracer)
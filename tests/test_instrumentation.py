@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from halomod import DMHaloModel, TracerHaloModel, tools
+from halomod.instrumentation import instrument
+
+
+def test_instrument():
+    hankel = tools.hankel_transform
+    dndm = DMHaloModel.__dict__["dndm"]
+
+    with instrument() as stats:
+        hm = DMHaloModel(transfer_model="EH", hankel_method="loop")
+        hm.corr_auto_matter
+        hm.dndm
+
+    # Everything is restored afterwards.
+    assert tools.hankel_transform is hankel
+    assert DMHaloModel.__dict__["dndm"] is dndm
+
+    s = stats.stats["DMHaloModel.dndm"]
+    assert s["misses"] == 1
+    assert s["hits"] >= 1
+    assert s["calls"] == s["hits"] + s["misses"]
+    assert s["time"] >= s["self_time"]
+    assert stats.stats["tools.hankel_transform"]["calls"] >= 1
+
+    times = [s["time"] for s in json.loads(stats.to_json())]
+    assert times == sorted(times, reverse=True)
+    assert "DMHaloModel.dndm" in stats.report(sort="name")
+
+
+def test_instrument_memory():
+    with instrument(memory=True) as stats:
+        TracerHaloModel(transfer_model="EH").tracer_profile_ukm
+
+    assert stats.stats["TracerHaloModel.tracer_profile_ukm"]["peak_memory"] > 0
+
+
+def test_no_nesting():
+    with instrument():
+        with pytest.raises(RuntimeError):
+            with instrument():
+                pass
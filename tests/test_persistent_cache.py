@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from halomod import DMHaloModel, persistent_cache
+from halomod.persistent_cache import DiskCache, get_disk_cache, set_disk_cache
+from halomod.tools import ExtendedSpline
+
+
+@pytest.fixture()
+def disk_cache(tmp_path):
+    set_disk_cache(tmp_path)
+    yield get_disk_cache()
+    set_disk_cache(None)
+
+
+def test_round_trip(tmp_path):
+    cache = DiskCache(tmp_path)
+    x = np.linspace(1, 2, 20)
+    cache.put("array", x)
+    cache.put("spline", ExtendedSpline(x, x ** 2, upper_func="power_law"))
+
+    assert np.all(cache.get("array") == x)
+    assert np.isclose(cache.get("spline")(3.0), 9.0, rtol=1e-3)
+    assert cache.get("other") is None
+
+
+def test_eviction(tmp_path):
+    cache = DiskCache(tmp_path, max_size=0)
+    cache.put("a", np.random.random(100))
+    cache.max_size = 10 ** 6
+    cache.put("b", np.random.random(100))
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.size <= 10 ** 6
+
+
+def test_dependencies(tmp_path):
+    cache = DiskCache(tmp_path)
+    cache.add_dependencies("Model", "q", ["b", "a"])
+    cache.add_dependencies("Model", "q", ["c"])
+    assert cache.dependencies("Model", "q") == ["a", "b", "c"]
+    assert cache.dependencies("Model", "other") is None
+
+    # Dependencies recorded by another process are not lost.
+    DiskCache(tmp_path).add_dependencies("Model", "q", ["d"])
+    assert cache.dependencies("Model", "q") == ["a", "b", "c", "d"]
+
+    cache.clear()
+    assert cache.dependencies("Model", "q") is None
+
+
+def test_key_depends_on_source(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path)
+    key = cache.key("Model", "q", {"a": 1})
+    assert cache.key("Model", "q", {"a": 1}) == key
+
+    # A locally-modified installation does not load entries of the original.
+    monkeypatch.setattr(persistent_cache, "_source_hash", lambda: "modified")
+    assert cache.key("Model", "q", {"a": 1}) != key
+
+
+def test_halo_model(disk_cache):
+    hm = DMHaloModel(transfer_model="EH")
+    power = hm.power_auto_matter
+
+    assert "sigma_8" in disk_cache.dependencies("DMHaloModel", "dndm")
+    assert "hc_spectrum" not in disk_cache.dependencies("DMHaloModel", "dndm")
+
+    # A new model loads the saved quantities.
+    hm2 = DMHaloModel(transfer_model="EH")
+    assert np.all(hm2.dndm == hm.dndm)
+    assert np.allclose(hm2.power_auto_matter, power)
+
+    # Quantities loaded from disk are still invalidated by their parameters.
+    hm2.update(sigma_8=0.9)
+    set_disk_cache(None)
+    assert np.allclose(
+        hm2.dndm, DMHaloModel(transfer_model="EH", sigma_8=0.9).dndm, rtol=1e-8
+    )
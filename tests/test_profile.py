@@ -179,3 +179,86 @@ def test_get_k_variable(thmnum, thm):
     attnum = getattr(thmnum.halo_profile, "_get_k_variables")
     att = getattr(thm.halo_profile, "_get_k_variables")
     assert np.allclose(att(k, m, coord="kappa"), attnum(k, m, coord="kappa"), rtol=1e-2)
+
+
+def test_numerical_p_matches_analytic():
+    """The generic numerical _p of a profile matches its analytic form.
+
+    Only low K are tested, as _p is interpolated from a grid in K, which does not
+    resolve the oscillations at high K.
+    """
+    gnfw = pf.GeneralizedNFW(bullock, alpha=1)
+    nfw = pf.NFW(bullock)
+    c = np.linspace(3, 20, 40)
+    K = np.outer(np.logspace(-3, 0, 30), np.ones_like(c))
+
+    assert np.allclose(pf.Profile._p(gnfw, K, c), nfw._p(K, c), rtol=1e-4)
+    assert 0 <= gnfw.p_error < gnfw.p_rtol
+
+
+@pytest.mark.parametrize("alpha", (0.5, 1.0, 1.5))
+def test_gnfw_inf_matches_transform(alpha):
+    """The tabulated GeneralizedNFWInf transform matches its Meijer G form."""
+    from mpmath import meijerg, gamma
+
+    gnfw = pf.GeneralizedNFWInf(bullock, alpha=alpha)
+    K = np.logspace(-5, 2.5, 15)
+    exact = [
+        float(
+            meijerg(
+                [[(alpha - 2) / 2, (alpha - 1) / 2], []],
+                [[0, 0, 0.5], [-0.5]],
+                k ** 2 / 4,
+            )
+        )
+        / (np.sqrt(np.pi) * float(gamma(3 - alpha)) * 2 ** alpha)
+        for k in K
+    ]
+    assert np.allclose(gnfw._p(K), exact, rtol=1e-6)
+
+
+def test_moore_inf_transform():
+    nfw = pf.NFWInf(bullock)
+    K = np.logspace(-8, 5, 30)
+    assert np.allclose(
+        pf.GeneralizedNFWInf(bullock, alpha=1)._p(K), nfw._p(K), rtol=1e-5
+    )
+
+    # The Moore transform at low and high K, where the profile is a power law.
+    moore = pf.MooreInf(bullock)
+    assert np.isclose(moore._p(1e-9) - moore._p(1e-8), np.log(10), rtol=1e-6)
+    assert np.isclose(moore._p(1e6) * 1e6 ** 1.5, np.sqrt(np.pi / 2), rtol=1e-5)
+
+
+def test_rotated_tables_cached():
+    """Tables are shared by profiles with the same parameters, and are bounded."""
+    pf._rotated_transform_table.cache_clear()
+    for alpha in (1.1, 1.1, 1.2):
+        pf.GeneralizedNFWInf(bullock, alpha=alpha)._p(1.0)
+    info = pf._rotated_transform_table.cache_info()
+    assert (info.hits, info.currsize) == (1, 2)
+    assert info.maxsize is not None
+
+
+class NFWInfnum(pf.ProfileInf):
+    """An infinite NFW profile, with the numerical transform."""
+
+    def _f(self, x):
+        return 1.0 / (x * (1 + x) ** 2)
+
+    def _h(self, c):
+        return np.log(1.0 + c) - c / (1.0 + c)
+
+
+def test_numerical_inf_p():
+    """The numerical _p of an infinite profile matches its analytic form."""
+    nfw = pf.NFWInf(bullock)
+    num = NFWInfnum(bullock)
+
+    K = np.outer(np.logspace(-4, 2, 30), np.linspace(0.5, 2, 10))
+    assert num._p(K).shape == K.shape
+    assert np.allclose(num._p(K), nfw._p(K), rtol=1e-4)
+
+    k = np.logspace(-3, 2, 200)
+    m = np.logspace(10, 15, 200)
+    assert np.allclose(num.u(k, m), nfw.u(k, m), rtol=1e-4)
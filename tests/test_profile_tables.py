@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from halomod import profiles as pf
+from halomod import persistent_cache, profile_tables
+from halomod._cli import tables
+from halomod.concentration import Duffy08
+
+
+@pytest.fixture(scope="module", autouse=True)
+def table_dir(tmp_path_factory):
+    old = profile_tables.get_table_directory()
+    profile_tables.set_table_directory(tmp_path_factory.mktemp("tables"))
+    yield profile_tables.get_table_directory()
+    profile_tables.set_table_directory(old)
+
+
+def test_tabulated_matches_analytic():
+    """A tabulated GeneralizedNFW with alpha=1 matches the analytic NFW transform."""
+    gnfw = pf.GeneralizedNFW(Duffy08(), alpha=1, tabulate=1e-3)
+    nfw = pf.NFW(Duffy08())
+    c = np.linspace(3, 30, 20)
+    K = np.outer(np.logspace(-3, 2, 50), np.ones_like(c))
+
+    u = gnfw._p(K, c) / gnfw._h(c)
+    assert np.allclose(u, nfw._p(K, c) / nfw._h(c), atol=1e-3)
+    assert gnfw.p_error <= 1e-3
+
+
+def test_table_saved_and_loaded():
+    gnfw = pf.GeneralizedNFW(Duffy08(), alpha=1.2)
+    table = profile_tables.get_table(gnfw, atol=1e-2)
+    path = profile_tables.table_path(gnfw, atol=1e-2)
+    assert path.exists()
+
+    loaded = profile_tables.ProfileTable.load(path)
+    assert loaded.accuracy == table.accuracy <= 1e-2
+    K = np.logspace(-3, 2, 20)
+    assert np.allclose(loaded(K, 5.0), table(K, 5.0))
+
+    # Different parameters have a different table.
+    assert path != profile_tables.table_path(
+        pf.GeneralizedNFW(Duffy08(), alpha=1.3), atol=1e-2
+    )
+
+
+def test_table_limits():
+    table = profile_tables.get_table(pf.Moore(Duffy08()), atol=1e-2)
+    assert np.allclose(table(np.array([1e-12, 1e8]), 5.0), [1, 0], atol=1e-6)
+    assert table.covers(np.array([1.0, 100.0]))
+    assert not table.covers(np.array([1e4]))
+
+
+def test_cli_tables(table_dir):
+    runner = CliRunner()
+    result = runner.invoke(
+        tables,
+        ["Einasto", "-p", "alpha=0.2,0.3", "-p", "use_interp=False", "--atol", "0.01"],
+    )
+    assert result.exit_code == 0, result.output
+    assert len(list(table_dir.glob("halomod.profiles.Einasto-*.npz"))) == 2
+
+
+@pytest.fixture(scope="module")
+def einasto_table(table_dir):
+    table = profile_tables.EinastoTable.compute(
+        K_range=(1e-4, 1e2), c_range=(1, 100), n_per_decade=20, d_alpha=0.025
+    )
+    table.save(table_dir)
+    return table
+
+
+def test_einasto_table_off_grid_alpha(einasto_table):
+    """The table interpolates to alpha between its grid points."""
+    prof = pf.Einasto(Duffy08(), alpha=0.225, use_interp=False)
+    c = np.linspace(3, 30, 10)
+    K = np.outer(np.logspace(-3, 1, 30), np.ones_like(c))
+
+    exact = prof._p(K, c) / prof._h(c)
+    assert np.allclose(einasto_table(K, c, 0.225), exact, atol=2e-3)
+
+
+def test_einasto_table_saved_and_loaded(einasto_table, table_dir):
+    loaded = profile_tables.EinastoTable.load(table_dir)
+    assert isinstance(loaded.coeffs, np.memmap)
+    for path in table_dir.glob(f"{loaded.name}.*"):
+        assert path.stat().st_mode & 0o777 == persistent_cache._FILE_MODE
+    assert loaded.accuracy == einasto_table.accuracy
+    K = np.logspace(-3, 1, 20)
+    assert np.allclose(loaded(K, 5.0, 0.3), einasto_table(K, 5.0, 0.3))
+
+
+def test_einasto_table_covers(einasto_table):
+    assert einasto_table.covers(np.array([1.0, 100.0]), 0.1)
+    assert einasto_table.covers(np.array([5.0]), 0.4)
+    assert not einasto_table.covers(np.array([5.0]), 0.45)
+    assert not einasto_table.covers(np.array([500.0]), 0.2)
+
+
+def test_einasto_table_alpha_positive():
+    with pytest.raises(ValueError):
+        profile_tables.EinastoTable.compute(alpha_range=(0.1, 0.4), d_alpha=0.05)
+
+
+def test_einasto_table_computed_once(einasto_table, tmp_path, monkeypatch):
+    monkeypatch.setattr(profile_tables, "DATA_DIRECTORY", tmp_path / "data")
+    monkeypatch.setattr(profile_tables, "_table_directory", tmp_path / "tables")
+    monkeypatch.setattr(
+        profile_tables.EinastoTable, "compute", classmethod(lambda cls: einasto_table)
+    )
+    profile_tables.get_einasto_table.cache_clear()
+    try:
+        with pytest.warns(UserWarning, match="Einasto"):
+            assert profile_tables.get_einasto_table() is einasto_table
+        assert profile_tables.EinastoTable.load(tmp_path / "tables").accuracy == (
+            einasto_table.accuracy
+        )
+    finally:
+        profile_tables.get_einasto_table.cache_clear()
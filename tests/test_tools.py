@@ -1,14 +1,26 @@
+import pickle
+
 import numpy as np
 from halomod.tools import (
     power_to_corr,
     power_to_corr_ogata,
     populate,
     ExtendedSpline,
+    SplineFamily,
+    spline_integral,
+    SplineQuadrature,
     hankel_transform,
+    HankelOperator,
+    PowerLaw,
+    SumOfTerms,
+    _zero,
+    cumulative_sine_integral,
+    rotated_sine_transform,
 )
-from halomod.profiles import NFW
+from halomod.profiles import NFW, NFWInf
 from halomod.hod import Tinker05, Zehavi05
 from halomod.concentration import Bullock01Power
+from scipy.interpolate import InterpolatedUnivariateSpline
 import pytest
 
 
@@ -33,6 +45,94 @@ def test_ogata_powerlaw_fnc():
     assert np.allclose(corr_ogata, corr_simple, rtol=1e-4)
 
 
+@pytest.mark.parametrize("method", ["loop", "vectorized", "fftlog"])
+def test_hankel_methods_agree(method):
+    r = np.logspace(-1, 1, 5)
+
+    corr = hankel_transform(lambda k: k ** -1.5, r, "r", method=method)
+    corr_simple = power_to_corr(lambda x: np.exp(x) ** -1.5, r)
+
+    assert np.allclose(corr, corr_simple, rtol=1e-4)
+
+
+def test_hankel_list_of_functions():
+    r = np.logspace(-1, 1, 5)
+    fncs = [lambda k, i=i: (i + 1) * k ** -1.5 for i in range(len(r))]
+
+    corr_loop = hankel_transform(fncs, r, "r", method="loop")
+    corr_vec = hankel_transform(fncs, r, "r", method="vectorized")
+    corr_fftlog = hankel_transform(fncs, r, "r", method="fftlog")
+
+    assert np.allclose(corr_loop, corr_vec)
+    assert np.allclose(corr_loop, corr_fftlog, rtol=1e-4)
+
+
+def test_fftlog_to_power():
+    k = np.logspace(-1, 1, 5)
+
+    # The transform of a Gaussian correlation function is a Gaussian power spectrum.
+    power = hankel_transform(lambda r: np.exp(-(r ** 2) / 2), k, "k", method="fftlog")
+
+    assert np.allclose(power, (2 * np.pi) ** 1.5 * np.exp(-(k ** 2) / 2), atol=1e-8)
+
+
+@pytest.mark.parametrize("method", ["loop", "vectorized", "fftlog"])
+def test_hankel_stack(method):
+    k = np.logspace(-3, 3, 300)
+    r = np.logspace(-1, 1, 5)
+    table = np.array([(i + 1) * k ** -1.5 for i in range(len(r))])
+    kw = {"lower_func": "power_law", "upper_func": "power_law"}
+
+    stack = ExtendedSpline(k, table, **kw)
+    fncs = [ExtendedSpline(k, t, **kw) for t in table]
+
+    assert np.allclose(
+        hankel_transform(stack, r, "r", method=method),
+        hankel_transform(fncs, r, "r", method=method),
+    )
+
+
+def test_hankel_bad_method():
+    with pytest.raises(ValueError):
+        hankel_transform(lambda k: k ** -1.5, np.logspace(-1, 1, 5), "r", method="bad")
+
+
+def test_hankel_operator():
+    k = np.logspace(-3, 3, 300)
+    r = np.logspace(-1, 1, 5)
+    fnc = ExtendedSpline(
+        k, k ** -1.5, lower_func="power_law", upper_func="power_law", match_upper=False
+    )
+
+    op = HankelOperator(k, r, "r")
+    assert np.allclose(op(fnc), hankel_transform(fnc, r, "r"), rtol=1e-5)
+
+    # Applying the operator to different data on the same grid.
+    fnc = ExtendedSpline(k, 2 * k ** -1.5, lower_func="power_law", upper_func=_zero)
+    assert np.allclose(op(fnc), hankel_transform(fnc, r, "r"), rtol=1e-5)
+
+
+def test_hankel_operator_stacked():
+    k = np.logspace(-3, 3, 300)
+    r = np.logspace(-1, 1, 5)
+    y = np.array([k ** -1.5, 3 * k ** -2])
+    op = HankelOperator(k, r, "r")
+
+    stack = ExtendedSpline(k, y, lower_func="power_law", upper_func="power_law")
+    out = op(stack)
+    assert out.shape == (2, 5)
+    for i in range(2):
+        fnc = ExtendedSpline(k, y[i], lower_func="power_law", upper_func="power_law")
+        assert np.allclose(out[i], op(fnc))
+
+
+def test_hankel_operator_wrong_grid():
+    k = np.logspace(-3, 3, 300)
+    op = HankelOperator(k, np.logspace(-1, 1, 5), "r")
+    with pytest.raises(ValueError):
+        op(ExtendedSpline(k[1:], k[1:] ** -1.5))
+
+
 def test_ogata_powerlaw_trunc():
     "Test that power_to_corr still works on a truncated spectrum"
     k = np.logspace(-1, 1, 100)
@@ -161,6 +261,21 @@ def test_extended_spline_pl_explicit_func(xy):
     assert np.isclose(es(5.0), 1 / 25.0)
 
 
+def test_extended_spline_unmatched_func_not_called(xy):
+    """Extensions that are not matched are not evaluated when the spline is made."""
+    calls = []
+
+    def fnc(xx):
+        calls.append(xx)
+        return xx ** -2
+
+    es = ExtendedSpline(
+        *xy, lower_func=fnc, upper_func=fnc, match_lower=False, match_upper=False
+    )
+    assert not calls
+    assert np.isclose(es(0.1), 100.0)
+
+
 def test_extended_spline_pl_power_law(xy):
     es = ExtendedSpline(*xy, lower_func="power_law", upper_func="power_law")
 
@@ -202,3 +317,124 @@ def test_extended_spline_pl_noise(xy):
     assert np.isclose(es(100.0), 0.0001, rtol=1e-1)
     assert np.isclose(es(1.0), 1, rtol=1e-2)
     assert np.isclose(es(5.0), 1 / 25.0, rtol=1e-2)
+
+
+@pytest.mark.parametrize(
+    "lower,upper",
+    [("power_law", "power_law"), (lambda x: x ** -2, _zero), (None, "boundary"),],
+)
+def test_extended_spline_stack(xy, lower, upper):
+    x, y = xy
+    table = np.array([y, 2 * y, y * (1 + np.sin(x) / 10)])
+    stack = ExtendedSpline(x, table, lower_func=lower, upper_func=upper)
+
+    xx = np.logspace(-1, 2, 50)
+    for i, row in enumerate(table):
+        es = ExtendedSpline(x, row, lower_func=lower, upper_func=upper)
+        assert np.allclose(stack(xx)[i], es(xx))
+        assert np.allclose(stack(xx[None, :], rows=[i])[0], es(xx))
+
+
+@pytest.mark.parametrize("stacked", [False, True])
+def test_extended_spline_pickle(xy, stacked):
+    x, y = xy
+    if stacked:
+        y = np.array([y, 2 * y])
+    es = ExtendedSpline(x, y, lower_func="power_law", upper_func=_zero)
+    es2 = pickle.loads(pickle.dumps(es))
+
+    xx = np.logspace(-2, 3, 50)
+    assert np.all(es2(xx) == es(xx))
+
+
+def test_sum_of_terms_pickle(xy):
+    es = ExtendedSpline(*xy, lower_func=PowerLaw(2), upper_func="power_law")
+    f = SumOfTerms(es, PowerLaw(-1), constant=1)
+    f2 = pickle.loads(pickle.dumps(f))
+
+    xx = np.logspace(-2, 3, 50)
+    assert np.allclose(f2(xx), es(xx) + 1 / xx + 1)
+
+
+def test_extended_spline_slots(xy):
+    es = ExtendedSpline(*xy, lower_func="boundary", upper_func="power_law")
+    assert not hasattr(es, "__dict__")
+
+
+def test_extended_spline_empty(xy):
+    es = ExtendedSpline(*xy)
+    assert es(np.array([])).shape == (0,)
+
+
+def test_spline_family():
+    x = np.linspace(0, 2, 30)
+    table = np.array([np.sin(x), x ** 2, np.exp(-x)])
+    family = SplineFamily(x, table)
+
+    xx = np.linspace(-0.1, 2.2, 17)
+    per_row = np.array([xx, xx / 2, xx + 0.05])
+    for i, row in enumerate(table):
+        spl = InterpolatedUnivariateSpline(x, row, k=3)
+        assert np.allclose(family(xx)[i], spl(xx))
+        assert np.allclose(family(per_row)[i], spl(per_row[i]))
+        assert np.allclose(family(xx, rows=[i])[0], spl(xx))
+
+    with pytest.raises(ValueError):
+        family(per_row, rows=[0, 1])
+
+    assert np.all(pickle.loads(pickle.dumps(family))(xx) == family(xx))
+
+
+@pytest.mark.parametrize("log", [True, False])
+def test_spline_integral_2d(log):
+    x = np.logspace(0, 3, 200)
+    f = np.array([x ** -a for a in np.linspace(0.5, 2.5, 7)])
+    xmin = np.linspace(2, 20, 7)
+
+    rows = np.array([spline_integral(x, ff, xmin=3.0, xmax=500, log=log) for ff in f])
+    assert np.allclose(spline_integral(x, f, xmin=3.0, xmax=500, log=log), rows)
+    assert np.allclose(
+        spline_integral(x, f.T, xmin=3.0, xmax=500, log=log, axis=0), rows
+    )
+
+    rows = np.array(
+        [spline_integral(x, ff, xmin=xm, log=log) for ff, xm in zip(f, xmin)]
+    )
+    assert np.allclose(spline_integral(x, f, xmin=xmin, log=log), rows)
+
+
+def test_spline_quadrature():
+    m = np.logspace(10, 16, 300)
+    f = np.array([m ** -a * np.exp(-m / 1e15) for a in (1.5, 2.0)])
+    quad = SplineQuadrature(m, xmin=1e12)
+
+    assert np.allclose(quad(f), [spline_integral(m, ff, xmin=1e12) for ff in f])
+    assert np.allclose(quad(f[0]), spline_integral(m, f[0], xmin=1e12))
+
+    # The cumulative integrals from each grid point down to xmin.
+    cumul = quad.cumulative(f[0], m)
+    assert np.isclose(cumul[0], spline_integral(m, f[0]))
+    assert np.allclose(cumul[100], spline_integral(m, f[0], xmin=m[100]))
+    assert cumul[-1] == 0
+
+
+@pytest.mark.parametrize("x_max", (3.0, 200.0))
+def test_cumulative_sine_integral_nfw(x_max):
+    """The numerical transform of the NFW profile matches its analytic one."""
+    nfw = NFW(Bullock01Power())
+    c = np.linspace(2, x_max, 50)
+    K = np.logspace(-4, 3, 60)
+
+    integral, error = cumulative_sine_integral(nfw._f, K, c[::-1])
+    exact = nfw._p(np.outer(K, np.ones_like(c)), c).T[::-1]
+
+    assert np.allclose(integral, exact, rtol=1e-6, atol=1e-12)
+    assert np.all(error >= 0)
+    assert np.all(error <= 1e-4 * np.abs(exact).max(axis=1, keepdims=True))
+
+
+def test_rotated_sine_transform_nfw():
+    """The rotated transform of the NFW profile matches the analytic NFWInf one."""
+    nfw = NFWInf(Bullock01Power())
+    K = np.logspace(-6, 3, 40)
+    assert np.allclose(rotated_sine_transform(nfw._f, K), nfw._p(K), rtol=1e-8)